@@ -3,13 +3,22 @@ import json
 import tempfile
 import shutil
 import time
-import signal
-import functools
-from flask import Flask, request, jsonify
-from config import setup_logger, CACHE_DIR
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from flask import Flask, Response, g, request, jsonify
+from config import (setup_logger, CACHE_DIR, BATCH_MAX_ITEMS, BATCH_MAX_WORKERS, JOB_DEFAULT_PRIORITY, REQUEST_TIMEOUT,
+                    PROFILE_HEADER)
 from models import ImageType, IMAGE_TYPE_NAMES
 from image_processor import ImageProcessor
+from qrcode_service import QRCodeService
 from cache_manager import CacheManager
+from frame_context import FrameContext
+from single_flight import SingleFlight
+from job_queue import JobQueue, QueueFullError
+from deadline import Deadline, DeadlineExceeded
+from profiler import profile_request, profile_summary_path
+from metrics import (REQUEST_SECONDS, REQUESTS_IN_FLIGHT, CACHE_REQUESTS, ERRORS, COALESCED_REQUESTS,
+                     MEMORY_CACHE, CACHE_DIR_USAGE, JOBS, render_metrics, register_collector,
+                     start_snapshot_writer)
 
 # 创建Flask应用
 app = Flask(__name__)
@@ -20,65 +29,43 @@ setup_logger(app)
 # 初始化组件
 cache_manager = CacheManager(app)
 
-# 初始化上次清理时间
-from cache_manager import LAST_CLEANUP_TIME, MAX_CACHE_FILES
-LAST_CLEANUP_TIME = time.time()
-
-# 启动时执行一次清理，确保服务启动时缓存是干净的
-cache_manager.clean_old_cache(days=7, max_files=1000)
 app.logger.info(f'缓存目录: {CACHE_DIR}')
 image_processor = ImageProcessor(app)
 
-# 超时处理装饰器
-def timeout(seconds):
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            # 定义超时处理函数
-            def handle_timeout(signum, frame):
-                raise TimeoutError(f"函数执行超时 ({seconds}秒)")
-
-            # 仅在非Windows系统上使用信号
-            if os.name != 'nt':
-                # 设置信号处理
-                original_handler = signal.signal(signal.SIGALRM, handle_timeout)
-                # 设置闹钟
-                signal.alarm(seconds)
+# 批量识别的有界线程池（所有批量请求共享）
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix='batch')
 
-            try:
-                # 执行原始函数
-                start_time = time.time()
-                result = func(*args, **kwargs)
-                elapsed = time.time() - start_time
-                
-                # 记录执行时间
-                if elapsed > seconds * 0.8:  # 如果执行时间超过阈值的80%，记录警告
-                    app.logger.warning(f"函数 {func.__name__} 执行时间较长: {elapsed:.2f}秒")
-                
-                return result
-            except TimeoutError as e:
-                app.logger.error(f"超时错误: {str(e)}")
-                # 返回超时错误响应
-                return jsonify({
-                    "code": 408,
-                    "message": "请求处理超时",
-                    "data": {
-                        "type": "error",
-                        "imageType": ImageType.UNKNOWN,
-                        "imageTypeName": IMAGE_TYPE_NAMES[ImageType.UNKNOWN],
-                        "error": "请求处理超时，请稍后重试"
-                    }
-                })
-            finally:
-                # 仅在非Windows系统上重置信号
-                if os.name != 'nt':
-                    # 取消闹钟
-                    signal.alarm(0)
-                    # 恢复原始信号处理器
-                    signal.signal(signal.SIGALRM, original_handler)
-        
-        return wrapper
-    return decorator
+# 相同缓存键的并发识别请求合并
+recognition_flight = SingleFlight()
+
+# 异步识别任务队列（首次提交任务时启动工作线程）
+job_queue = JobQueue(app, lambda source_type, value: recognize_source(source_type, value))
+
+# 批量请求支持的图像来源字段
+BATCH_SOURCE_TYPES = ['image_url', 'image_base64', 'image_path']
+BATCH_LIST_FIELDS = {'image_urls': 'image_url', 'images_base64': 'image_base64', 'image_paths': 'image_path'}
+
+@app.before_request
+def start_background_tasks():
+    """在处理第一个请求时（而不是导入时）启动缓存的后台清理线程及指标快照的写入线程"""
+    cache_manager.start_background_tasks()
+    start_snapshot_writer()
+
+@app.before_request
+def start_request_metrics():
+    """记录请求开始时间及进行中的请求数"""
+    g.metrics_endpoint = request.endpoint or "unknown"
+    g.metrics_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc(endpoint=g.metrics_endpoint)
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    """记录请求耗时（异常时同样记录）"""
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return
+    REQUESTS_IN_FLIGHT.dec(endpoint=g.metrics_endpoint)
+    REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=g.metrics_endpoint)
 
 @app.before_request
 def log_request():
@@ -136,173 +123,408 @@ def log_response(response):
     
     return response
 
-@app.route('/recognize', methods=['POST'])
-@timeout(30)  # 设置30秒超时
-def recognize_image_api():
+def error_data(error):
+    """统一的错误数据格式"""
+    return {
+        "type": "error",
+        "imageType": ImageType.UNKNOWN,
+        "imageTypeName": IMAGE_TYPE_NAMES[ImageType.UNKNOWN],
+        "ocrContent": "",
+        "qrContent": "",
+        "qrType": "",
+        "qrTypeName": "",
+        "error": error
+    }
+
+def save_upload(image_file):
+    """保存上传的图像文件到临时文件"""
+    temp_path = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg').name
+    image_file.save(temp_path)
+    return temp_path
+
+def recognize_source(source_type, value, deadline=None):
     """
-        图像识别API - 支持网络图片URL、Base64编码的图像、本地图像路径和上传的图像文件
-        参数:
-            image_url:      网络图片URL
-            image_base64:   Base64编码的图像数据
-            image_path:     本地图像路径（绝对路径）
-            image:          上传的图像文件
+    识别单张图像（含缓存查询与保存），供单张及批量接口共用
+    
+    参数:
+        source_type: image_url / image_base64 / image_path / image（已保存的上传文件临时路径）
+        value:       对应的图像数据
+        deadline:    请求期限，到达时返回408及已完成阶段的部分结果
+    返回:
+        (状态码, 消息, 数据)
     """
-    temp_path = None
-    cache_key = None
+    upload_path = value if source_type == 'image' else None
+    image_data = None
     
     try:
-        # 获取请求中的图像数据
-        if 'image_url' in request.form:
+        if source_type == 'image_url':
             # 处理网络图片URL
-            image_url = request.form['image_url']
-            app.logger.info(f'处理网络图片: {image_url}')
-            
-            # 检查URL缓存
-            cache_key = cache_manager.get_file_hash(url=image_url)
-            cached_result = cache_manager.get_cached_result(cache_key)
-            if cached_result:
-                app.logger.info(f'使用缓存结果: {cache_key}')
-                # 确保返回格式一致
-                return jsonify({
-                    "code": 200,
-                    "message": "成功",
-                    "data": cached_result
-                })
-            
-            # 下载图片
-            temp_path, cache_key = cache_manager.download_image(image_url)
-            result = image_processor.mixed_recognition(temp_path, is_temp=False)  # 不删除缓存图片
-            
-        elif 'image_base64' in request.form:
-            # 处理Base64编码的图像
-            base64_data = request.form['image_base64']
-            
-            # 检查base64缓存
-            cache_key = cache_manager.get_file_hash(base64_data=base64_data)
-            cached_result = cache_manager.get_cached_result(cache_key)
-            if cached_result:
-                app.logger.info(f'使用缓存结果: {cache_key}')
-                # 确保返回格式一致
-                return jsonify({
-                    "code": 200,
-                    "message": "成功",
-                    "data": cached_result
-                })
-            
-            # 保存图片
-            temp_path, cache_key = cache_manager.save_base64_image(base64_data)
-            result = image_processor.mixed_recognition(temp_path, is_temp=False)  # 不删除缓存图片
-            
-        elif 'image_path' in request.form:
+            app.logger.info(f'处理网络图片: {value}')
+            cache_key = cache_manager.get_file_hash(url=value)
+        elif source_type == 'image_base64':
+            # 处理Base64编码的图像：内容寻址模式按解码后的内容计算缓存键，解码结果在保存图片时复用
+            image_data = cache_manager.decode_base64(value) if cache_manager.content_addressed else None
+            cache_key = cache_manager.get_file_hash(base64_data=value, image_data=image_data)
+        elif source_type == 'image_path':
             # 处理本地图像路径
-            image_path = request.form['image_path']
-            if os.path.exists(image_path):
-                # 检查文件缓存
-                cache_key = cache_manager.get_file_hash(file_path=image_path)
-                cached_result = cache_manager.get_cached_result(cache_key)
-                if cached_result:
-                    app.logger.info(f'使用缓存结果: {cache_key}')
-                    # 确保返回格式一致
-                    return jsonify({
-                        "code": 200,
-                        "message": "成功",
-                        "data": cached_result
-                    })
-                
-                result = image_processor.mixed_recognition(image_path)
-            else:
-                # 统一错误返回格式
-                return jsonify({
-                    "code": 404,
-                    "message": "文件不存在",
-                    "data": {
-                        "type": "error",
-                        "imageType": ImageType.UNKNOWN,
-                        "imageTypeName": IMAGE_TYPE_NAMES[ImageType.UNKNOWN],
-                        "ocrContent": "",
-                        "qrContent": "",
-                        "qrType": "",
-                        "qrTypeName": "",
-                        "error": "文件不存在"
-                    }
-                })
-                
-        elif 'image' in request.files:
-            # 处理上传的图像文件
-            image_file = request.files['image']
-            temp_path = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg').name
-            image_file.save(temp_path)
-            
-            # 计算文件哈希
-            cache_key = cache_manager.get_file_hash(file_path=temp_path)
-            cached_result = cache_manager.get_cached_result(cache_key)
-            if cached_result:
-                app.logger.info(f'使用缓存结果: {cache_key}')
-                os.remove(temp_path)  # 删除临时文件
-                # 确保返回格式一致
-                return jsonify({
-                    "code": 200,
-                    "message": "成功",
-                    "data": cached_result
-                })
-            
-            # 复制到缓存目录
+            if not os.path.exists(value):
+                ERRORS.inc(type="not_found")
+                return 404, "文件不存在", error_data("文件不存在")
+            cache_key = cache_manager.get_file_hash(file_path=value)
+        elif source_type == 'image':
+            # 处理上传的图像文件（已保存到临时文件），计算文件哈希
+            cache_key = cache_manager.get_file_hash(file_path=value)
+        else:
+            ERRORS.inc(type="bad_request")
+            return 400, "未提供图像数据", error_data("未提供图像数据")
+        
+        # 检查缓存
+        cached_result = cache_manager.get_cached_result(cache_key)
+        if cached_result:
+            app.logger.info(f'使用缓存结果: {cache_key}')
+            CACHE_REQUESTS.inc(source=source_type, result="hit")
+            return 200, "成功", cached_result
+        CACHE_REQUESTS.inc(source=source_type, result="miss")
+        
+        # 同一缓存键的并发请求只下载、识别一次，其余请求按各自的期限等待并共享结果；
+        # 发起识别的请求超时得到的部分结果不共享，等待的请求按各自的期限重新识别
+        timeout = deadline.remaining() if deadline is not None else None
+        result, shared = recognition_flight.do(cache_key, recognize_uncached, source_type, value, cache_key,
+                                               deadline, image_data, timeout=timeout, shareable=shareable_result)
+        if shared:
+            app.logger.info(f'合并并发请求结果: {cache_key}')
+            COALESCED_REQUESTS.inc()
+        if result.get("partial"):
+            ERRORS.inc(type="partial_timeout")
+            return 408, "请求处理超时，返回部分结果", result
+        if result.get("type") == "error":
+            ERRORS.inc(type="recognition")
+        return 200, "成功", result
+        
+    except (DeadlineExceeded, FuturesTimeoutError) as e:
+        app.logger.error(f"超时错误: {str(e)}")
+        ERRORS.inc(type="timeout")
+        return 408, "请求处理超时", error_data("请求处理超时，请稍后重试")
+    except Exception as e:
+        ERRORS.inc(type=type(e).__name__)
+        return 500, str(e), error_data(str(e))
+    finally:
+        # 确保上传的临时文件被删除
+        if upload_path and os.path.exists(upload_path):
+            try:
+                os.remove(upload_path)
+            except Exception as e:
+                print(f"清理临时文件失败: {upload_path}, 错误: {str(e)}")
+
+def shareable_result(outcome):
+    """合并请求时能否共享识别结果：到达发起请求自身期限的部分结果或超时异常只属于该请求"""
+    if isinstance(outcome, BaseException):
+        return not isinstance(outcome, (DeadlineExceeded, FuturesTimeoutError))
+    return not outcome.get("partial")
+
+def recognize_uncached(source_type, value, cache_key, deadline=None, image_data=None):
+    """
+    缓存未命中时获取图像、识别并保存结果，超时的部分结果不保存
+
+    image_data: 已解码的Base64图像数据（内容寻址模式计算缓存键时已解码）
+
+    下载及Base64保存的图片留在缓存目录中（由缓存清理线程按时间和数量淘汰），
+    同一URL再次请求时可用ETag/Last-Modified条件请求重新验证；上传文件的副本用完即删
+    """
+    temp_path = None
+    
+    try:
+        if source_type == 'image_url':
+            # 下载图片（已缓存时重新验证）
+            source_path, cache_key = cache_manager.download_image(value, deadline)
+        elif source_type == 'image_base64':
+            # 保存图片
+            source_path, cache_key = cache_manager.save_base64_image(value, cache_key, image_data)
+        elif source_type == 'image_path':
+            source_path = value
+        else:
+            # 复制上传的文件到缓存目录
             cache_path = os.path.join(CACHE_DIR, f"{cache_key}.jpg")
-            shutil.copy2(temp_path, cache_path)
-            os.remove(temp_path)  # 删除临时文件
+            shutil.copy2(value, cache_path)
             temp_path = cache_path
-            
-            result = image_processor.mixed_recognition(temp_path, is_temp=False)  # 不删除缓存图片
-            
-        else:
-            # 统一错误返回格式
-            return jsonify({
-                "code": 400,
-                "message": "未提供图像数据",
-                "data": {
-                    "type": "error",
-                    "imageType": ImageType.UNKNOWN,
-                    "imageTypeName": IMAGE_TYPE_NAMES[ImageType.UNKNOWN],
-                    "ocrContent": "",
-                    "qrContent": "",
-                    "qrType": "",
-                    "qrTypeName": "",
-                    "error": "未提供图像数据"
-                }
-            })
+            source_path = temp_path
+        
+        # 内容寻址模式：按完整内容哈希再查一次，同一图片不论来源都能命中
+        alias_keys = []
+        if cache_manager.content_addressed:
+            alias_keys = cache_manager.get_alias_keys(source_path, cache_key)
+            cached_result = cache_manager.get_cached_result_by_keys(alias_keys)
+            if cached_result:
+                app.logger.info(f'使用内容缓存结果: {cache_key}')
+                cache_manager.save_to_cache(cache_key, cached_result)
+                return cached_result
+        
+        # 近重复查找：不同裁剪、压缩的相似图片复用已缓存的结果
+        frame = None
+        image_hash = None
+        if cache_manager.near_duplicate_enabled:
+            if frame is None:
+                frame = FrameContext.from_path(source_path)
+            if frame is not None:
+                # 先解码二维码（很快，mixed_recognition直接复用），近重复查找据此排除二维码图片
+                frame.qr_results = QRCodeService.decode_qrcode(frame.gray)
+                similar_result, image_hash = cache_manager.find_similar_result(frame)
+                if similar_result:
+                    frame.release()
+                    return similar_result
+        
+        result = image_processor.mixed_recognition(frame or source_path, is_temp=False,  # 不删除缓存图片
+                                                   deadline=deadline)
+        if result.get("partial"):
+            return result
         
         # 保存结果到缓存
-        if cache_key:
-            cache_manager.save_to_cache(cache_key, result)
+        for key in [cache_key] + alias_keys:
+            if key:
+                cache_manager.save_to_cache(key, result)
         
-        # 统一成功返回格式
-        return jsonify({
-            "code": 200,
-            "message": "成功",
-            "data": result
-        })
+        # 加入近重复索引（二维码、证件及银行卡结果不复用，不加入）
+        if image_hash is not None and cache_key and cache_manager.similar_reusable(result):
+            cache_manager.index_similar(image_hash, cache_key)
         
-    except Exception as e:
-        # 统一错误返回格式
-        error_result = {
-            "code": 500,
-            "message": str(e),
-            "data": {
-                "type": "error",
-                "imageType": ImageType.UNKNOWN,
-                "imageTypeName": IMAGE_TYPE_NAMES[ImageType.UNKNOWN],
-                "ocrContent": "",
-                "qrContent": "",
-                "qrType": "",
-                "qrTypeName": "",
-                "error": str(e)
-            }
-        }
-        return jsonify(error_result)
+        return result
     finally:
-        # 确保临时文件被删除
+        # 确保上传文件的副本被删除
         if temp_path and os.path.exists(temp_path):
             try:
                 os.remove(temp_path)
             except Exception as e:
-                print(f"清理临时文件失败: {temp_path}, 错误: {str(e)}")
\ No newline at end of file
+                print(f"清理临时文件失败: {temp_path}, 错误: {str(e)}")
+
+@register_collector
+def collect_component_stats():
+    """写入指标快照前，从内存缓存、缓存清理及任务队列的统计更新仪表"""
+    for stat, value in cache_manager.cache_stats().items():
+        MEMORY_CACHE.set(value, stat=stat)
+    for stat, value in cache_manager.janitor_stats().items():
+        CACHE_DIR_USAGE.set(value, stat=stat)
+    for stat, value in job_queue.stats().items():
+        JOBS.set(value, stat=stat)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_api():
+    """
+    Prometheus格式的指标：各阶段耗时直方图、缓存命中、错误计数、进行中的请求数等
+    
+    汇总所有工作进程的指标快照，无论由哪个进程响应结果都一致
+    """
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/jobs', methods=['POST'])
+def submit_job_api():
+    """
+        提交异步识别任务，立即返回任务ID
+        参数:
+            image_url / image_base64 / image_path / image: 同 /recognize
+            callback_url:   可选，任务完成后POST结果到该地址
+            priority:       可选，优先级（数字越小越优先）
+    """
+    try:
+        priority = int(request.form.get('priority', JOB_DEFAULT_PRIORITY))
+    except ValueError:
+        priority = JOB_DEFAULT_PRIORITY
+    source_type, value = request_source()
+    if source_type is None:
+        return jsonify({
+            "code": 400,
+            "message": "未提供图像数据",
+            "data": error_data("未提供图像数据")
+        })
+    
+    try:
+        job = job_queue.submit(source_type, value, priority, request.form.get('callback_url'))
+    except QueueFullError as e:
+        if source_type == 'image' and os.path.exists(value):
+            os.remove(value)
+        return jsonify({
+            "code": 429,
+            "message": str(e),
+            "data": error_data(str(e))
+        }), 429
+    
+    return jsonify({
+        "code": 200,
+        "message": "成功",
+        "data": job.to_dict()
+    })
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_api(job_id):
+    """查询异步识别任务的状态及结果"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({
+            "code": 404,
+            "message": "任务不存在",
+            "data": error_data("任务不存在")
+        })
+    return jsonify({
+        "code": 200,
+        "message": "成功",
+        "data": job.to_dict()
+    })
+
+@app.route('/stats', methods=['GET'])
+def stats_api():
+    """缓存、缓存清理及请求合并的统计"""
+    return jsonify({
+        "code": 200,
+        "message": "成功",
+        "data": {
+            "memoryCache": cache_manager.cache_stats(),
+            "janitor": cache_manager.janitor_stats(),
+            "singleFlight": recognition_flight.stats(),
+            "jobs": job_queue.stats()
+        }
+    })
+
+def request_source():
+    """获取请求中的图像数据，返回 (source_type, value)，上传的文件先保存为临时文件"""
+    if 'image_url' in request.form:
+        return 'image_url', request.form['image_url']
+    if 'image_base64' in request.form:
+        return 'image_base64', request.form['image_base64']
+    if 'image_path' in request.form:
+        return 'image_path', request.form['image_path']
+    if 'image' in request.files:
+        return 'image', save_upload(request.files['image'])
+    return None, None
+
+def profile_requested():
+    """请求是否要求性能剖析（X-Profile请求头或profile表单字段为1/true）"""
+    flag = request.headers.get(PROFILE_HEADER) or request.form.get('profile') or ''
+    return flag.lower() in ('1', 'true')
+
+@app.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile_api(profile_id):
+    """查看性能剖析结果的文本摘要（完整的.prof文件在日志目录的profiles子目录中）"""
+    path = profile_summary_path(profile_id)
+    if path is None:
+        return jsonify({
+            "code": 404,
+            "message": "剖析结果不存在",
+            "data": error_data("剖析结果不存在")
+        })
+    with open(path, encoding='utf-8') as f:
+        return Response(f.read(), mimetype='text/plain; charset=utf-8')
+
+@app.route('/recognize', methods=['POST'])
+def recognize_image_api():
+    """
+        图像识别API - 支持网络图片URL、Base64编码的图像、本地图像路径和上传的图像文件
+        参数:
+            image_url:      网络图片URL
+            image_base64:   Base64编码的图像数据
+            image_path:     本地图像路径（绝对路径）
+            image:          上传的图像文件
+            profile:        可选，为1时性能剖析本次请求（也可用X-Profile请求头，需开启PROFILE_ENABLED）
+        处理期限为REQUEST_TIMEOUT秒，超时返回408及已完成阶段的部分结果
+        剖析的请求在返回中带profileId，结果可通过 /profiles/<profileId> 查看
+    """
+    start_time = time.time()
+    with profile_request('recognize', profile_requested()) as profile:
+        deadline = Deadline(REQUEST_TIMEOUT)
+        source_type, value = request_source()
+        code, message, data = recognize_source(source_type, value, deadline)
+    elapsed = time.time() - start_time
+    if elapsed > REQUEST_TIMEOUT * 0.8:  # 如果执行时间超过阈值的80%，记录警告
+        app.logger.warning(f"请求处理时间较长: {elapsed:.2f}秒")
+    # 统一返回格式
+    response = {
+        "code": code,
+        "message": message,
+        "data": data
+    }
+    if profile is not None and profile.path:
+        app.logger.info(f'请求剖析结果: {profile.path}')
+        response["profileId"] = profile.profile_id
+    return jsonify(response)
+
+def collect_batch_items():
+    """
+    解析批量请求中的图像列表，返回 [(source_type, value), ...]
+    
+    JSON请求: {"images": [{"image_url": ...}, {"image_base64": ...}, {"image_path": ...}]}
+              或 {"image_urls": [...], "images_base64": [...], "image_paths": [...]}
+    表单请求: 重复的 image_url / image_base64 / image_path 字段及多个 image 文件
+    """
+    items = []
+    payload = request.get_json(silent=True) if request.is_json else None
+    if isinstance(payload, dict):
+        for entry in payload.get("images") or []:
+            if isinstance(entry, dict):
+                source_type = next((key for key in BATCH_SOURCE_TYPES if key in entry), None)
+                items.append((source_type, entry.get(source_type)))
+            else:
+                items.append((None, None))
+        for key, source_type in BATCH_LIST_FIELDS.items():
+            items.extend((source_type, value) for value in payload.get(key) or [])
+    else:
+        for source_type in BATCH_SOURCE_TYPES:
+            items.extend((source_type, value) for value in request.form.getlist(source_type))
+    # 上传的文件在请求线程中保存为临时文件后，工作线程只处理文件路径
+    items.extend(('image', image_file) for image_file in request.files.getlist('image'))
+    return items
+
+def recognize_batch_item(index, source_type, value):
+    """批量接口中识别单张图像，记录耗时"""
+    start_time = time.time()
+    code, message, data = recognize_source(source_type, value)
+    return {
+        "index": index,
+        "code": code,
+        "message": message,
+        "data": data,
+        "time": round(time.time() - start_time, 2)
+    }
+
+@app.route('/recognize/batch', methods=['POST'])
+def recognize_batch_api():
+    """
+        批量图像识别API - 在有界线程池中并行识别，结果按输入顺序返回
+        参数:
+            images:         JSON列表，每项为 {"image_url"|"image_base64"|"image_path": ...}
+            image_urls / images_base64 / image_paths: JSON列表
+            image_url / image_base64 / image_path:    表单字段，可重复
+            image:          上传的图像文件，可多个
+    """
+    start_time = time.time()
+    items = collect_batch_items()
+    if not items:
+        return jsonify({
+            "code": 400,
+            "message": "未提供图像数据",
+            "data": error_data("未提供图像数据")
+        })
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({
+            "code": 413,
+            "message": f"图像数量超过上限 {BATCH_MAX_ITEMS}",
+            "data": error_data(f"图像数量超过上限 {BATCH_MAX_ITEMS}")
+        })
+    
+    # 保存上传的文件
+    items = [(source_type, save_upload(value) if source_type == 'image' else value)
+             for source_type, value in items]
+    
+    futures = [batch_executor.submit(recognize_batch_item, index, source_type, value)
+               for index, (source_type, value) in enumerate(items)]
+    results = [future.result() for future in futures]
+    
+    succeeded = sum(1 for item in results if item["code"] == 200)
+    return jsonify({
+        "code": 200,
+        "message": "成功",
+        "data": {
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "time": round(time.time() - start_time, 2),
+            "results": results
+        }
+    })
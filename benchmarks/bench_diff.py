@@ -0,0 +1,70 @@
+import sys
+import json
+import argparse
+"""
+对比两次 bench_pipeline.py 的结果JSON，列出各目标、各类别的耗时变化；
+任一项超过阈值变慢时返回非零退出码，可用于发布前的回归检查
+
+用法:
+    python benchmarks/bench_diff.py <基线.json> <新结果.json> [--metric p95_ms] [--threshold 10] [--min-ms 1]
+"""
+
+METRICS = ["mean_ms", "p50_ms", "p95_ms", "p99_ms", "throughput"]
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def change(old, new, metric):
+    """返回变慢的百分比（吞吐量下降同样记为正数）"""
+    if not old:
+        return 0.0
+    percent = (new - old) / old * 100
+    return -percent if metric == "throughput" else percent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比两次基准测试结果")
+    parser.add_argument("baseline", help="基线结果JSON")
+    parser.add_argument("current", help="新结果JSON")
+    parser.add_argument("--metric", choices=METRICS, default="p95_ms", help="判断回归的指标")
+    parser.add_argument("--threshold", type=float, default=10.0, help="变慢超过该百分比视为回归")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="耗时指标的绝对变化小于该毫秒数时不视为回归（排除计时噪声）")
+    args = parser.parse_args()
+
+    baseline, current = load(args.baseline), load(args.current)
+    for name, report in (("基线", baseline), ("新结果", current)):
+        meta = report.get("meta", {})
+        print(f"{name}: commit {meta.get('commit')}，{meta.get('time')}，{meta.get('images')} 张图片 × "
+              f"{meta.get('rounds')} 轮，Python {meta.get('python')}")
+
+    print(f"\n{'目标':<18}{'类别':<14}{'基线':>12}{'新结果':>12}{'变化':>10}")
+    regressions = []
+    for target, by_category in current["results"].items():
+        for category, stats in by_category.items():
+            old_stats = baseline["results"].get(target, {}).get(category)
+            if old_stats is None:
+                print(f"{target:<18}{category:<14}{'-':>12}{stats[args.metric]:>12.2f}{'新增':>10}")
+                continue
+            old, new = old_stats[args.metric], stats[args.metric]
+            slower = change(old, new, args.metric)
+            flag = ""
+            noise = args.metric != "throughput" and abs(new - old) < args.min_ms
+            if slower > args.threshold and not noise:
+                flag = "  <- 回归"
+                regressions.append((target, category, slower))
+            print(f"{target:<18}{category:<14}{old:>12.2f}{new:>12.2f}{slower:>+9.1f}%{flag}")
+            old_types, new_types = old_stats.get("types"), stats.get("types")
+            if old_types is not None and new_types is not None and old_types != new_types:
+                print(f"{'':<32}结果类型变化: {old_types} -> {new_types}")
+
+    if regressions:
+        print(f"\n{len(regressions)} 项 {args.metric} 变慢超过 {args.threshold}%")
+        sys.exit(1)
+    print(f"\n没有 {args.metric} 变慢超过 {args.threshold}% 的项")
+
+
+if __name__ == "__main__":
+    main()
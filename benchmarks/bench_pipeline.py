@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import shutil
+import tempfile
+import platform
+import argparse
+import subprocess
+from collections import Counter
+"""
+识别流程基准: 在合成语料上直接调用 QRCodeService / ImageProcessor.mixed_recognition / CacheManager，
+并经Flask测试客户端调用 /recognize，按图像类别统计吞吐量及 p50/p95/p99 耗时，结果写入JSON供 bench_diff.py 对比
+
+用法:
+    python benchmarks/bench_pipeline.py [--corpus bench_corpus] [--per-category 10] [--seed 0]
+                                        [--rounds 3] [--targets qr,pipeline,cache,http] [--backend json]
+                                        [--output bench_result.json]
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_corpus import CATEGORIES, generate_corpus
+
+TARGETS = ["qr", "pipeline", "cache", "http"]
+
+
+def percentile(sorted_values, p):
+    """最近秩百分位数"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(durations, wall):
+    """耗时列表（秒）-> 统计（毫秒），wall为该组的总耗时，用于计算吞吐量"""
+    values = sorted(durations)
+    return {
+        "n": len(values),
+        "throughput": round(len(values) / wall, 2) if wall > 0 else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+    }
+
+
+class Recorder:
+    """按 (目标, 类别) 收集单次耗时及结果类型"""
+    def __init__(self):
+        self.durations = {}
+        self.walls = {}
+        self.types = {}
+
+    def measure(self, target, category, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        key = (target, category)
+        self.durations.setdefault(key, []).append(elapsed)
+        self.walls[key] = self.walls.get(key, 0.0) + elapsed
+        if isinstance(result, dict) and "type" in result:
+            self.types.setdefault(key, Counter())[result["type"]] += 1
+        elif isinstance(result, list):
+            # 二维码解码结果：记录是否解出
+            self.types.setdefault(key, Counter())["decoded" if result else "none"] += 1
+        return result
+
+    def report(self):
+        report = {}
+        for (target, category), durations in sorted(self.durations.items()):
+            stats = summarize(durations, self.walls[(target, category)])
+            if (target, category) in self.types:
+                stats["types"] = dict(self.types[(target, category)])
+            report.setdefault(target, {})[category] = stats
+        # 每个目标再汇总全部类别
+        for target in report:
+            durations = [d for (t, _), values in self.durations.items() if t == target for d in values]
+            wall = sum(w for (t, _), w in self.walls.items() if t == target)
+            report[target]["all"] = summarize(durations, wall)
+        return report
+
+
+def bench_qr(recorder, items, rounds):
+    """二维码解码：与识别流程相同，传入原始分辨率的灰度图"""
+    from frame_context import FrameContext
+    from qrcode_service import QRCodeService
+    frames = [(item["category"], FrameContext.from_path(item["path"])) for item in items]
+    for _ in range(rounds):
+        for category, frame in frames:
+            recorder.measure("qr", category, QRCodeService.decode_qrcode, frame.gray)
+
+
+def bench_pipeline(recorder, items, rounds, app):
+    """完整识别流程（含图像解码），不经过缓存"""
+    from image_processor import ImageProcessor
+    processor = ImageProcessor(app)
+    for _ in range(rounds):
+        for item in items:
+            recorder.measure("pipeline", item["category"], processor.mixed_recognition, item["path"])
+
+
+def bench_cache(recorder, items, rounds, app):
+    """结果缓存：写入、内存命中、磁盘命中（清空内存缓存后读取）"""
+    from cache_manager import CacheManager
+    manager = CacheManager(app)
+    result = {"type": "text", "data": "基准测试" * 50, "texts": ["基准测试"] * 20}
+    for round_index in range(rounds):
+        keys = [(item["category"], f"bench_{round_index}_{index}") for index, item in enumerate(items)]
+        for category, key in keys:
+            recorder.measure("cache_put", category, manager.save_to_cache, key, result)
+        for category, key in keys:
+            recorder.measure("cache_get_memory", category, manager.get_cached_result, key)
+        manager.clear_memory_cache()
+        for category, key in keys:
+            recorder.measure("cache_get_disk", category, manager.get_cached_result, key)
+
+
+def bench_http(recorder, items, rounds, app, workdir):
+    """
+    经Flask测试客户端POST /recognize
+
+    每轮把图片复制一份并在PNG结尾后追加随机字节（解码结果不变、缓存键不同），
+    第一次请求为缓存未命中（http_cold），紧接着的第二次为缓存命中（http_warm）
+    """
+    client = app.test_client()
+
+    def post(path):
+        response = client.post('/recognize', data={'image_path': path})
+        body = response.get_json()
+        return body.get("data") if body else None
+
+    for round_index in range(rounds):
+        for index, item in enumerate(items):
+            path = os.path.join(workdir, f"http_{round_index}_{index}.png")
+            shutil.copyfile(item["path"], path)
+            with open(path, "ab") as f:
+                f.write(uuid.uuid4().bytes)
+            recorder.measure("http_cold", item["category"], post, path)
+            recorder.measure("http_warm", item["category"], post, path)
+            os.remove(path)
+
+
+def use_temporary_store(backend, workdir):
+    """结果缓存改用临时目录，避免读到历史结果或在缓存目录中留下基准数据"""
+    import cache_manager
+    from cache_store import JsonFileStore, SQLiteStore
+    store_dir = os.path.join(workdir, "store")
+    os.makedirs(store_dir, exist_ok=True)
+    if backend == "sqlite":
+        store = SQLiteStore(os.path.join(store_dir, "results.db"))
+    else:
+        store = JsonFileStore(store_dir)
+    original = cache_manager.create_store
+    cache_manager.create_store = lambda backend=None: store
+    cache_manager.RESULT_CACHE.clear()
+    return original
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="识别流程基准")
+    parser.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "qrscan_bench_corpus"),
+                        help="语料目录（不存在manifest.json时自动生成）")
+    parser.add_argument("--per-category", type=int, default=10, help="生成语料时每个类别的图片数量")
+    parser.add_argument("--seed", type=int, default=0, help="生成语料的随机种子")
+    parser.add_argument("--font", help="生成语料使用的中文字体文件")
+    parser.add_argument("--categories", default=",".join(CATEGORIES), help="参与测试的图像类别，逗号分隔")
+    parser.add_argument("--rounds", type=int, default=3, help="每个目标重复的轮数")
+    parser.add_argument("--warmup", type=int, default=1, help="正式计时前的预热轮数（加载OCR模型等）")
+    parser.add_argument("--targets", default=",".join(TARGETS), help="测试目标，逗号分隔: " + ",".join(TARGETS))
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json", help="结果缓存后端")
+    parser.add_argument("--output", default="bench_result.json", help="结果JSON文件")
+    args = parser.parse_args()
+
+    targets = [t for t in args.targets.split(",") if t]
+    categories = [c for c in args.categories.split(",") if c]
+    unknown = [t for t in targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"未知的测试目标: {','.join(unknown)}")
+    manifest_path = os.path.join(args.corpus, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    else:
+        generate_corpus(args.corpus, args.per_category, args.seed, args.font)
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    items = [item for item in manifest["items"] if item["category"] in categories]
+    print(f"语料: {args.corpus}，{len(items)} 张图片，种子 {manifest['seed']}，字体 {manifest['font']}")
+
+    workdir = tempfile.mkdtemp(prefix="qrscan_bench_")
+    original_create_store = use_temporary_store(args.backend, workdir)
+    try:
+        from app import app
+
+        if args.warmup and ("pipeline" in targets or "http" in targets):
+            warmup = Recorder()
+            bench_pipeline(warmup, items, args.warmup, app)
+
+        recorder = Recorder()
+        for target in targets:
+            start = time.perf_counter()
+            if target == "qr":
+                bench_qr(recorder, items, args.rounds)
+            elif target == "pipeline":
+                bench_pipeline(recorder, items, args.rounds, app)
+            elif target == "cache":
+                bench_cache(recorder, items, args.rounds, app)
+            elif target == "http":
+                bench_http(recorder, items, args.rounds, app, workdir)
+            print(f"{target}: {time.perf_counter() - start:.1f} s")
+    finally:
+        import cache_manager
+        cache_manager.create_store = original_create_store
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "seed": manifest["seed"],
+            "font": manifest["font"],
+            "images": len(items),
+            "rounds": args.rounds,
+            "backend": args.backend,
+            "targets": targets,
+        },
+        "results": recorder.report(),
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"\n{'目标':<18}{'类别':<14}{'数量':>6}{'吞吐(/s)':>12}{'p50(ms)':>11}{'p95(ms)':>11}{'p99(ms)':>11}")
+    for target, by_category in report["results"].items():
+        for category, stats in by_category.items():
+            print(f"{target:<18}{category:<14}{stats['n']:>6}{stats['throughput']:>12.1f}"
+                  f"{stats['p50_ms']:>11.2f}{stats['p95_ms']:>11.2f}{stats['p99_ms']:>11.2f}")
+    print(f"\n结果已写入: {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
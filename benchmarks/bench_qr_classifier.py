@@ -0,0 +1,206 @@
+import os
+import sys
+import re
+import time
+import json
+import argparse
+"""
+二维码类型分类基准: 对比旧版逐个前缀/正则判断与预编译分类器的耗时，并校验结果一致
+
+用法:
+    python benchmarks/bench_qr_classifier.py [--rounds 2000] [--corpus payloads.txt]
+"""
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import QRCodeType, QR_TYPE_NAMES, QR_TYPE_PREFIXES
+from qr_classifier import QRClassifier
+
+# 常见的真实二维码内容
+CORPUS = [
+    "wxp://f2f0Yf9mNqv2bZz3cR4X0l7rJcVtGfJ1a8dQ",
+    "https://payapp.weixin.qq.com/qr/AQEVg0x1Q2hKc3pBR2hZ?t=1",
+    "https://qr.alipay.com/fkx17537okxvqc3y1lkci1b",
+    "HTTPS://QR.ALIPAY.COM/FKX12345ABCDEFGHIJKLMN",
+    "alipays://platformapi/startapp?appId=20000067&url=https%3A%2F%2Frender.alipay.com",
+    "https://u.wechat.com/MHqQ6wOuLmJ8dWwN0zvS2Y8",
+    "https://weixin.qq.com/r/7Ukn-8HEqS5JrV0A9xn7",
+    "https://open.weixin.qq.com/connect/qrconnect?appid=wx123&redirect_uri=https%3A%2F%2Fexample.com",
+    "https://wxaurl.cn/Jk9sD8qLm2r",
+    "upapi://pay?pa=merchant@bank&pn=Store&am=12.00",
+    "https://qr.95516.com/00010000/01234567890123456789012345678901",
+    "https://v.douyin.com/iJkLmNoP/",
+    "https://m.tb.cn/h.5ZxY9Qa?tk=abc",
+    "taobao://item.taobao.com/item.htm?id=6543210987",
+    "https://item.m.jd.com/product/100012043978.html",
+    "openapp.jdmobile://virtual?params=%7B%22category%22%3A%22jump%22%7D",
+    "https://i.meituan.com/awp/h5/lottery/index.html",
+    "diditaxi://router/page/home",
+    "WIFI:S:Office-5G;T:WPA;P:s3cretpass;H:false;;",
+    "BEGIN:VCARD\nVERSION:3.0\nN:Zhang;San\nTEL:13800138000\nEND:VCARD",
+    "MECARD:N:Li,Si;TEL:13900139000;EMAIL:lisi@example.com;;",
+    "tel:+8613800138000",
+    "SMSTO:10086:查询话费",
+    "mailto:support@example.com?subject=hello",
+    "BEGIN:VCALENDAR\nBEGIN:VEVENT\nSUMMARY:会议\nEND:VEVENT\nEND:VCALENDAR",
+    "geo:39.9042,116.4074",
+    "https://example.com/pay?amount=12.50&order=8812",
+    "http://www.example.org/article/2023/08/23/qr-code-usage.html",
+    "收款码 店铺: 老王小卖部 pay",
+    "ICBC手机银行转账 账号 6222021234567890128",
+    "微信支付 商户 1234567890",
+    "支付宝扫一扫 领红包",
+    "云闪付 银联二维码收款",
+    "加我微信 abc123",
+    "order_id=9981&total_fee=100",
+    "tiktok user @somebody",
+    "滴滴出行 didichuxing",
+    "美团外卖优惠券 meituan",
+    "京东 jd.com 会员",
+    "shoukuan platform qrcode 123",
+    "SN: A1B2C3D4E5F6 生产日期 2023-08-23",
+    "这是一段普通的文本内容，没有任何特殊的前缀或关键词",
+    "",
+]
+
+
+# 旧版实现（用于对比）
+def identify_qrcode_type(qr_data):
+    """识别二维码类型"""
+    if not qr_data:
+        return QRCodeType.UNKNOWN, QR_TYPE_NAMES[QRCodeType.UNKNOWN]
+
+    # 检查每种类型的前缀
+    for qr_type, prefixes in QR_TYPE_PREFIXES.items():
+        for prefix in prefixes:
+            if qr_data.lower().startswith(prefix.lower()):
+                return qr_type, QR_TYPE_NAMES[qr_type]
+
+    # 特殊情况处理
+    # 微信支付特殊情况
+    if re.search(r'(微信支付|wxpay)', qr_data, re.I):
+        return QRCodeType.WX_PAY, QR_TYPE_NAMES[QRCodeType.WX_PAY]
+
+    # 支付宝特殊情况
+    if re.search(r'(支付宝|alipay)', qr_data, re.I):
+        return QRCodeType.ALIPAY, QR_TYPE_NAMES[QRCodeType.ALIPAY]
+
+    # 云闪付特殊情况
+    if re.search(r'(银联|云闪付|unionpay)', qr_data, re.I):
+        return QRCodeType.UNION_PAY, QR_TYPE_NAMES[QRCodeType.UNION_PAY]
+
+    # 银行支付特殊情况
+    if re.search(r'(icbc|ccb|abc|boc|cmb|bankcard|网银|手机银行|转账)', qr_data, re.I):
+        return QRCodeType.BANK_PAY, QR_TYPE_NAMES[QRCodeType.BANK_PAY]
+
+    # 微信特殊情况
+    if re.search(r'(微信|weixin)', qr_data, re.I) and not re.search(r'(支付|pay)', qr_data, re.I):
+        return QRCodeType.WEIXIN, QR_TYPE_NAMES[QRCodeType.WEIXIN]
+
+    # 抖音特殊情况
+    if re.search(r'(抖音|douyin|tiktok)', qr_data, re.I):
+        return QRCodeType.DOUYIN, QR_TYPE_NAMES[QRCodeType.DOUYIN]
+
+    # 淘宝特殊情况
+    if re.search(r'(淘宝|taobao)', qr_data, re.I):
+        return QRCodeType.TAOBAO, QR_TYPE_NAMES[QRCodeType.TAOBAO]
+
+    # 京东特殊情况
+    if re.search(r'(京东|jd\.com)', qr_data, re.I):
+        return QRCodeType.JD, QR_TYPE_NAMES[QRCodeType.JD]
+
+    # 美团特殊情况
+    if re.search(r'(美团|meituan)', qr_data, re.I):
+        return QRCodeType.MEITUAN, QR_TYPE_NAMES[QRCodeType.MEITUAN]
+
+    # 滴滴特殊情况
+    if re.search(r'(滴滴|didi)', qr_data, re.I):
+        return QRCodeType.DIDI, QR_TYPE_NAMES[QRCodeType.DIDI]
+
+    # URL类型
+    if re.search(r'^https?://', qr_data, re.I):
+        return QRCodeType.URL, QR_TYPE_NAMES[QRCodeType.URL]
+
+    # 默认为文本类型
+    return QRCodeType.TEXT, QR_TYPE_NAMES[QRCodeType.TEXT]
+
+def is_payment_qrcode(qr_data):
+    """判断二维码是否为收款码"""
+    # 微信支付正则
+    wechat_pattern = r'^(wxp://|https?://payapp\.weixin\.qq\.com/|weixin://)'
+    if re.search(wechat_pattern, qr_data, re.I):
+        return True, "微信收款码"
+
+    # 支付宝正则（扩展版）
+    alipay_pattern = r'(https?://(qr|mapi)\.alipay\.com/|alipays://platformapi/startapp\?|ALIPAY:\/\/|支付宝|alipay)'
+    if re.search(alipay_pattern, qr_data, re.I):
+        return True, "支付宝收款码"
+
+    # 银联云闪付正则
+    if re.search(r'(unionpay|upapi|uppay|银联|云闪付)', qr_data, re.I):
+        return True, "云闪付收款码"
+
+    # 银行直连正则
+    bank_pattern = r'(icbc|ccb|abc|boc|cmb|bankcard|网银|手机银行|转账)'
+    if re.search(bank_pattern, qr_data, re.I):
+        return True, "银行收款码"
+
+    # 金额参数检测 - 提高优先级，放在平台检测前
+    if re.search(r'(amount|money|total_fee)=[\d.]+', qr_data):
+        return True, "含金额参数的收款码"
+
+    # 支付平台正则 - 更严格的条件
+    platform_pattern = r'(pay|付款|shoukuan|收钱|收款|platform|qrcode)'
+    if re.search(platform_pattern, qr_data, re.I) and len(qr_data) < 150 and not re.search(r'http', qr_data, re.I):
+        return True, "第三方支付平台"
+
+    return False, ""
+
+
+
+def legacy_classify(qr_data):
+    """旧版：类型与收款码判断分别扫描"""
+    qr_type, qr_type_name = identify_qrcode_type(qr_data)
+    is_payment, payment_type = is_payment_qrcode(qr_data)
+    return {
+        "code": qr_type,
+        "name": qr_type_name,
+        "is_payment": is_payment,
+        "payment_type": payment_type if is_payment else None
+    }
+
+
+def timeit(func, corpus, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for data in corpus:
+            func(data)
+    return (time.perf_counter() - start) / (rounds * len(corpus)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="二维码类型分类基准")
+    parser.add_argument("--rounds", type=int, default=2000, help="语料重复次数")
+    parser.add_argument("--corpus", help="额外的语料文件，每行一个二维码内容")
+    args = parser.parse_args()
+
+    corpus = list(CORPUS)
+    if args.corpus:
+        with open(args.corpus, 'r', encoding='utf-8') as f:
+            corpus.extend(line.rstrip("\n") for line in f)
+
+    # 校验结果一致
+    mismatches = [data for data in corpus if legacy_classify(data) != QRClassifier.classify(data)]
+    for data in mismatches:
+        print(json.dumps({"data": data, "legacy": legacy_classify(data),
+                          "classifier": QRClassifier.classify(data)}, ensure_ascii=False))
+
+    legacy_us = timeit(legacy_classify, corpus, args.rounds)
+    classifier_us = timeit(QRClassifier.classify, corpus, args.rounds)
+    print(f"语料数量: {len(corpus)}, 结果不一致: {len(mismatches)}")
+    print(f"旧版: {legacy_us:.2f} us/条")
+    print(f"分类器: {classifier_us:.2f} us/条 (提速 {legacy_us / classifier_us:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
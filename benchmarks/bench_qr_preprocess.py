@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import cv2
+"""
+二维码解码前处理基准: 在合成语料上对比三种方式的耗时及解出率
+    legacy    原始分辨率的BGR数组直接交给pyzbar（pyzbar只取蓝色通道，zbar扫描整幅图像）
+    gray      原始分辨率的灰度数组交给pyzbar
+    detector  QRDetector：按模块大小选择分辨率，以连续单通道缓冲区 (bytes, 宽, 高) 交给zbar，失败时解码候选区域
+结果JSON与 bench_pipeline.py 格式相同，可用 bench_diff.py 对比
+
+用法:
+    python benchmarks/bench_qr_preprocess.py [--corpus 目录] [--per-category 10] [--long-side 4000]
+                                             [--rounds 3] [--output qr_preprocess.json]
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pyzbar import pyzbar
+from qr_detector import QRDetector
+from synthetic_corpus import generate_corpus
+from bench_pipeline import Recorder, git_commit
+
+MODES = {
+    "legacy": lambda image: pyzbar.decode(image),
+    "gray": lambda image: pyzbar.decode(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)),
+    "detector": lambda image: QRDetector.detect(image),
+}
+
+
+def load_images(corpus, per_category, seed, long_side):
+    """读取语料（不存在时生成），long_side大于0时把图像放大到该长边，模拟手机拍摄的大图"""
+    manifest_path = os.path.join(corpus, "manifest.json")
+    if not os.path.exists(manifest_path):
+        generate_corpus(corpus, per_category, seed)
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    images = []
+    for item in manifest["items"]:
+        image = cv2.imread(item["path"])
+        if long_side and max(image.shape[:2]) < long_side:
+            scale = long_side / max(image.shape[:2])
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+        images.append((item["category"], image))
+    return manifest, images
+
+
+def main():
+    parser = argparse.ArgumentParser(description="二维码解码前处理基准")
+    parser.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "qrscan_bench_corpus"),
+                        help="语料目录（不存在manifest.json时自动生成）")
+    parser.add_argument("--per-category", type=int, default=10, help="生成语料时每个类别的图片数量")
+    parser.add_argument("--seed", type=int, default=0, help="生成语料的随机种子")
+    parser.add_argument("--long-side", type=int, default=4000, help="把图像放大到该长边（0为原尺寸），默认约1200万像素")
+    parser.add_argument("--rounds", type=int, default=3, help="重复轮数")
+    parser.add_argument("--modes", default=",".join(MODES), help="对比的方式，逗号分隔: " + ",".join(MODES))
+    parser.add_argument("--output", help="结果JSON文件")
+    args = parser.parse_args()
+
+    modes = [mode for mode in args.modes.split(",") if mode]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"未知的方式: {','.join(unknown)}")
+    manifest, images = load_images(args.corpus, args.per_category, args.seed, args.long_side)
+    print(f"语料: {args.corpus}，{len(images)} 张图片，长边 {args.long_side or '原尺寸'}")
+
+    recorder = Recorder()
+    for mode in modes:
+        decode = MODES[mode]
+        decode(images[0][1])
+        for _ in range(args.rounds):
+            for category, image in images:
+                recorder.measure(mode, category, decode, image)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "seed": manifest["seed"],
+            "images": len(images),
+            "rounds": args.rounds,
+            "long_side": args.long_side,
+            "targets": modes,
+        },
+        "results": recorder.report(),
+    }
+
+    print(f"\n{'类别':<14}" + "".join(f"{mode + ' p50/p95(ms)':>26}{'解出':>8}" for mode in modes))
+    categories = [category for category in report["results"][modes[0]] if category != "all"]
+    for category in categories + ["all"]:
+        line = f"{category:<14}"
+        for mode in modes:
+            stats = report["results"][mode][category]
+            types = stats.get("types")
+            decoded = f"{types.get('decoded', 0)}/{stats['n']}" if types is not None else "-"
+            line += f"{stats['p50_ms']:>15.1f} / {stats['p95_ms']:<8.1f}{decoded:>8}"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入: {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
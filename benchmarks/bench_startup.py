@@ -0,0 +1,102 @@
+import os
+import sys
+import re
+import time
+import tempfile
+import argparse
+import subprocess
+"""
+启动耗时基准: 在独立进程中用 -X importtime 测量各模块的导入耗时，列出自身耗时最多的包；
+可选测量命令行二维码快速路径的端到端耗时及首次加载OCR模型的耗时
+
+用法:
+    python benchmarks/bench_startup.py [--top 15] [--rounds 3] [--cli] [--with-ocr]
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 按依赖从轻到重排列的入口模块
+MODULES = ["config", "qrcode_service", "ocr_service", "image_processor", "cache_manager", "app"]
+
+# -X importtime 的输出行: import time: self [us] | cumulative | imported package
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def run_python(args):
+    """在仓库根目录启动新的解释器，返回 (耗时毫秒, 结果)"""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable] + args, cwd=ROOT, capture_output=True, text=True)
+    return (time.perf_counter() - start) * 1000, completed
+
+
+def import_profile(module):
+    """返回 (进程耗时毫秒, 模块累计导入耗时毫秒, [(自身耗时毫秒, 包名), ...])"""
+    elapsed, completed = run_python(["-X", "importtime", "-c", f"import {module}"])
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    entries = []
+    cumulative = 0
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        entries.append((int(self_us) / 1000, name))
+        # 顶层模块的缩进最少（一个空格）
+        if name == module and len(indent) == 1:
+            cumulative = int(cumulative_us) / 1000
+    return elapsed, cumulative, entries
+
+
+def make_qr_image():
+    """生成一张二维码测试图像，返回文件路径"""
+    import cv2
+    encoder = cv2.QRCodeEncoder.create()
+    image = cv2.resize(encoder.encode("https://qr.alipay.com/fkx17537okxvqc3y1lkci1b"), (300, 300),
+                       interpolation=cv2.INTER_NEAREST)
+    image = cv2.copyMakeBorder(image, 40, 40, 40, 40, cv2.BORDER_CONSTANT, value=255)
+    path = os.path.join(tempfile.gettempdir(), "bench_startup_qr.png")
+    cv2.imwrite(path, image)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准")
+    parser.add_argument("--top", type=int, default=15, help="列出自身导入耗时最多的包数量")
+    parser.add_argument("--rounds", type=int, default=3, help="每项重复次数（取最小值，排除磁盘缓存影响）")
+    parser.add_argument("--cli", action="store_true", help="测量 python main.py <二维码图片> 的端到端耗时")
+    parser.add_argument("--with-ocr", action="store_true", help="测量首次加载PaddleOCR模型的耗时")
+    args = parser.parse_args()
+
+    print(f"{'模块':<18}{'进程耗时(ms)':>14}{'导入耗时(ms)':>14}")
+    slowest = {}
+    for module in MODULES:
+        try:
+            runs = [import_profile(module) for _ in range(args.rounds)]
+        except RuntimeError as e:
+            print(f"{module:<18}导入失败: {e}")
+            continue
+        elapsed, cumulative, entries = min(runs, key=lambda run: run[0])
+        print(f"{module:<18}{elapsed:>14.1f}{cumulative:>14.1f}")
+        for self_ms, name in entries:
+            slowest[name] = max(slowest.get(name, 0), self_ms)
+
+    print(f"\n自身导入耗时最多的 {args.top} 个包:")
+    for name, self_ms in sorted(slowest.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {self_ms:>8.1f} ms  {name}")
+
+    if args.cli:
+        path = make_qr_image()
+        runs = [run_python(["main.py", path]) for _ in range(args.rounds)]
+        elapsed, completed = min(runs, key=lambda run: run[0])
+        print(f"\n命令行二维码识别: {elapsed:.1f} ms, 输出: {completed.stdout.strip()[:80]}")
+
+    if args.with_ocr:
+        code = ("import time; from ocr_service import get_ocr; start = time.perf_counter(); get_ocr(); "
+                "print(f'{(time.perf_counter() - start) * 1000:.1f}')")
+        _, completed = run_python(["-c", code])
+        print(f"\n首次加载PaddleOCR模型: {completed.stdout.strip() or completed.stderr.strip()[-200:]} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import random
+import argparse
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+"""
+合成基准语料: 二维码图片、大幅照片中的低对比度小二维码及倾斜的小二维码、身份证/驾驶证/行驶证/银行卡版式、纯文字截图，固定随机种子可重复生成
+
+用法:
+    python benchmarks/synthetic_corpus.py [--output bench_corpus] [--per-category 10] [--seed 0] [--font 字体文件]
+"""
+
+# 图像类别
+CATEGORIES = ["qrcode", "qrcode_small", "qrcode_rotated", "idcard", "drivercard", "vehiclecard", "bankcard", "screenshot"]
+
+# 常见的中文字体位置，证件版式需要中文字体才能被OCR识别
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf",
+    "C:/Windows/Fonts/msyh.ttc",
+    "C:/Windows/Fonts/simhei.ttf",
+    "/System/Library/Fonts/PingFang.ttc",
+]
+
+# 二维码内容
+QR_PAYLOADS = [
+    "wxp://f2f0Yf9mNqv2bZz3cR4X0l7rJcVtGfJ1a8dQ",
+    "https://qr.alipay.com/fkx17537okxvqc3y1lkci1b",
+    "https://qr.95516.com/00010000/01234567890123456789",
+    "https://v.douyin.com/iRNBho6u/",
+    "https://item.taobao.com/item.htm?id=612345678901",
+    "https://www.example.com/path/to/page?ref=qr",
+    "WIFI:T:WPA;S:office-5G;P:password123;;",
+    "BEGIN:VCARD\nVERSION:3.0\nFN:张三\nTEL:13800138000\nEND:VCARD",
+]
+
+# 证件版式：(宽高比, 文本行)，{}中的占位符随机填充
+CARD_LAYOUTS = {
+    "idcard": (1.58, ["姓名 {name}", "性别 {sex}  民族 汉", "出生 {year}年{month}月{day}日",
+                      "住址 {address}", "公民身份号码 {id_number}"]),
+    "drivercard": (1.46, ["中华人民共和国机动车驾驶证", "证号 {id_number}", "姓名 {name}  性别 {sex}  国籍 中国",
+                          "住址 {address}", "出生日期 {year}-{month}-{day}", "初次领证日期 2015-06-01",
+                          "准驾车型 C1"]),
+    "vehiclecard": (1.46, ["中华人民共和国机动车行驶证", "号牌号码 京A{plate}  车辆类型 小型轿车",
+                           "所有人 {name}", "住址 {address}", "使用性质 非营运", "品牌型号 大众汽车SVW7",
+                           "车辆识别代号 LSVAU2180N{plate}", "注册日期 2018-03-02  发证日期 2018-03-02"]),
+    "bankcard": (1.59, ["中国建设银行", "储蓄卡", "{card_number}", "VALID THRU 09/28", "{pinyin}"]),
+}
+
+NAMES = [("张伟", "ZHANG WEI"), ("王芳", "WANG FANG"), ("李娜", "LI NA"), ("刘洋", "LIU YANG"), ("陈静", "CHEN JING")]
+ADDRESSES = ["北京市朝阳区建国路88号", "上海市浦东新区世纪大道100号", "广州市天河区体育西路1号", "杭州市西湖区文三路20号"]
+SCREENSHOT_LINES = ["订单编号 20240512093011", "下单时间 2024-05-12 09:30", "商品总价 ¥128.00", "运费 ¥0.00",
+                    "实付款 ¥128.00", "收货地址 北京市海淀区中关村大街1号", "配送方式 快递", "备注 无",
+                    "Order status: shipped", "Tracking number: SF1234567890"]
+
+
+def find_font(font_path=None):
+    """返回可用的中文字体路径，找不到时返回None"""
+    for path in ([font_path] if font_path else []) + FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def load_font(font_path, size):
+    if font_path:
+        return ImageFont.truetype(font_path, size)
+    return ImageFont.load_default()
+
+
+def luhn_number(rng, prefix="622700", length=19):
+    """生成通过Luhn校验的卡号"""
+    digits = [int(ch) for ch in prefix] + [rng.randint(0, 9) for _ in range(length - len(prefix) - 1)]
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        if i % 2 == 0:
+            digit *= 2
+            digit -= 9 if digit > 9 else 0
+        total += digit
+    digits.append((10 - total % 10) % 10)
+    number = "".join(map(str, digits))
+    return " ".join(number[i:i + 4] for i in range(0, len(number), 4))
+
+
+def fill_fields(rng):
+    name, pinyin = rng.choice(NAMES)
+    year, month, day = rng.randint(1960, 2000), rng.randint(1, 12), rng.randint(1, 28)
+    return {
+        "name": name,
+        "pinyin": pinyin,
+        "sex": rng.choice(["男", "女"]),
+        "year": year,
+        "month": f"{month:02d}",
+        "day": f"{day:02d}",
+        "address": rng.choice(ADDRESSES),
+        "id_number": f"110101{year}{month:02d}{day:02d}{rng.randint(100, 999)}{rng.choice('0123456789X')}",
+        "plate": f"{rng.randint(10000, 99999)}",
+        "card_number": luhn_number(rng),
+    }
+
+
+def add_noise(image, rng):
+    """轻微的亮度变化和噪声，模拟拍照"""
+    noise = np.random.default_rng(rng.randint(0, 2 ** 31)).normal(0, 6, image.shape)
+    shifted = image.astype(np.float32) * rng.uniform(0.85, 1.05) + noise
+    return np.clip(shifted, 0, 255).astype(np.uint8)
+
+
+def render_text_image(size, lines, font_path, rng, background=(245, 245, 240), font_size=None):
+    """在纯色背景上逐行绘制文字，返回BGR图像"""
+    width, height = size
+    image = Image.new("RGB", size, background)
+    draw = ImageDraw.Draw(image)
+    font_size = font_size or max(14, height // (len(lines) + 3))
+    font = load_font(font_path, font_size)
+    y = font_size
+    for line in lines:
+        draw.text((int(width * 0.06), y), line, fill=(30, 30, 30), font=font)
+        y += int(font_size * 1.4)
+    return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+
+
+def make_qrcode(rng, font_path):
+    """二维码：随机内容、尺寸和留白"""
+    encoder = cv2.QRCodeEncoder.create()
+    code = encoder.encode(rng.choice(QR_PAYLOADS))
+    side = rng.choice([240, 360, 480])
+    code = cv2.resize(code, (side, side), interpolation=cv2.INTER_NEAREST)
+    border = rng.randint(20, 120)
+    code = cv2.copyMakeBorder(code, border, border * 2, border, border, cv2.BORDER_CONSTANT, value=255)
+    image = cv2.cvtColor(code, cv2.COLOR_GRAY2BGR)
+    return add_noise(image, rng)
+
+
+def make_small_qrcode(rng, font_path):
+    """大幅照片（800万像素）中的小二维码：边长80~200像素、低对比度，整图缩小后难以解码"""
+    rng_np = np.random.default_rng(rng.randint(0, 2 ** 31))
+    height, width = 2448, 3264
+    background = cv2.GaussianBlur(rng_np.integers(90, 230, (height // 8, width // 8), dtype=np.uint8), (0, 0), 2)
+    background = cv2.resize(background, (width, height), interpolation=cv2.INTER_CUBIC)
+    code = cv2.QRCodeEncoder.create().encode(rng.choice(QR_PAYLOADS))
+    side = rng.randint(80, 200)
+    code = cv2.resize(code, (side, side), interpolation=cv2.INTER_AREA).astype(np.float32) / 255
+    dark, light = rng.randint(50, 110), rng.randint(150, 210)
+    code = cv2.copyMakeBorder((code * (light - dark) + dark).astype(np.uint8), 8, 8, 8, 8,
+                              cv2.BORDER_CONSTANT, value=light)
+    y, x = rng.randint(0, height - code.shape[0]), rng.randint(0, width - code.shape[1])
+    background[y:y + code.shape[0], x:x + code.shape[1]] = code
+    return add_noise(cv2.cvtColor(background, cv2.COLOR_GRAY2BGR), rng)
+
+
+def make_rotated_qrcode(rng, font_path):
+    """大幅照片（800万像素）中倾斜10~45度的小二维码：边长120~200像素，检验定位图案查找对旋转的容忍度"""
+    rng_np = np.random.default_rng(rng.randint(0, 2 ** 31))
+    height, width = 2448, 3264
+    background = cv2.GaussianBlur(rng_np.integers(90, 230, (height // 8, width // 8), dtype=np.uint8), (0, 0), 2)
+    background = cv2.resize(background, (width, height), interpolation=cv2.INTER_CUBIC)
+    code = cv2.QRCodeEncoder.create().encode(rng.choice(QR_PAYLOADS))
+    side = rng.randint(120, 200)
+    code = cv2.resize(code, (side, side), interpolation=cv2.INTER_AREA)
+    code = cv2.copyMakeBorder(code, side // 5, side // 5, side // 5, side // 5, cv2.BORDER_CONSTANT, value=255)
+    n = code.shape[0]
+    matrix = cv2.getRotationMatrix2D((n / 2, n / 2), rng.choice([-1, 1]) * rng.uniform(10, 45), 1)
+    rotated = cv2.warpAffine(code, matrix, (n, n), flags=cv2.INTER_LINEAR, borderValue=255)
+    mask = cv2.warpAffine(np.full_like(code, 255), matrix, (n, n)) > 0
+    y, x = rng.randint(0, height - n), rng.randint(0, width - n)
+    background[y:y + n, x:x + n][mask] = rotated[mask]
+    return add_noise(cv2.cvtColor(background, cv2.COLOR_GRAY2BGR), rng)
+
+
+def make_card(category, rng, font_path):
+    """证件或银行卡：按版式的宽高比生成卡片，背景色和尺寸随机"""
+    ratio, templates = CARD_LAYOUTS[category]
+    fields = fill_fields(rng)
+    width = rng.choice([640, 856, 1000])
+    height = int(width / ratio)
+    background = (rng.randint(200, 240), rng.randint(200, 240), rng.randint(220, 250))
+    card = render_text_image((width, height), [line.format(**fields) for line in templates], font_path, rng,
+                             background)
+    return add_noise(card, rng)
+
+
+def make_screenshot(rng, font_path):
+    """手机截图：竖长的白底文字页面"""
+    lines = rng.sample(SCREENSHOT_LINES, k=rng.randint(5, len(SCREENSHOT_LINES)))
+    width = rng.choice([720, 1080])
+    return render_text_image((width, int(width * 2.1)), lines, font_path, rng, (255, 255, 255),
+                             font_size=width // 24)
+
+
+def generate_image(category, rng, font_path):
+    if category == "qrcode":
+        return make_qrcode(rng, font_path)
+    if category == "qrcode_small":
+        return make_small_qrcode(rng, font_path)
+    if category == "qrcode_rotated":
+        return make_rotated_qrcode(rng, font_path)
+    if category == "screenshot":
+        return make_screenshot(rng, font_path)
+    return make_card(category, rng, font_path)
+
+
+def generate_corpus(output_dir, per_category=10, seed=0, font_path=None, categories=CATEGORIES):
+    """
+    生成语料并写入manifest.json，返回 [{"path", "category"}, ...]
+
+    同样的种子和字体生成完全相同的图片
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    font_path = find_font(font_path)
+    items = []
+    for category in categories:
+        rng = random.Random(f"{seed}-{category}")
+        for index in range(per_category):
+            # 大幅照片保存为JPEG，与实际拍照上传的图片一致
+            ext = "jpg" if category in ("qrcode_small", "qrcode_rotated") else "png"
+            path = os.path.join(output_dir, f"{category}_{index:03d}.{ext}")
+            cv2.imwrite(path, generate_image(category, rng, font_path))
+            items.append({"path": os.path.abspath(path), "category": category})
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"seed": seed, "font": font_path, "items": items}, f, ensure_ascii=False, indent=2)
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成基准语料")
+    parser.add_argument("--output", default="bench_corpus", help="输出目录")
+    parser.add_argument("--per-category", type=int, default=10, help="每个类别的图片数量")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--font", help="中文字体文件（默认在常见位置查找）")
+    args = parser.parse_args()
+
+    items = generate_corpus(args.output, args.per_category, args.seed, args.font)
+    if find_font(args.font) is None:
+        print("警告: 未找到中文字体，证件版式中的中文无法渲染，请用 --font 指定", file=sys.stderr)
+    print(f"已生成 {len(items)} 张图片: {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import os
+import time
+import heapq
+import threading
+from image_fetcher import META_SUFFIX
+from phash_index import get_perceptual_index
+from config import (CACHE_DIR, CACHE_MAX_AGE_DAYS, CACHE_MAX_FILES, CACHE_MAX_BYTES,
+                    JANITOR_INTERVAL, JANITOR_BATCH_SIZE, JANITOR_SLICE_SECONDS, NEAR_DUPLICATE_ENABLED)
+"""
+缓存目录后台清理:增量扫描记录文件大小和修改时间,按时间片分批删除过期及超量文件
+"""
+
+class CacheJanitor:
+    """
+    后台缓存清理线程
+
+    每个时间片扫描一批目录项（过期文件直接删除），完整扫描一遍后才按数量和字节数淘汰最旧的文件，
+    每次淘汰一批，请求线程不再承担清理开销。
+    """
+    def __init__(self, app, store=None, cache_dir=CACHE_DIR, max_age_days=CACHE_MAX_AGE_DAYS,
+                 max_files=CACHE_MAX_FILES, max_bytes=CACHE_MAX_BYTES, interval=JANITOR_INTERVAL,
+                 batch_size=JANITOR_BATCH_SIZE, slice_seconds=JANITOR_SLICE_SECONDS):
+        self.app = app
+        self.store = store
+        self.cache_dir = cache_dir
+        self.max_age = max_age_days * 86400
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.batch_size = batch_size
+        self.slice_seconds = slice_seconds
+        self.lock = threading.Lock()
+        # 文件路径 -> (修改时间, 大小)
+        self.files = {}
+        self.bytes = 0
+        self._scan = None
+        self._seen = set()
+        self._pass_start = 0
+        self._pass_removed = 0
+        self._stop = threading.Event()
+        self._thread = None
+        # 统计
+        self.passes = 0
+        self.scanned = 0
+        self.expired = 0
+        self.orphans = 0
+        self.evicted = 0
+        self.reclaimed_bytes = 0
+        self.last_pass_seconds = 0
+
+    def _update(self, path, mtime, size):
+        with self.lock:
+            old = self.files.get(path)
+            if old is not None:
+                self.bytes -= old[1]
+            self.files[path] = (mtime, size)
+            self.bytes += size
+
+    def _forget(self, path):
+        with self.lock:
+            old = self.files.pop(path, None)
+            if old is not None:
+                self.bytes -= old[1]
+
+    def _remove(self, path, size):
+        """删除文件（及下载图片的验证信息文件），返回是否删除成功"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            self._forget(path)
+            return False
+        except OSError as e:
+            self.app.logger.error(f"删除缓存文件出错: {path}, 错误: {str(e)}")
+            return False
+        self._forget(path)
+        self.reclaimed_bytes += size
+        self._pass_removed += 1
+        meta_path = path + META_SUFFIX
+        if os.path.exists(meta_path):
+            self._remove(meta_path, os.path.getsize(meta_path))
+        return True
+
+    def record(self, path):
+        """记录新写入或刚访问的缓存文件，使用量无需等下一次扫描即可更新"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        self._update(path, stat.st_mtime, stat.st_size)
+
+    def over_limit(self):
+        """是否超过数量或字节数限制"""
+        return len(self.files) > self.max_files or self.bytes > self.max_bytes
+
+    def _scan_batch(self, deadline):
+        """继续目录扫描，返回本遍扫描是否已完成"""
+        if self._scan is None:
+            self._scan = os.scandir(self.cache_dir)
+            self._seen = set()
+            self._pass_start = time.time()
+            self._pass_removed = 0
+        count = 0
+        now = time.time()
+        for entry in self._scan:
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except OSError:
+                continue
+            self.scanned += 1
+            if entry.name.endswith(META_SUFFIX) and not os.path.exists(entry.path[:-len(META_SUFFIX)]):
+                # 图片已被删除（如其他进程清理）的验证信息文件
+                if self._remove(entry.path, stat.st_size):
+                    self.orphans += 1
+            elif now - stat.st_mtime > self.max_age:
+                if self._remove(entry.path, stat.st_size):
+                    self.expired += 1
+            else:
+                self._update(entry.path, stat.st_mtime, stat.st_size)
+                self._seen.add(entry.path)
+            count += 1
+            if count >= self.batch_size or time.monotonic() > deadline:
+                return False
+
+        self._scan.close()
+        self._scan = None
+        # 本遍未见到的文件已被其他途径删除
+        with self.lock:
+            for path in [path for path in self.files if path not in self._seen]:
+                self.bytes -= self.files.pop(path)[1]
+        self._finish_pass()
+        return True
+
+    def _finish_pass(self):
+        """完成一遍扫描：清理磁盘结果存储、压缩近重复索引并报告进度"""
+        if self.store is not None:
+            try:
+                days = self.max_age / 86400
+                self._pass_removed += self.store.expire(days) + self.store.evict(self.max_files)
+            except Exception as e:
+                self.app.logger.error(f"清理结果存储出错: {str(e)}")
+            if NEAR_DUPLICATE_ENABLED:
+                # 本遍删除的结果（过期、淘汰的JSON文件及存储中的记录）从近重复索引中移除
+                try:
+                    get_perceptual_index().prune(self.store.contains)
+                except Exception as e:
+                    self.app.logger.error(f"压缩近重复索引出错: {str(e)}")
+        self.passes += 1
+        self.last_pass_seconds = round(time.time() - self._pass_start, 2)
+        if self._pass_removed:
+            self.app.logger.info(
+                f"缓存清理第 {self.passes} 遍: 删除 {self._pass_removed} 项，"
+                f"当前 {len(self.files)} 个文件 / {self.bytes} 字节，累计回收 {self.reclaimed_bytes} 字节")
+
+    def _evict_batch(self, deadline):
+        """按修改时间淘汰一批最旧的文件"""
+        while self.over_limit() and time.monotonic() <= deadline:
+            with self.lock:
+                oldest = heapq.nsmallest(self.batch_size, self.files.items(), key=lambda item: item[1][0])
+            if not oldest:
+                return
+            for path, (mtime, size) in oldest:
+                if not self.over_limit():
+                    return
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    self._forget(path)
+                    continue
+                if stat.st_mtime != mtime:
+                    # 扫描后又被访问过，按新的时间重新排序
+                    self._update(path, stat.st_mtime, stat.st_size)
+                    continue
+                if self._remove(path, stat.st_size):
+                    self.evicted += 1
+
+    def step(self):
+        """执行一个时间片的清理"""
+        deadline = time.monotonic() + self.slice_seconds
+        self._scan_batch(deadline)
+        # 首遍扫描完成前使用量不完整，不做淘汰
+        if self.passes:
+            self._evict_batch(deadline)
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self.step()
+            except Exception as e:
+                self.app.logger.error(f"清理缓存文件时出错: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """启动后台清理线程（重复调用无副作用）"""
+        with self.lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.run, name='cache-janitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        """返回清理统计：当前文件数和字节数、扫描遍数、删除数量（过期、孤立的验证信息文件、淘汰）、回收字节数"""
+        return {
+            "files": len(self.files),
+            "bytes": self.bytes,
+            "passes": self.passes,
+            "scanned": self.scanned,
+            "expired": self.expired,
+            "orphans": self.orphans,
+            "evicted": self.evicted,
+            "reclaimed_bytes": self.reclaimed_bytes,
+            "last_pass_seconds": self.last_pass_seconds,
+        }
+
+# 全局清理线程，每个进程只有一个
+_JANITOR = None
+_JANITOR_LOCK = threading.Lock()
+
+def get_cache_janitor(app, store=None):
+    """返回全局缓存清理对象（由调用方start启动线程）"""
+    global _JANITOR
+    with _JANITOR_LOCK:
+        if _JANITOR is None:
+            _JANITOR = CacheJanitor(app, store)
+    return _JANITOR
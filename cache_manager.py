@@ -3,71 +3,208 @@ import json
 import hashlib
 import datetime
 import urllib.parse
-import requests
 import base64
 import shutil
 import time
 import threading
+import sys
 from collections import OrderedDict
-from config import CACHE_DIR
+from config import CACHE_DIR, CACHE_MAX_AGE_DAYS, CACHE_MAX_FILES, CACHE_KEY_MODE, NEAR_DUPLICATE_ENABLED, NEAR_DUPLICATE_THRESHOLD
+from models import ImageType
+from image_hash import content_hash, file_content_hash
+from phash_index import get_perceptual_index
+from cache_store import create_store
+from cache_janitor import get_cache_janitor
+from image_fetcher import IMAGE_FETCHER
+from deadline import DeadlineExceeded
+from metrics import observe_stage
 
 # 内存缓存配置
 MAX_MEMORY_CACHE_SIZE = 2000  # 最大内存缓存项数
+MAX_MEMORY_CACHE_BYTES = 64 * 1024 * 1024  # 内存缓存最大占用字节数（按结果序列化后的大小估算）
 MEMORY_CACHE_TTL = 3600  # 内存缓存项的生存时间（秒）
+MEMORY_CACHE_SHARDS = 16  # 分段数量，每段独立加锁
+MEMORY_CACHE_SWEEP_INTERVAL = 60  # 过期项定期清理间隔（秒）
 
-# 缓存结果字典 - 内存缓存（使用OrderedDict实现简单的LRU）
-class LRUCache(OrderedDict):
-    def __init__(self, maxsize=MAX_MEMORY_CACHE_SIZE, ttl=MEMORY_CACHE_TTL):
+# 近重复查找只复用这些类型的结果：同一模板的不同证件、银行卡感知哈希距离很小，复用会把他人的证件号、卡号返回给请求方
+NEAR_DUPLICATE_IMAGE_TYPES = (ImageType.NORMAL,)
+
+def estimate_size(value):
+    """估算缓存值占用的字节数"""
+    try:
+        return len(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+class _CacheShard:
+    """缓存分段：独立的锁、LRU顺序和计数"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items = OrderedDict()  # key -> (value, timestamp, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def remove(self, key):
+        _, _, size = self.items.pop(key)
+        self.bytes -= size
+
+# 缓存结果字典 - 线程安全的分段LRU内存缓存
+class ShardedLRUCache:
+    def __init__(self, maxsize=MAX_MEMORY_CACHE_SIZE, maxbytes=MAX_MEMORY_CACHE_BYTES,
+                 ttl=MEMORY_CACHE_TTL, shards=MEMORY_CACHE_SHARDS):
         self.maxsize = maxsize
+        self.maxbytes = maxbytes
         self.ttl = ttl
-        super().__init__()
+        self._shards = [_CacheShard() for _ in range(shards)]
+        # 容量平均分配到各分段
+        self._shard_maxsize = max(1, -(-maxsize // shards))
+        self._shard_maxbytes = max(1, maxbytes // shards)
+        self._sweeper = None
+        self._sweeper_lock = threading.Lock()
+    
+    def _shard(self, key):
+        return self._shards[hash(key) % len(self._shards)]
+    
+    def get(self, key, default=None):
+        shard = self._shard(key)
+        with shard.lock:
+            item = shard.items.get(key)
+            if item is None:
+                shard.misses += 1
+                return default
+            # 检查是否过期
+            if time.time() - item[1] > self.ttl:
+                shard.remove(key)
+                shard.expirations += 1
+                shard.misses += 1
+                return default
+            # 移动到末尾（最近使用）
+            shard.items.move_to_end(key)
+            shard.hits += 1
+            return item[0]
+    
+    def set(self, key, value, size=None):
+        size = estimate_size(value) if size is None else size
+        shard = self._shard(key)
+        with shard.lock:
+            if key in shard.items:
+                shard.remove(key)
+            # 存储值、时间戳和大小
+            shard.items[key] = (value, time.time(), size)
+            shard.bytes += size
+            # 超过条目数或字节数限制时，删除最早使用的项（至少保留刚写入的项）
+            while len(shard.items) > 1 and (len(shard.items) > self._shard_maxsize
+                                             or shard.bytes > self._shard_maxbytes):
+                shard.remove(next(iter(shard.items)))
+                shard.evictions += 1
     
     def __getitem__(self, key):
-        # 检查是否过期
-        value, timestamp = super().__getitem__(key)
-        if time.time() - timestamp > self.ttl:
-            del self[key]
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
             raise KeyError(key)
-        
-        # 移动到末尾（最近使用）
-        self.move_to_end(key)
         return value
     
     def __setitem__(self, key, value):
-        # 如果达到最大容量，删除最早使用的项
-        if len(self) >= self.maxsize:
-            oldest = next(iter(self))
-            del self[oldest]
-        
-        # 存储值和时间戳
-        super().__setitem__(key, (value, time.time()))
-        self.move_to_end(key)
+        self.set(key, value)
     
-    def get(self, key, default=None):
-        try:
-            return self[key]
-        except KeyError:
-            return default
+    def __delitem__(self, key):
+        shard = self._shard(key)
+        with shard.lock:
+            shard.remove(key)
+    
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+    
+    def __len__(self):
+        return sum(len(shard.items) for shard in self._shards)
+    
+    def clear(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard.items.clear()
+                shard.bytes = 0
+    
+    def sweep(self):
+        """清理所有过期项，返回清理数量"""
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                deadline = time.time() - self.ttl
+                expired = [key for key, (_, timestamp, _) in shard.items.items() if timestamp < deadline]
+                for key in expired:
+                    shard.remove(key)
+                shard.expirations += len(expired)
+                removed += len(expired)
+        return removed
+    
+    def start_sweeper(self, interval=MEMORY_CACHE_SWEEP_INTERVAL):
+        """启动后台线程定期清理过期项（重复调用无副作用）"""
+        with self._sweeper_lock:
+            if self._sweeper is not None:
+                return
+            def run():
+                while True:
+                    time.sleep(interval)
+                    self.sweep()
+            self._sweeper = threading.Thread(target=run, name='cache-sweeper', daemon=True)
+        self._sweeper.start()
+    
+    def stats(self):
+        """返回缓存统计：条目数、字节数、命中/未命中/淘汰/过期次数"""
+        stats = {"items": 0, "bytes": 0, "hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        for shard in self._shards:
+            with shard.lock:
+                stats["items"] += len(shard.items)
+                stats["bytes"] += shard.bytes
+                stats["hits"] += shard.hits
+                stats["misses"] += shard.misses
+                stats["evictions"] += shard.evictions
+                stats["expirations"] += shard.expirations
+        return stats
 
-# 初始化LRU缓存
-RESULT_CACHE = LRUCache()
+_MISSING = object()
 
-# 上次清理时间
-LAST_CLEANUP_TIME = 0
-# 清理间隔（秒）
-CLEANUP_INTERVAL = 3600  # 默认1小时清理一次
-# 最大缓存文件数量
-MAX_CACHE_FILES = 1000
+# 初始化LRU缓存
+RESULT_CACHE = ShardedLRUCache()
 
 class CacheManager:
     def __init__(self, app):
         self.app = app
-        self.cleanup_lock = threading.Lock()
+        # 磁盘结果缓存
+        self.store = create_store()
+        # 缓存目录清理，线程由start_background_tasks启动
+        self.janitor = get_cache_janitor(app, self.store)
+    
+    def start_background_tasks(self):
+        """启动后台线程：定期清理内存缓存中的过期项、增量清理缓存目录（重复调用无副作用）"""
+        RESULT_CACHE.start_sweeper()
+        self.janitor.start()
     
-    def get_file_hash(self, file_path=None, url=None, base64_data=None):
-        """计算文件或数据的哈希值作为缓存键"""
+    @property
+    def content_addressed(self):
+        """是否为内容寻址模式"""
+        return CACHE_KEY_MODE == 'content'
+    
+    def get_file_hash(self, file_path=None, url=None, base64_data=None, image_data=None):
+        """
+        计算文件或数据的哈希值作为缓存键
+        
+        image_data: 已解码的Base64图像数据，内容寻址模式下直接按其计算，不再解码base64_data
+        """
         hasher = hashlib.md5()
         
+        # 内容寻址模式：文件和Base64按完整内容哈希，同一图片的不同来源得到相同的键
+        if self.content_addressed:
+            if file_path and os.path.exists(file_path):
+                return f"c_{file_content_hash(file_path)}"
+            if image_data is not None:
+                return f"c_{content_hash(image_data)}"
+            if base64_data:
+                return f"c_{content_hash(self.decode_base64(base64_data))}"
+        
         if file_path and os.path.exists(file_path):
             with open(file_path, 'rb') as f:
                 buf = f.read(65536)  # 读取64k块
@@ -113,9 +250,84 @@ class CacheManager:
         
         return None
     
-    def clean_old_cache(self, days=7, max_files=MAX_CACHE_FILES):
+    def get_alias_keys(self, image_path, cache_key):
         """
-        清理缓存文件，基于时间和数量两个维度
+        内容寻址模式下图像的其他缓存键（不含cache_key本身）
+        
+        只用完整内容哈希：感知哈希相同的不同图片（如同一模板的不同收款码）很常见，不能作为精确的缓存键
+        
+        参数:
+            image_path: 本地图像文件
+            cache_key:  主缓存键（如URL生成的键）
+        """
+        if not self.content_addressed or cache_key.startswith("c_"):
+            # 主缓存键已是完整内容哈希时不再重新读取文件计算
+            return []
+        keys = [f"c_{file_content_hash(image_path)}"]
+        return [key for key in keys if key != cache_key]
+    
+    def get_cached_result_by_keys(self, keys):
+        """依次查找多个缓存键，返回第一个命中的结果"""
+        for key in keys:
+            result = self.get_cached_result(key)
+            if result is not None:
+                return result
+        return None
+    
+    @property
+    def near_duplicate_enabled(self):
+        """是否启用近重复查找"""
+        return NEAR_DUPLICATE_ENABLED
+    
+    @staticmethod
+    def similar_reusable(result):
+        """结果能否供近重复查找复用：只复用不含二维码、不含证件信息的普通图片结果"""
+        return (result.get("imageType") in NEAR_DUPLICATE_IMAGE_TYPES and result.get("type") in ("text", "none")
+                and not result.get("qrContent"))
+    
+    def find_similar_result(self, frame, threshold=NEAR_DUPLICATE_THRESHOLD):
+        """
+        在近重复索引中查找相似图片的缓存结果
+        
+        调用前需已解码二维码（frame.qr_results）：同一模板的不同收款码感知哈希非常接近，
+        含二维码的图片不复用；缓存结果为证件、银行卡或含二维码时同样不复用（见similar_reusable）
+        
+        返回: (标记为相似命中的结果或None, 本图的感知哈希)
+        """
+        index = get_perceptual_index()
+        image_hash = index.image_hash(frame.image)
+        if frame.qr_results:
+            return None, image_hash
+        match = index.search(image_hash, threshold)
+        if match is None:
+            return None, image_hash
+        
+        similar_key, distance = match
+        result = self.get_cached_result(similar_key)
+        if result is None:
+            # 缓存已被清理，索引项失效
+            index.mark_dead(similar_key)
+            return None, image_hash
+        if not self.similar_reusable(result):
+            self.app.logger.info(f"近重复候选为证件或含二维码，不复用: {similar_key}, 距离: {distance}")
+            return None, image_hash
+        
+        self.app.logger.info(f"近重复命中: {similar_key}, 距离: {distance}")
+        result = dict(result)
+        result["similarHit"] = True
+        result["similarDistance"] = distance
+        return result, image_hash
+    
+    def index_similar(self, image_hash, cache_key):
+        """将识别结果的缓存键加入近重复索引"""
+        try:
+            get_perceptual_index().add(image_hash, cache_key)
+        except Exception as e:
+            self.app.logger.error(f"更新近重复索引出错: {str(e)}")
+    
+    def clean_old_cache(self, days=CACHE_MAX_AGE_DAYS, max_files=CACHE_MAX_FILES):
+        """
+        一次性完整清理缓存文件，基于时间和数量两个维度（日常清理由后台线程增量执行）
         
         参数:
             days: 清理超过指定天数的文件
@@ -154,67 +366,47 @@ class CacheManager:
                         os.remove(file_path)
                         count_number += 1
             
+            # 单文件存储中的结果按索引过期和淘汰
+            count_time += self.store.expire(days)
+            count_number += self.store.evict(max_files)
+            
+            # 已删除结果的近重复索引项
+            if self.near_duplicate_enabled:
+                get_perceptual_index().prune(self.store.contains)
+            
             self.app.logger.info(f"清理了 {count_time} 个过期缓存文件，{count_number} 个超量缓存文件")
         except Exception as e:
             self.app.logger.error(f"清理缓存文件时出错: {str(e)}")
     
-    def check_and_clean_cache(self, days=7, max_files=MAX_CACHE_FILES):
-        """检查是否需要清理缓存，并在需要时执行清理"""
-        global LAST_CLEANUP_TIME
-        
-        # 使用锁防止多线程同时清理
-        if not self.cleanup_lock.acquire(False):
-            return
-            
-        try:
-            current_time = time.time()
-            # 如果距离上次清理时间超过了清理间隔，执行清理
-            if current_time - LAST_CLEANUP_TIME > CLEANUP_INTERVAL:
-                self.app.logger.info("开始定期清理缓存...")
-                self.clean_old_cache(days, max_files)
-                LAST_CLEANUP_TIME = current_time
-        finally:
-            self.cleanup_lock.release()
-    
+    @observe_stage("cache_get")
     def get_cached_result(self, cache_key):
-        """获取缓存的识别结果，同时检查是否需要清理缓存"""
-        # 检查是否需要清理缓存
-        self.check_and_clean_cache()
-        
+        """获取缓存的识别结果"""
         # 先检查内存缓存
         result = RESULT_CACHE.get(cache_key)
         if result is not None:
             return result
         
-        # 再检查文件缓存
-        cache_file = os.path.join(CACHE_DIR, f"{cache_key}.json")
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    result = json.load(f)
-                    # 更新内存缓存
-                    RESULT_CACHE[cache_key] = result
-                    # 更新文件访问时间，以便LRU策略
-                    os.utime(cache_file, None)
-                    return result
-            except Exception as e:
-                self.app.logger.error(f"读取缓存文件出错: {str(e)}")
+        # 再检查磁盘缓存
+        try:
+            result = self.store.get(cache_key)
+            if result is not None:
+                # 更新内存缓存
+                RESULT_CACHE[cache_key] = result
+                return result
+        except Exception as e:
+            self.app.logger.error(f"读取缓存文件出错: {str(e)}")
         
         return None
     
+    @observe_stage("cache_put")
     def save_to_cache(self, cache_key, result):
         """保存识别结果到缓存"""
-        # 检查是否需要清理缓存
-        self.check_and_clean_cache()
-        
         # 保存到内存缓存
         RESULT_CACHE[cache_key] = result
         
-        # 保存到文件缓存
-        cache_file = os.path.join(CACHE_DIR, f"{cache_key}.json")
+        # 保存到磁盘缓存
         try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(result, f, ensure_ascii=False)
+            self.store.put(cache_key, result)
         except Exception as e:
             self.app.logger.error(f"保存缓存文件出错: {str(e)}")
     
@@ -224,8 +416,17 @@ class CacheManager:
         RESULT_CACHE.clear()
         self.app.logger.info("内存缓存已清空")
     
-    def download_image(self, url):
-        """下载网络图片到临时文件，支持缓存"""
+    def cache_stats(self):
+        """内存缓存统计"""
+        return RESULT_CACHE.stats()
+    
+    def janitor_stats(self):
+        """缓存目录清理统计"""
+        return self.janitor.stats()
+    
+    @observe_stage("download")
+    def download_image(self, url, deadline=None):
+        """下载网络图片到缓存目录，已缓存时按需重新验证；deadline为请求期限，限制下载的超时时间"""
         # 计算URL的哈希值
         cache_key = self.get_file_hash(url=url)
         # 从URL中提取文件扩展名
@@ -242,27 +443,31 @@ class CacheManager:
         # 使用缓存键和提取的扩展名组合缓存路径
         cache_path = os.path.join(CACHE_DIR, f"{cache_key}{ext}")
         
-        # 检查缓存
-        if os.path.exists(cache_path):
-            self.app.logger.info(f"使用缓存图片: {cache_path}")
-            return cache_path, cache_key
+        if deadline is not None:
+            deadline.check("download")
         
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            # 保存到缓存
-            with open(cache_path, 'wb') as f:
-                f.write(response.content)
+            # 已缓存的图片直接使用，超过重新验证时间时发送条件请求
+            if IMAGE_FETCHER.fetch(url, cache_path, deadline):
+                self.janitor.record(cache_path)
+            else:
+                self.app.logger.info(f"使用缓存图片: {cache_path}")
             
             return cache_path, cache_key
         except Exception as e:
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded("download")
             raise Exception(f"下载图片失败: {str(e)}")
     
-    def save_base64_image(self, base64_data):
-        """将Base64编码的图像保存到临时文件，支持缓存"""
+    def save_base64_image(self, base64_data, cache_key=None, image_data=None):
+        """
+        将Base64编码的图像保存到缓存目录，支持缓存
+        
+        cache_key、image_data: 调用方已计算的缓存键和已解码的数据，提供时不再重复计算、解码
+        """
         # 计算base64数据的哈希值
-        cache_key = self.get_file_hash(base64_data=base64_data)
+        if cache_key is None:
+            cache_key = self.get_file_hash(base64_data=base64_data, image_data=image_data)
         cache_path = os.path.join(CACHE_DIR, f"{cache_key}.jpg")
         
         # 检查缓存
@@ -271,17 +476,22 @@ class CacheManager:
             return cache_path, cache_key
         
         try:
-            # 移除可能的前缀
-            if ',' in base64_data:
-                base64_data = base64_data.split(',', 1)[1]
-            
             # 解码Base64数据
-            image_data = base64.b64decode(base64_data)
+            if image_data is None:
+                image_data = self.decode_base64(base64_data)
             
             # 保存到缓存
             with open(cache_path, 'wb') as f:
                 f.write(image_data)
+            self.janitor.record(cache_path)
             
             return cache_path, cache_key
         except Exception as e:
-            raise Exception(f"Base64图像处理失败: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Base64图像处理失败: {str(e)}")
+    
+    @staticmethod
+    def decode_base64(base64_data):
+        """解码Base64图像数据（移除可能的data:image前缀）"""
+        if ',' in base64_data:
+            base64_data = base64_data.split(',', 1)[1]
+        return base64.b64decode(base64_data)
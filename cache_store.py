@@ -0,0 +1,228 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+from config import CACHE_DIR, CACHE_BACKEND
+"""
+识别结果的磁盘缓存存储: json(每个结果一个文件) 或 sqlite(单文件嵌入式数据库,按时间索引淘汰)
+
+迁移已有的JSON缓存文件到SQLite:
+    python cache_store.py migrate [--delete]
+"""
+
+# SQLite数据库放在缓存目录的子目录中，不受缓存文件清理影响
+SQLITE_PATH = os.path.join(CACHE_DIR, 'index', 'results.db')
+# 访问时间的精度（秒）：距上次记录不足该时间的命中不再更新，其余命中的更新攒批写入
+ACCESS_UPDATE_INTERVAL = 300
+# 攒批的访问时间更新达到该数量或距上次写入超过该秒数时写入
+ACCESS_FLUSH_SIZE = 256
+ACCESS_FLUSH_SECONDS = 5
+
+class JsonFileStore:
+    """每个结果保存为缓存目录中的 {cache_key}.json 文件"""
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _path(self, cache_key):
+        return os.path.join(self.cache_dir, f"{cache_key}.json")
+
+    def get(self, cache_key):
+        cache_file = self._path(cache_key)
+        if not os.path.exists(cache_file):
+            return None
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        # 更新文件访问时间，以便LRU策略
+        os.utime(cache_file, None)
+        return result
+
+    def put(self, cache_key, result):
+        # 先写临时文件再替换，保证写入原子性
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(temp_path, self._path(cache_key))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def contains(self, cache_key):
+        return os.path.exists(self._path(cache_key))
+
+    def expire(self, days):
+        """过期清理由缓存目录的文件清理统一处理"""
+        return 0
+
+    def evict(self, max_entries):
+        """数量限制由缓存目录的文件清理统一处理"""
+        return 0
+
+class SQLiteStore:
+    """
+    SQLite单文件存储，按访问时间建立索引，过期和淘汰均走索引
+
+    结果数量由触发器维护在计数表中，淘汰检查不再扫描全表；
+    命中时不逐次写入访问时间（多个工作进程的读请求会在写锁上串行），而是按ACCESS_UPDATE_INTERVAL节流后攒批写入
+    """
+    def __init__(self, db_path=SQLITE_PATH, access_interval=ACCESS_UPDATE_INTERVAL):
+        self.db_path = db_path
+        self.access_interval = access_interval
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # 每个线程使用独立的连接
+        self._local = threading.local()
+        # 待写入的访问时间 {缓存键: 时间}
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._last_flush = time.time()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed)")
+            # 结果数量计数：已有数据库首次升级时统计一次，之后由触发器维护（put使用UPSERT，覆盖不触发计数）
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS result_count (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    n INTEGER NOT NULL
+                )
+            """)
+            conn.execute("INSERT OR IGNORE INTO result_count (id, n) SELECT 0, COUNT(*) FROM results")
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS results_count_insert AFTER INSERT ON results
+                BEGIN UPDATE result_count SET n = n + 1 WHERE id = 0; END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS results_count_delete AFTER DELETE ON results
+                BEGIN UPDATE result_count SET n = n - 1 WHERE id = 0; END
+            """)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, cache_key):
+        conn = self._connect()
+        row = conn.execute("SELECT value, accessed FROM results WHERE key = ?", (cache_key,)).fetchone()
+        if row is None:
+            return None
+        # 记录访问时间，以便LRU策略
+        now = time.time()
+        if now - row[1] >= self.access_interval:
+            self._touch(cache_key, now)
+        return json.loads(row[0])
+
+    def _touch(self, cache_key, timestamp):
+        """攒批记录访问时间，达到数量或时间间隔时写入"""
+        with self._pending_lock:
+            self._pending[cache_key] = timestamp
+            due = len(self._pending) >= ACCESS_FLUSH_SIZE or timestamp - self._last_flush >= ACCESS_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self):
+        """在一个事务中写入攒批的访问时间"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.time()
+        if not pending:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany("UPDATE results SET accessed = MAX(accessed, ?) WHERE key = ?",
+                             [(timestamp, key) for key, timestamp in pending.items()])
+
+    def put(self, cache_key, result, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        conn = self._connect()
+        # 单条语句在事务中执行，写入是原子的
+        with conn:
+            conn.execute("INSERT INTO results (key, value, created, accessed) VALUES (?, ?, ?, ?) "
+                         "ON CONFLICT (key) DO UPDATE SET value = excluded.value, created = excluded.created, "
+                         "accessed = excluded.accessed",
+                         (cache_key, json.dumps(result, ensure_ascii=False), timestamp, timestamp))
+
+    def contains(self, cache_key):
+        row = self._connect().execute("SELECT 1 FROM results WHERE key = ?", (cache_key,)).fetchone()
+        return row is not None
+
+    def expire(self, days):
+        """删除超过指定天数未访问的结果，返回删除数量"""
+        self.flush()
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute("DELETE FROM results WHERE accessed < ?", (time.time() - days * 86400,))
+        return cursor.rowcount
+
+    def evict(self, max_entries):
+        """按访问时间淘汰最旧的结果，直到数量不超过max_entries，返回删除数量"""
+        self.flush()
+        conn = self._connect()
+        with conn:
+            count = self.count()
+            if count <= max_entries:
+                return 0
+            # 按访问时间索引取最旧的若干条，不扫描全表
+            cursor = conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed LIMIT ?)",
+                (count - max_entries,))
+        return cursor.rowcount
+
+    def count(self):
+        """结果数量（计数表，不扫描全表）"""
+        return self._connect().execute("SELECT n FROM result_count WHERE id = 0").fetchone()[0]
+
+def create_store(backend=CACHE_BACKEND):
+    """按配置创建磁盘缓存存储"""
+    if backend == 'sqlite':
+        return SQLiteStore()
+    return JsonFileStore()
+
+def migrate_json_to_sqlite(cache_dir=CACHE_DIR, db_path=SQLITE_PATH, delete=False):
+    """把缓存目录中的JSON结果文件导入SQLite，保留文件修改时间，返回 (导入数量, 失败数量)"""
+    store = SQLiteStore(db_path)
+    migrated = 0
+    failed = 0
+    for filename in os.listdir(cache_dir):
+        if not filename.endswith('.json'):
+            continue
+        file_path = os.path.join(cache_dir, filename)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            store.put(filename[:-len('.json')], result, timestamp=os.path.getmtime(file_path))
+            migrated += 1
+            if delete:
+                os.remove(file_path)
+        except Exception as e:
+            print(f"迁移失败: {file_path}, 错误: {str(e)}")
+            failed += 1
+    return migrated, failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="识别结果磁盘缓存工具")
+    subparsers = parser.add_subparsers(dest="command")
+    migrate_parser = subparsers.add_parser("migrate", help="把JSON缓存文件迁移到SQLite")
+    migrate_parser.add_argument("--delete", action="store_true", help="迁移成功后删除JSON文件")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrated, failed = migrate_json_to_sqlite(delete=args.delete)
+        print(f"已迁移 {migrated} 个缓存结果，失败 {failed} 个，数据库: {SQLITE_PATH}")
+        sys.exit(1 if failed else 0)
+    parser.print_help()
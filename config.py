@@ -8,6 +8,70 @@ import sys
 os.environ['OMP_THREAD_LIMIT'] = '100000'
 
 
+# OCR模型参数
+OCR_MODEL_OPTIONS = dict(use_angle_cls=True, lang="ch", use_gpu=False, show_log=False)
+# OCR工作进程数，0表示在当前进程内识别（所有请求线程共享一个模型）
+OCR_WORKER_PROCESSES = int(os.environ.get('OCR_WORKER_PROCESSES', 0))
+# 每个OCR工作进程使用的CPU线程数
+OCR_WORKER_CPU_THREADS = int(os.environ.get('OCR_WORKER_CPU_THREADS', 2))
+# 等待OCR工作进程返回结果的超时时间（秒）
+OCR_POOL_TIMEOUT = 60
+# 在当前进程内识别且请求有期限时，OCR在该线程池中执行，期限到达后请求线程不再等待
+OCR_DEADLINE_THREADS = 4
+
+# 生产服务（gunicorn）配置：预先fork的工作进程，每个进程加载并预热自己的OCR模型
+SERVER_BIND = os.environ.get('SERVER_BIND', '0.0.0.0:5000')
+SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', 2))                  # 工作进程数
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 4))                  # 每个工作进程的请求线程数
+SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS', 1000))     # 处理该数量的请求后平滑重启工作进程，限制内存增长
+SERVER_MAX_REQUESTS_JITTER = int(os.environ.get('SERVER_MAX_REQUESTS_JITTER', 100))  # 随机抖动，避免所有进程同时重启
+
+# 单张识别请求的处理期限（秒），超时返回已完成阶段的部分结果
+REQUEST_TIMEOUT = int(os.environ.get('REQUEST_TIMEOUT', 30))
+
+# 批量识别配置
+BATCH_MAX_ITEMS = 200     # 单次批量请求的最大图像数量
+BATCH_MAX_WORKERS = 4     # 批量识别的并行线程数
+
+# 异步识别任务配置
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))           # 任务工作线程数
+JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', 100))   # 排队任务上限，队列满时返回429
+JOB_RESULT_TTL = 3600         # 完成的任务结果保留时间（秒）
+JOB_CALLBACK_TIMEOUT = 10     # 回调请求超时（秒）
+JOB_DEFAULT_PRIORITY = 5      # 默认优先级，数字越小越优先
+JOB_POLL_INTERVAL = 0.5       # 工作线程查询共享任务表的间隔（秒），本进程提交的任务立即唤醒
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', max(300, REQUEST_TIMEOUT * 10)))  # 领取任务的租约，工作进程异常退出后到期重新排队
+JOB_MAX_ATTEMPTS = 3          # 任务最多执行次数（执行中工作进程退出时重新领取）
+
+# 网络图片下载配置
+FETCH_MAX_BYTES = int(os.environ.get('FETCH_MAX_BYTES', 20 * 1024 * 1024))  # 单张图片最大字节数
+FETCH_CONNECT_TIMEOUT = 5   # 连接超时（秒）
+FETCH_READ_TIMEOUT = 10     # 读取超时（秒）
+FETCH_POOL_SIZE = 10        # 每个主机的长连接数
+FETCH_RETRIES = 2           # 连接失败及502/503/504的重试次数
+# 缓存的网络图片超过该时间（秒）后用ETag/Last-Modified条件请求重新验证
+FETCH_REVALIDATE_AFTER = int(os.environ.get('FETCH_REVALIDATE_AFTER', 24 * 3600))
+
+# 缓存键模式: legacy 按URL、Base64前缀、文件MD5生成; content 按完整内容哈希生成，不同来源的同一图片共享缓存
+CACHE_KEY_MODE = os.environ.get('CACHE_KEY_MODE', 'legacy')
+
+# 近重复查找：相似图片（不同裁剪、压缩）复用已缓存的识别结果
+NEAR_DUPLICATE_ENABLED = os.environ.get('NEAR_DUPLICATE_ENABLED', '0') == '1'
+NEAR_DUPLICATE_ALGORITHM = os.environ.get('NEAR_DUPLICATE_ALGORITHM', 'phash')  # phash / dhash
+NEAR_DUPLICATE_THRESHOLD = int(os.environ.get('NEAR_DUPLICATE_THRESHOLD', 6))  # 64位哈希的最大汉明距离
+
+# 磁盘结果缓存后端: json 每个结果一个文件; sqlite 单文件数据库（按访问时间索引过期和淘汰）
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'json')
+
+# 缓存清理策略：超过天数的文件删除；文件数或总字节数超限时按修改时间淘汰最旧的文件
+CACHE_MAX_AGE_DAYS = int(os.environ.get('CACHE_MAX_AGE_DAYS', 7))
+CACHE_MAX_FILES = int(os.environ.get('CACHE_MAX_FILES', 1000))
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+# 后台清理线程：每个时间片最多处理的文件数、时间片长度及间隔（秒）
+JANITOR_BATCH_SIZE = 200
+JANITOR_SLICE_SECONDS = 0.05
+JANITOR_INTERVAL = 1.0
+
 # 缓存目录设置
 CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
 os.makedirs(CACHE_DIR, exist_ok=True)
@@ -18,6 +82,18 @@ os.makedirs(LOG_DIR, exist_ok=True)
 LOG_FILE = os.path.join(LOG_DIR, 'qr_orc_scan.log')
 LOG_LEVEL = logging.DEBUG
 
+# 按请求的性能剖析：开启后带 X-Profile: 1 请求头或 profile=1 表单字段的识别请求在cProfile下执行
+PROFILE_ENABLED = os.environ.get('PROFILE_ENABLED', '0') == '1'
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))  # 未带标记的请求被抽样剖析的比例（0~1）
+PROFILE_HEADER = 'X-Profile'
+PROFILE_DIR = os.path.join(LOG_DIR, 'profiles')  # 剖析结果目录（首次保存时创建）
+PROFILE_MAX_FILES = 200       # 最多保留的剖析结果数，超出时删除最旧的
+PROFILE_TOP_FUNCTIONS = 40    # 文本摘要中列出的函数数量
+
+# 指标：各工作进程把指标快照写入该目录（定期及每次导出时），/metrics汇总所有进程，已退出进程的计数器和直方图保留
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(CACHE_DIR, 'index', 'metrics'))
+METRICS_FLUSH_INTERVAL = 5    # 快照写入间隔（秒）
+
 # 自定义UTF-8编码的日志处理器
 class UTF8RotatingFileHandler(RotatingFileHandler):
     def __init__(self, filename, mode='a', maxBytes=0, backupCount=0, encoding='utf-8', delay=False):
@@ -0,0 +1,33 @@
+import time
+"""
+请求期限:在请求入口创建,逐级传递给下载、二维码、分类、OCR各阶段,各阶段开始前检查剩余时间
+"""
+
+class DeadlineExceeded(Exception):
+    """请求期限已到，stage为超时的阶段"""
+    def __init__(self, stage):
+        super().__init__(f"请求处理超时（{stage}阶段）")
+        self.stage = stage
+
+class Deadline:
+    """单调时钟上的截止时间，线程安全（只读）"""
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        """剩余秒数（不小于0）"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage):
+        """期限已到时抛出DeadlineExceeded"""
+        if self.expired():
+            raise DeadlineExceeded(stage)
+
+    def timeout(self, limit=None):
+        """供阻塞调用使用的超时时间：剩余时间与limit中较小者"""
+        remaining = self.remaining()
+        return remaining if limit is None else min(remaining, limit)
@@ -0,0 +1,40 @@
+import cv2
+from metrics import STAGE_SECONDS
+"""
+单次请求的图像上下文,图像只解码一次,各处理阶段共享
+"""
+
+class FrameContext:
+    def __init__(self, image, image_path=None):
+        self.image = image              # 原始BGR图像
+        self.image_path = image_path    # 图像来源路径（可为空）
+        # 派生视图，按需生成
+        self._gray = None
+        # 请求内共享的识别结果
+        self.qr_results = None
+        self.ocr_result = None
+
+    @classmethod
+    def from_path(cls, image_path):
+        """从文件读取图像，读取失败返回None"""
+        with STAGE_SECONDS.time(stage="decode"):
+            image = cv2.imread(image_path)
+        if image is None:
+            return None
+        return cls(image, image_path)
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    @property
+    def gray(self):
+        """原始图像的灰度视图（二维码检测使用，检测器按模块大小自行缩放）"""
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    def release(self):
+        """释放图像及派生视图，尽早归还内存"""
+        self.image = None
+        self._gray = None
@@ -0,0 +1,55 @@
+import time
+from config import (SERVER_BIND, SERVER_WORKERS, SERVER_THREADS, SERVER_MAX_REQUESTS,
+                    SERVER_MAX_REQUESTS_JITTER, REQUEST_TIMEOUT)
+"""
+gunicorn配置: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+bind = SERVER_BIND
+workers = SERVER_WORKERS
+worker_class = 'gthread'
+threads = SERVER_THREADS
+
+# 每个工作进程在fork之后加载应用和模型（不在主进程预加载，避免fork后共享PaddleOCR的线程状态）
+preload_app = False
+
+# 处理max_requests个请求后平滑重启工作进程
+max_requests = SERVER_MAX_REQUESTS
+max_requests_jitter = SERVER_MAX_REQUESTS_JITTER
+
+# 工作进程心跳超时需覆盖模型加载及预热；平滑重启时等待进行中的请求完成
+timeout = max(120, REQUEST_TIMEOUT * 2)
+graceful_timeout = REQUEST_TIMEOUT + 10
+
+def post_worker_init(worker):
+    """工作进程开始接收请求前，用空白图像预热OCR模型，有未完成的异步任务时启动任务线程"""
+    from ocr_service import OCRService
+    start_time = time.time()
+    try:
+        OCRService.warm_up()
+        worker.log.info(f"工作进程 {worker.pid} OCR模型预热完成，耗时: {time.time() - start_time:.2f}秒")
+    except Exception as e:
+        worker.log.error(f"工作进程 {worker.pid} OCR模型预热失败: {str(e)}")
+    try:
+        from app import job_queue
+        job_queue.resume()
+    except Exception as e:
+        worker.log.error(f"工作进程 {worker.pid} 恢复异步任务失败: {str(e)}")
+
+def worker_exit(server, worker):
+    """
+    工作进程退出（如达到max_requests被回收）时交还未完成的异步任务，由其他进程重新执行；
+    写入最后的指标快照，计数在下次导出时并入归档
+    """
+    try:
+        from app import job_queue
+        released = job_queue.release()
+        if released:
+            worker.log.info(f"工作进程 {worker.pid} 交还 {released} 个未完成的任务")
+    except Exception as e:
+        worker.log.error(f"工作进程 {worker.pid} 交还任务失败: {str(e)}")
+    try:
+        from metrics import write_snapshot
+        write_snapshot()
+    except Exception as e:
+        worker.log.error(f"工作进程 {worker.pid} 写入指标快照失败: {str(e)}")
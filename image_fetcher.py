@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import urllib.parse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.exceptions import HTTPError as Urllib3Error
+from config import (FETCH_MAX_BYTES, FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT, FETCH_POOL_SIZE,
+                    FETCH_RETRIES, FETCH_REVALIDATE_AFTER)
+"""
+网络图片下载:按主机复用长连接会话,流式写入磁盘并限制大小,过期的缓存图片用ETag/Last-Modified条件请求重新验证
+"""
+
+# 分块写入大小
+FETCH_CHUNK_SIZE = 64 * 1024
+# 允许的非image/*内容类型（部分CDN不返回具体的图片类型）
+ALLOWED_CONTENT_TYPES = ('application/octet-stream', 'binary/octet-stream')
+# 缓存图片的验证信息（ETag、Last-Modified）保存在同名的元数据文件中
+META_SUFFIX = '.meta'
+
+class FetchError(Exception):
+    """图片下载失败"""
+
+class ImageFetcher:
+    """线程安全的图片下载器，每个主机一个连接池会话"""
+    def __init__(self, max_bytes=FETCH_MAX_BYTES, timeout=(FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT),
+                 pool_size=FETCH_POOL_SIZE, retries=FETCH_RETRIES, revalidate_after=FETCH_REVALIDATE_AFTER):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.retries = retries
+        self.revalidate_after = revalidate_after
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session(self, url):
+        """获取URL所在主机的会话"""
+        parsed = urllib.parse.urlparse(url)
+        host = f"{parsed.scheme}://{parsed.netloc}"
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                                      max_retries=Retry(total=self.retries, backoff_factor=0.2,
+                                                        status_forcelist=(502, 503, 504)))
+                session.mount(host, adapter)
+                self._sessions[host] = session
+            return session
+
+    @staticmethod
+    def _load_meta(path):
+        try:
+            with open(path + META_SUFFIX, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _save_meta(path, response):
+        meta = {key: response.headers[header] for key, header in
+                (("etag", "ETag"), ("last_modified", "Last-Modified")) if header in response.headers}
+        if meta:
+            with open(path + META_SUFFIX, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+        elif os.path.exists(path + META_SUFFIX):
+            os.remove(path + META_SUFFIX)
+
+    def _check_headers(self, response):
+        """在读取正文前检查内容类型和声明的长度"""
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type and not content_type.startswith('image/') and content_type not in ALLOWED_CONTENT_TYPES:
+            raise FetchError(f"不是图片内容: {content_type}")
+        content_length = response.headers.get('Content-Length')
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            raise FetchError(f"图片过大: {content_length} 字节，上限 {self.max_bytes} 字节")
+
+    @staticmethod
+    def _iter_body(response):
+        """
+        逐次返回已到达的正文数据（每次最多FETCH_CHUNK_SIZE字节）
+
+        iter_content会等待凑满整块，数据缓慢到达时一块可能持续很久；read1只等待一次读取
+        """
+        read1 = getattr(response.raw, 'read1', None)
+        if read1 is None:
+            # 较早的urllib3没有read1
+            yield from response.iter_content(FETCH_CHUNK_SIZE)
+            return
+        while True:
+            try:
+                chunk = read1(FETCH_CHUNK_SIZE, decode_content=True)
+            except Urllib3Error as e:
+                raise FetchError(str(e))
+            if not chunk:
+                return
+            yield chunk
+
+    def _write_body(self, response, path, deadline=None):
+        """
+        流式写入临时文件，超过上限时中止，完成后原子替换目标文件
+
+        读取超时只限制每次读取的间隔，每次读到数据后检查请求期限，缓慢的下载同样在期限到达时中止
+        """
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in self._iter_body(response):
+                    if deadline is not None:
+                        deadline.check("download")
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise FetchError(f"图片过大: 超过 {self.max_bytes} 字节")
+                    f.write(chunk)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return size
+
+    def _get(self, url, headers, deadline):
+        """发送GET请求（流式读取），连接及读取超时不超过请求的剩余时间"""
+        timeout = self.timeout
+        if deadline is not None:
+            deadline.check("download")
+            timeout = tuple(deadline.timeout(limit) for limit in self.timeout)
+        try:
+            return self.session(url).get(url, headers=headers, stream=True, timeout=timeout)
+        except requests.RequestException as e:
+            raise FetchError(str(e))
+
+    def fetch(self, url, path, deadline=None):
+        """
+        下载图片到path
+
+        path已存在且未超过重新验证时间时直接使用；超过时发送条件请求，服务器返回304则继续使用。
+        deadline: 请求期限，到达时（包括下载过程中）抛出DeadlineExceeded
+        返回: 是否写入了新的内容
+        """
+        headers = {}
+        if os.path.exists(path):
+            if time.time() - os.path.getmtime(path) < self.revalidate_after:
+                return False
+            meta = self._load_meta(path)
+            if "etag" in meta:
+                headers["If-None-Match"] = meta["etag"]
+            if "last_modified" in meta:
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = self._get(url, headers, deadline)
+        try:
+            if response.status_code == 304:
+                if os.path.exists(path):
+                    # 未修改：刷新修改时间，重新开始计算验证间隔
+                    os.utime(path, None)
+                    return False
+                # 缓存的图片在条件请求期间被清理：不带条件头重新下载，不把304的空正文当作图片
+                response.close()
+                response = self._get(url, {}, deadline)
+                if response.status_code == 304:
+                    raise FetchError("服务器对非条件请求返回304")
+            try:
+                response.raise_for_status()
+            except requests.HTTPError as e:
+                raise FetchError(str(e))
+            self._check_headers(response)
+            try:
+                self._write_body(response, path, deadline)
+            except requests.RequestException as e:
+                raise FetchError(str(e))
+            self._save_meta(path, response)
+            return True
+        finally:
+            response.close()
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+# 全局下载器，所有请求线程共享连接池
+IMAGE_FETCHER = ImageFetcher()
@@ -0,0 +1,66 @@
+import hashlib
+import cv2
+import numpy as np
+"""
+图像哈希: 完整内容的快速哈希(xxhash/BLAKE3,未安装时使用blake2b)及解码后像素的感知哈希
+"""
+
+# 可选依赖：按速度优先使用xxhash、BLAKE3
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+# 分块读取文件的大小
+HASH_CHUNK_SIZE = 1024 * 1024
+# 感知哈希边长（8 -> 64位）
+PERCEPTUAL_HASH_SIZE = 8
+
+def new_content_hasher():
+    """创建内容哈希对象"""
+    if xxhash is not None:
+        return xxhash.xxh3_128()
+    if blake3 is not None:
+        return blake3.blake3()
+    return hashlib.blake2b(digest_size=16)
+
+def content_hash(data):
+    """计算完整数据的内容哈希"""
+    hasher = new_content_hasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+def file_content_hash(file_path):
+    """分块计算文件的内容哈希"""
+    hasher = new_content_hasher()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def dhash(image, hash_size=PERCEPTUAL_HASH_SIZE):
+    """差值哈希：缩小为(hash_size+1)xhash_size的灰度图，比较相邻像素，返回整数"""
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).tobytes().hex(), 16)
+
+def phash(image, hash_size=PERCEPTUAL_HASH_SIZE, highfreq_factor=4):
+    """DCT感知哈希：取低频DCT系数与中位数比较，对压缩和轻微裁剪更稳定，返回整数"""
+    size = hash_size * highfreq_factor
+    small = cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    dct = cv2.dct(small.astype(np.float32))[:hash_size, :hash_size]
+    bits = (dct > np.median(dct)).flatten()
+    return int(np.packbits(bits).tobytes().hex(), 16)
+
+def hamming_distance(a, b):
+    """两个整数哈希的汉明距离"""
+    return bin(a ^ b).count("1")
@@ -1,12 +1,11 @@
-import cv2
 import os
 import time
-from PIL import Image
-import io
-import numpy as np
 from models import ImageType, IMAGE_TYPE_NAMES
 from ocr_service import OCRService
 from qrcode_service import QRCodeService
+from frame_context import FrameContext
+from deadline import DeadlineExceeded
+from metrics import observe_stage
 """
 图片处理器,分别处理图片,相关操作
 """
@@ -14,83 +13,169 @@ class ImageProcessor:
     def __init__(self, app):
         self.app = app
     
-    def identify_image_type(self, image_path):
-        """识别图片类型"""
+    def identify_image_type(self, frame, deadline=None):
+        """
+        识别图片类型
+
+        参数:
+            frame: 请求的图像上下文FrameContext（兼容传入图像路径）
+            deadline: 请求期限，证件分类及OCR前检查，到达时抛出DeadlineExceeded
+        OCR只识别一次，结果保存在frame.ocr_result中，供各证件检测及后续文字提取共享
+        """
         try:
-            # 读取图像
-            image_cv = cv2.imread(image_path)
-            if image_cv is None:
+            # 兼容直接传入图像路径
+            if not isinstance(frame, FrameContext):
+                frame = FrameContext.from_path(frame)
+            if frame is None:
                 return ImageType.UNKNOWN, IMAGE_TYPE_NAMES[ImageType.UNKNOWN], None
+            image_cv = frame.image
             
-            # 检测是否为二维码
-            qr_results = QRCodeService.decode_qrcode(image_cv)
-            if qr_results:
+            # 检测是否为二维码（已解码过则直接复用结果）
+            if frame.qr_results is None:
+                frame.qr_results = QRCodeService.decode_qrcode(frame.gray)
+            if frame.qr_results:
                 return ImageType.QRCODE, IMAGE_TYPE_NAMES[ImageType.QRCODE], None
             
+            if deadline is not None:
+                deadline.check("classification")
+            
+            # 单次OCR识别，所有证件检测共用同一结果
+            ocr_result = frame.ocr_result = OCRService.run_ocr(image_cv, deadline)
+            
             # 检测是否为身份证
-            idcard_result = OCRService.detect_idcard(image_cv)
+            idcard_result = OCRService.detect_idcard(image_cv, ocr_result)
             if idcard_result and isinstance(idcard_result, dict) and idcard_result.get("is_idcard"):
                 return ImageType.IDCARD, IMAGE_TYPE_NAMES[ImageType.IDCARD], idcard_result.get("side", "unknown")
             
             # update 2023-08-23 14:55:20 新增驾驶证识别
             # 检测是否为驾驶证
-            driverCard_result = OCRService.detect_driverCard(image_cv)
+            driverCard_result = OCRService.detect_driverCard(image_cv, ocr_result)
             if driverCard_result and isinstance(driverCard_result, dict) and driverCard_result.get("is_drivercard"):
                 return ImageType.DRIVERCARD, IMAGE_TYPE_NAMES[ImageType.DRIVERCARD], driverCard_result.get("side", "unknown")
             # update 2023-08-23 14:55:20 新增行驶证识别
             # 检测是否为行驶证
-            vehicleCard_result = OCRService.detect_vehicleCard(image_cv)
+            vehicleCard_result = OCRService.detect_vehicleCard(image_cv, ocr_result)
             if vehicleCard_result and isinstance(vehicleCard_result, dict) and vehicleCard_result.get("is_vehiclecard"):
                 return ImageType.VEHICLECARD, IMAGE_TYPE_NAMES[ImageType.VEHICLECARD], vehicleCard_result.get("side", "unknown")
 
             # 检测是否为银行卡
-            is_bankcard = OCRService.detect_bankcard(image_cv)
+            is_bankcard = OCRService.detect_bankcard(image_cv, ocr_result)
             if is_bankcard:
                 return ImageType.BANKCARD, IMAGE_TYPE_NAMES[ImageType.BANKCARD], None
             
             # 默认为普通图片
             return ImageType.NORMAL, IMAGE_TYPE_NAMES[ImageType.NORMAL], None
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             self.app.logger.error(f"识别图片类型出错: {str(e)}")
             return ImageType.UNKNOWN, IMAGE_TYPE_NAMES[ImageType.UNKNOWN], None
     
-    def mixed_recognition(self, image_path, use_color_filter=False, target_color=(30, 30, 30), is_temp=False):
+    @staticmethod
+    def new_result():
+        """识别结果的初始字段"""
+        return {
+            "imageType": ImageType.UNKNOWN,
+            "imageTypeName": IMAGE_TYPE_NAMES[ImageType.UNKNOWN],  # 图片类型名称
+            "ocrContent": "",  # 文字识别结果
+            "qrContent": "",  # 二维码内容
+            "qrType": "",  # 二维码类型
+            "qrTypeName": "",  # 二维码类型名称
+            "type": "text",  # 识别结果类型
+            "qr_time": 0,  # 二维码识别时间
+            "text_time": 0  # 文字识别时间
+        }
+    
+    @staticmethod
+    def fill_qrcode_fields(result, qr_results):
+        """把二维码解码结果写入识别结果"""
+        qr_data = [qr.data.decode("utf-8", errors="ignore") for qr in qr_results]
+        
+        # 使用第一个二维码作为主要结果
+        result["qrContent"] = qr_data[0] if qr_data else ""
+        
+        # 保留原有的详细信息，每个二维码只分类一次
+        qr_types = [QRCodeService.classify_qrcode(data) for data in qr_data]
+        
+        # 识别二维码类型
+        if qr_types:
+            result["qrType"] = qr_types[0]["code"]
+            result["qrTypeName"] = qr_types[0]["name"]
+        
+        # 设置结果类型为二维码
+        result["type"] = "qr_code"
+    
+    @staticmethod
+    def recognize_qrcode(frame):
+        """
+        只解码二维码，不加载OCR模型
+        
+        有二维码时返回与mixed_recognition格式相同的结果，否则返回None；解码结果保存在frame.qr_results中
+        """
+        start_qr = time.time()
+        frame.qr_results = QRCodeService.decode_qrcode(frame.gray)
+        if not frame.qr_results:
+            return None
+        result = ImageProcessor.new_result()
+        result["imageType"] = ImageType.QRCODE
+        result["imageTypeName"] = IMAGE_TYPE_NAMES[ImageType.QRCODE]
+        result["qr_time"] = round(time.time() - start_qr, 2)
+        ImageProcessor.fill_qrcode_fields(result, frame.qr_results)
+        return result
+    
+    @observe_stage("recognize")
+    def mixed_recognition(self, image_path, use_color_filter=False, target_color=(30, 30, 30), is_temp=False,
+                          deadline=None):
         """
         混合识别函数：优先识别二维码，无二维码时进行文字识别
         
         参数:
-            image_path: 图像路径
+            image_path: 图像路径，或已解码的图像上下文FrameContext
             use_color_filter: 是否使用颜色过滤 (默认False)
             target_color: 目标文字颜色 BGR格式 (默认黑色)
             is_temp: 是否为临时文件，处理完成后删除
+            deadline: 请求期限，到达时返回已完成阶段的部分结果（partial为True，timeoutStage为超时阶段）
         """
+        frame = image_path if isinstance(image_path, FrameContext) else None
         try:
-            # 读取图像
-            image_cv = cv2.imread(image_path)
-            if image_cv is None:
+            # 读取图像（每个请求只解码一次）
+            if frame is None:
+                frame = FrameContext.from_path(image_path)
+            if frame is None:
                 return {"type": "error", "data": "无法读取图像"}
-            
-            # 图像尺寸优化
-            h, w = image_cv.shape[:2]
-            if max(h, w) > 1024:
-                scale = 1024 / max(h, w)
-                image_cv = cv2.resize(image_cv, (int(w*scale), int(h*scale)))
-            
-            # 识别图片类型
-            image_type, image_type_name, side = self.identify_image_type(image_path)
+            image_path = frame.image_path
             
             # 初始化返回结果字段
-            result = {
-                "imageType": image_type,
-                "imageTypeName": image_type_name,  # 图片类型名称
-                "ocrContent": "",  # 文字识别结果
-                "qrContent": "",  # 二维码内容
-                "qrType": "",  # 二维码类型
-                "qrTypeName": "",  # 二维码类型名称
-                "type": "text",  # 识别结果类型
-                "qr_time": 0,  # 二维码识别时间
-                "text_time": 0  # 文字识别时间
-            }
+            result = self.new_result()
+            
+            try:
+                if deadline is not None:
+                    deadline.check("qr")
+                
+                # 二维码识别计时，每个请求只解码一次（已解码过则直接复用），类型识别阶段直接复用结果
+                if frame.qr_results is None:
+                    start_qr = time.time()
+                    frame.qr_results = QRCodeService.decode_qrcode(frame.gray)
+                    result["qr_time"] = round(time.time() - start_qr, 2)
+                qr_results = frame.qr_results
+                
+                # 如果有二维码结果
+                if qr_results:
+                    self.fill_qrcode_fields(result, qr_results)
+                
+                # 识别图片类型
+                image_type, image_type_name, side = self.identify_image_type(frame, deadline)
+                result["imageType"] = image_type
+                result["imageTypeName"] = image_type_name
+            except DeadlineExceeded as e:
+                # 期限已到：返回已完成阶段的结果（如二维码内容），不再识别证件类型和文字
+                self.app.logger.warning(f"识别超时，返回部分结果: {e.stage}")
+                result["partial"] = True
+                result["timeoutStage"] = e.stage
+                if result["type"] != "qr_code":
+                    result["type"] = "error"
+                    result["error"] = "请求处理超时"
+                return result
             
             # 如果是身份证，添加正反面信息
             if image_type == ImageType.IDCARD and side:
@@ -106,46 +191,13 @@ class ImageProcessor:
             if image_type == ImageType.VEHICLECARD and side:
                 result["side"] = side
                 result["sideName"] = "正面" if side == "front" else "反面"
-
-            # 二维码识别计时
-            start_qr = time.time()
-            qr_results = QRCodeService.decode_qrcode(image_cv)
-            qr_time = time.time() - start_qr
-            result["qr_time"] = round(qr_time, 2)
             
-            # 如果有二维码结果
-            if qr_results:
-                qr_data = [qr.data.decode("utf-8", errors="ignore") for qr in qr_results]
-                
-                # 使用第一个二维码作为主要结果
-                result["qrContent"] = qr_data[0] if qr_data else ""
-                
-                # 识别二维码类型
-                if qr_data:
-                    qr_type, qr_type_name = QRCodeService.identify_qrcode_type(qr_data[0])
-                    result["qrType"] = qr_type
-                    result["qrTypeName"] = qr_type_name
-                
-                # 设置结果类型为二维码
-                result["type"] = "qr_code"
-                
-                # 保留原有的详细信息
-                qr_types = []
-                for data in qr_data:
-                    qr_type, qr_type_name = QRCodeService.identify_qrcode_type(data)
-                    is_payment, payment_type = QRCodeService.is_payment_qrcode(data)
-                    qr_types.append({
-                        "code": qr_type,
-                        "name": qr_type_name,
-                        "is_payment": is_payment,
-                        "payment_type": payment_type if is_payment else None
-                    })
-            else:
+            if not qr_results:
                 # 文字识别处理 - 使用PaddleOCR
                 start_text = time.time()
                 try:
-                    # 使用OCR服务进行识别
-                    text = OCRService.perform_ocr(image_path)
+                    # 使用OCR服务进行识别，复用类型识别阶段的OCR结果（类型识别出错未得到结果时重新识别，同样受期限限制）
+                    text = OCRService.perform_ocr(frame.image, frame.ocr_result, deadline)
                     text_time = time.time() - start_text
                     result["text_time"] = round(text_time, 2)
                     
@@ -154,6 +206,13 @@ class ImageProcessor:
                         result["ocrContent"] = text.strip()
                     else:
                         result["type"] = "none"
+                except DeadlineExceeded as e:
+                    # 期限已到：返回已识别的图片类型
+                    self.app.logger.warning(f"识别超时，返回部分结果: {e.stage}")
+                    result["partial"] = True
+                    result["timeoutStage"] = e.stage
+                    result["type"] = "error"
+                    result["error"] = "请求处理超时"
                 except Exception as e:
                     self.app.logger.error(f"文字识别错误: {str(e)}")
                     result["type"] = "error"
@@ -161,8 +220,11 @@ class ImageProcessor:
             
             return result
         finally:
+            # 尽早释放解码后的图像
+            if frame is not None:
+                frame.release()
             # 如果是临时文件，处理完成后删除
-            if is_temp and os.path.exists(image_path):
+            if is_temp and image_path and os.path.exists(image_path):
                 try:
                     os.remove(image_path)
                 except:
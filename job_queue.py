@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import tempfile
+import threading
+import requests
+from config import (CACHE_DIR, JOB_WORKERS, JOB_QUEUE_SIZE, JOB_RESULT_TTL, JOB_CALLBACK_TIMEOUT, JOB_DEFAULT_PRIORITY,
+                    JOB_POLL_INTERVAL, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS)
+"""
+异步识别任务:任务状态保存在SQLite中由所有工作进程共享,有界优先级队列,结果可轮询查询或回调通知
+"""
+
+# 任务数据库放在缓存目录的子目录中，不受缓存文件清理影响
+JOB_DB_PATH = os.path.join(CACHE_DIR, 'index', 'jobs.db')
+
+# 查询任务状态时读取的列（不含上传图片的内容）
+JOB_COLUMNS = ("id, status, priority, source_type, value, callback_url, result, attempts, "
+               "created_at, started_at, finished_at")
+
+class QueueFullError(Exception):
+    """任务队列已满"""
+
+class Job:
+    """识别任务及其状态: queued / running / done"""
+    def __init__(self, source_type, value, priority=JOB_DEFAULT_PRIORITY, callback_url=None):
+        self.id = uuid.uuid4().hex
+        self.source_type = source_type
+        self.value = value
+        self.priority = priority
+        self.callback_url = callback_url
+        self.status = "queued"
+        self.result = None
+        # 上传的图片内容（source_type为image时），重新执行时写入新的临时文件
+        self.payload = None
+        self.attempts = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @classmethod
+    def from_row(cls, row):
+        job = cls(row["source_type"], row["value"], row["priority"], row["callback_url"])
+        job.id = row["id"]
+        job.status = row["status"]
+        job.result = tuple(json.loads(row["result"])) if row["result"] else None
+        job.payload = row["payload"] if "payload" in row.keys() else None
+        job.attempts = row["attempts"]
+        job.created_at = row["created_at"]
+        job.started_at = row["started_at"]
+        job.finished_at = row["finished_at"]
+        return job
+
+    def to_dict(self):
+        data = {
+            "jobId": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+        }
+        if self.result is not None:
+            code, message, result = self.result
+            data["result"] = {"code": code, "message": message, "data": result}
+        return data
+
+class JobQueue:
+    """
+    任务队列
+
+    参数:
+        handler: 识别函数 handler(source_type, value) -> (状态码, 消息, 数据)
+    优先级数字越小越先执行，相同优先级按提交顺序执行。
+    任务保存在SQLite中，任一工作进程都能查询任务、领取排队的任务；领取时记录租约，
+    工作进程被回收时交还未完成的任务，异常退出时租约到期后由其他进程重新领取（最多JOB_MAX_ATTEMPTS次）。
+    上传的图片内容保存在任务中（提交后删除临时文件），每次执行写入新的临时文件，重新执行时不依赖已被删除的文件。
+    """
+    def __init__(self, app, handler, workers=JOB_WORKERS, maxsize=JOB_QUEUE_SIZE, result_ttl=JOB_RESULT_TTL,
+                 db_path=JOB_DB_PATH, poll_interval=JOB_POLL_INTERVAL, lease_seconds=JOB_LEASE_SECONDS):
+        self.app = app
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self.result_ttl = result_ttl
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        # 本进程的标识，领取的任务记录在其名下
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._local = threading.local()
+        self._initialized = False
+        self._threads = []
+
+    def _connect(self):
+        """每个线程使用独立的连接，首次使用时建表"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._initialized:
+            with self.lock:
+                if not self._initialized:
+                    self._create_table(conn)
+                    self._initialized = True
+        return conn
+
+    @staticmethod
+    def _create_table(conn):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                source_type TEXT NOT NULL,
+                value TEXT,
+                callback_url TEXT,
+                result TEXT,
+                owner TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                payload BLOB
+            )
+        """)
+        # 早期版本的任务表没有payload列
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+        if "payload" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN payload BLOB")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, priority, created_at)")
+
+    def _start_workers(self):
+        """首次提交或查询任务时启动工作线程"""
+        with self.lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, source_type, value, priority=JOB_DEFAULT_PRIORITY, callback_url=None):
+        """
+        提交任务，所有进程排队中的任务达到上限时抛出QueueFullError
+
+        source_type为image时value为上传文件的临时路径，内容读入任务后删除该文件（队列已满时由调用方删除）
+        """
+        self._start_workers()
+        self.expire()
+        job = Job(source_type, value, priority, callback_url)
+        if source_type == 'image':
+            with open(value, 'rb') as f:
+                job.payload = f.read()
+            job.value = None
+        conn = self._connect()
+        # IMMEDIATE事务：计数和插入之间不会有其他进程插入
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= self.maxsize:
+                raise QueueFullError(f"任务队列已满 ({self.maxsize})")
+            conn.execute("INSERT INTO jobs (id, status, priority, source_type, value, callback_url, created_at, "
+                         "payload) VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+                         (job.id, priority, source_type, job.value, callback_url, job.created_at, job.payload))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if source_type == 'image':
+            os.remove(value)
+        self._wakeup.set()
+        return job
+
+    def get(self, job_id):
+        self._start_workers()
+        row = self._connect().execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row is not None else None
+
+    def expire(self):
+        """删除完成时间超过result_ttl的任务"""
+        self._connect().execute("DELETE FROM jobs WHERE status = 'done' AND finished_at < ?",
+                                (time.time() - self.result_ttl,))
+
+    def _claim(self):
+        """领取优先级最高的排队任务（或租约已过期的运行中任务），没有时返回None"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY priority, created_at LIMIT 1", (now,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET status = 'running', owner = ?, lease_until = ?, "
+                             "attempts = attempts + 1, started_at = ? WHERE id = ?",
+                             (self.owner, now + self.lease_seconds, now, row["id"]))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        job = Job.from_row(row)
+        job.status = "running"
+        job.started_at = now
+        job.attempts += 1
+        return job
+
+    def _finish(self, job):
+        """保存任务结果；任务已被交还或重新领取时不覆盖"""
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = 'done', result = ?, value = NULL, payload = NULL, owner = NULL, "
+            "lease_until = NULL, finished_at = ? WHERE id = ? AND owner = ?",
+            (json.dumps(list(job.result), ensure_ascii=False), job.finished_at, job.id, self.owner))
+        return cursor.rowcount > 0
+
+    def release(self):
+        """交还本进程领取但未完成的任务（工作进程退出时调用），返回交还数量"""
+        if not os.path.exists(self.db_path):
+            return 0
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL, attempts = attempts - 1 "
+            "WHERE status = 'running' AND owner = ?", (self.owner,))
+        return cursor.rowcount
+
+    def resume(self):
+        """有未完成的任务时启动工作线程（工作进程启动时调用，接手被回收进程交还的任务）"""
+        if not os.path.exists(self.db_path):
+            return
+        row = self._connect().execute("SELECT 1 FROM jobs WHERE status != 'done' LIMIT 1").fetchone()
+        if row is not None:
+            self._start_workers()
+
+    def _worker(self):
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                self.app.logger.error(f"领取任务出错: {str(e)}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            try:
+                self._run(job)
+            except Exception as e:
+                # 工作线程不因单个任务出错退出，任务在租约到期后重新执行
+                self.app.logger.error(f"执行任务出错: {job.id}, 错误: {str(e)}")
+
+    def _source_value(self, job):
+        """任务的图像数据；上传的图片每次执行写入新的临时文件（识别完成后由handler删除）"""
+        if job.source_type != 'image':
+            return job.value
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as f:
+            f.write(job.payload or b'')
+        return f.name
+
+    def _run(self, job):
+        if job.attempts > JOB_MAX_ATTEMPTS:
+            # 多次执行都未完成（工作进程在执行中退出），不再重试
+            job.result = (500, "任务执行失败次数过多", None)
+        else:
+            try:
+                job.result = self.handler(job.source_type, self._source_value(job))
+            except Exception as e:
+                job.result = (500, str(e), None)
+        job.finished_at = time.time()
+        job.status = "done"
+        try:
+            finished = self._finish(job)
+        except sqlite3.Error as e:
+            # 如数据库被锁定：任务保持运行状态，租约到期后重新执行
+            self.app.logger.error(f"保存任务结果出错: {job.id}, 错误: {str(e)}")
+            return
+        if not finished:
+            self.app.logger.warning(f"任务已由其他进程接手，结果不保存: {job.id}")
+            return
+        self.app.logger.info(f"任务完成: {job.id}, 状态码: {job.result[0]}, "
+                             f"耗时: {job.finished_at - job.started_at:.2f}秒")
+        if job.callback_url:
+            self._notify(job)
+
+    def _notify(self, job):
+        """向回调地址POST任务结果"""
+        try:
+            response = requests.post(job.callback_url, json={"code": 200, "message": "成功", "data": job.to_dict()},
+                                     timeout=JOB_CALLBACK_TIMEOUT)
+            response.raise_for_status()
+        except Exception as e:
+            self.app.logger.error(f"任务回调失败: {job.id}, {job.callback_url}, 错误: {str(e)}")
+
+    def stats(self):
+        """返回所有进程的排队数量及各状态的任务数"""
+        counts = {"queued": 0, "running": 0, "done": 0}
+        if os.path.exists(self.db_path):
+            for status, count in self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+                counts[status] = count
+        return {
+            **counts,
+            "capacity": self.maxsize,
+            "workers": self.workers,
+        }
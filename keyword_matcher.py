@@ -0,0 +1,130 @@
+from collections import deque
+from models import DOCUMENT_RULES
+"""
+多模式关键词匹配(Aho-Corasick),证件分类规则表在导入时编译一次
+"""
+
+# 规则表中的关键词分组
+KEYWORD_GROUPS = ["exclude", "required", "front", "back", "markers", "fallback"]
+
+class KeywordMatcher:
+    """Aho-Corasick多模式匹配器，一次扫描找出所有关键词（含相互重叠的关键词）"""
+    def __init__(self, keywords):
+        self.keywords = list(dict.fromkeys(keywords))
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        # 构建关键词字典树
+        for keyword in self.keywords:
+            node = 0
+            for ch in keyword:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[node][ch] = nxt
+                node = nxt
+            self._out[node].append(keyword)
+        # 广度优先构建失败指针，并合并后缀节点的输出
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text):
+        """逐个返回命中的 (起始位置, 关键词)"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for keyword in out[node]:
+                yield i - len(keyword) + 1, keyword
+
+    def match(self, text):
+        """返回 {关键词: [起始位置列表]}"""
+        hits = {}
+        for start, keyword in self.iter_matches(text):
+            hits.setdefault(keyword, []).append(start)
+        return hits
+
+# 规则表全部关键词编译为一个匹配器
+DOCUMENT_MATCHER = KeywordMatcher(
+    keyword
+    for rule in DOCUMENT_RULES.values()
+    for group in KEYWORD_GROUPS
+    for keyword in rule.get(group, [])
+)
+
+def match_documents(lines, y_centers=None):
+    """
+    对OCR文本行执行一次匹配，返回各证件类型的命中情况
+
+    参数:
+        lines: OCR文本行（已转小写），等价于以空格合并后的文本
+        y_centers: 各行中心点y坐标，用于判断关键词从上到下的顺序
+    返回:
+        {证件类型: {"found": 命中关键词集合, "counts": {分组: 命中数},
+                   "positions": {关键词: [在合并文本中的位置]}, "front_ordered": bool}}
+    """
+    # 行在合并文本中的起始位置，及按y坐标排序后的名次
+    line_starts = []
+    offset = 0
+    for line in lines:
+        line_starts.append(offset)
+        offset += len(line) + 1
+    if y_centers is not None:
+        order = sorted(range(len(lines)), key=lambda i: y_centers[i])
+    else:
+        order = range(len(lines))
+    ranks = [0] * len(lines)
+    for rank, index in enumerate(order):
+        ranks[index] = rank
+
+    # 关键词不含空格，逐行匹配与匹配合并文本结果一致
+    positions = {}
+    first_ordered = {}
+    for index, line in enumerate(lines):
+        for start, keyword in DOCUMENT_MATCHER.iter_matches(line):
+            positions.setdefault(keyword, []).append(line_starts[index] + start)
+            key = (ranks[index], start)
+            if keyword not in first_ordered or key < first_ordered[keyword]:
+                first_ordered[keyword] = key
+
+    matches = {}
+    for doc_type, rule in DOCUMENT_RULES.items():
+        found = set()
+        counts = {}
+        for group in KEYWORD_GROUPS:
+            # 按列表计数（与逐个关键词判断的结果一致）
+            hit = [keyword for keyword in rule.get(group, []) if keyword in positions]
+            counts[group] = len(hit)
+            found.update(hit)
+
+        # 正面关键词按规则顺序，在从上到下排序的文本中首次出现的位置不能倒退
+        front_ordered = True
+        if rule.get("front_ordered"):
+            last_key = None
+            for keyword in rule.get("front", []):
+                if keyword in first_ordered:
+                    if last_key is not None and first_ordered[keyword] < last_key:
+                        front_ordered = False
+                        break
+                    last_key = first_ordered[keyword]
+
+        matches[doc_type] = {
+            "found": found,
+            "counts": counts,
+            "positions": {keyword: positions[keyword] for keyword in found},
+            "front_ordered": front_ordered,
+        }
+    return matches
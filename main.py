@@ -1,15 +1,57 @@
 import os
 import sys
 import json
+import uuid
 import tempfile
-from app import app
+from frame_context import FrameContext
 from image_processor import ImageProcessor
-from cache_manager import CacheManager
-from models import ImageType, IMAGE_TYPE_NAMES
 
-# 初始化组件
-cache_manager = CacheManager(app)
-image_processor = ImageProcessor(app)
+def load_cli_image(arg):
+    """把命令行参数（URL、Base64或本地路径）转为本地图像文件，返回 (路径, 是否为临时文件)"""
+    # 检查是否是URL
+    if arg.startswith(('http://', 'https://')):
+        from image_fetcher import IMAGE_FETCHER, META_SUFFIX
+        temp_path = os.path.join(tempfile.gettempdir(), f"qrscan_{uuid.uuid4().hex}.jpg")
+        try:
+            IMAGE_FETCHER.fetch(arg, temp_path)
+        except Exception as e:
+            raise Exception(f"下载图片失败: {str(e)}")
+        finally:
+            # 临时图片不会再次验证，不保留下载器写入的验证信息文件
+            if os.path.exists(temp_path + META_SUFFIX):
+                os.remove(temp_path + META_SUFFIX)
+        return temp_path, True
+
+    # 检查是否是Base64
+    if arg.startswith(('data:image', 'base64:')):
+        from cache_manager import CacheManager
+        if arg.startswith('base64:'):
+            arg = arg[7:]
+        try:
+            image_data = CacheManager.decode_base64(arg)
+        except Exception as e:
+            raise Exception(f"Base64图像处理失败: {str(e)}")
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as f:
+            f.write(image_data)
+        return f.name, True
+
+    # 否则当作本地文件路径处理
+    return arg, False
+
+def recognize_cli(image_path, use_color_filter=False):
+    """命令行识别：解码到二维码时直接返回，不创建Flask应用、不加载OCR模型"""
+    frame = FrameContext.from_path(image_path)
+    if frame is None:
+        return {"type": "error", "data": "无法读取图像"}
+
+    result = ImageProcessor.recognize_qrcode(frame)
+    if result is not None:
+        frame.release()
+        return result
+
+    # 没有二维码，执行完整识别（复用已解码的图像和二维码结果）
+    from app import app
+    return ImageProcessor(app).mixed_recognition(frame, use_color_filter)
 
 def process_from_cli():
     """处理命令行参数"""
@@ -19,6 +61,7 @@ def process_from_cli():
         if len(sys.argv) > 1:
             # 检查是否是启动服务器的命令
             if sys.argv[1] == 'server':
+                from app import app
                 port = 5000
                 host = '0.0.0.0'  # 修改为0.0.0.0允许所有IP访问
                 # 解析端口参数
@@ -36,42 +79,24 @@ def process_from_cli():
                 app.logger.info(f"服务器监听地址: {host}:{port}")
                 app.run(host=host, port=port, debug=False, threaded=True)
                 return
-                
-            # 检查是否是URL
-            elif sys.argv[1].startswith(('http://', 'https://')):
-                try:
-                    temp_path, cache_key = cache_manager.download_image(sys.argv[1])
-                    result = image_processor.mixed_recognition(temp_path, is_temp=False)  # 不在mixed_recognition中删除
-                    print(json.dumps(result, ensure_ascii=False))
-                except Exception as e:
-                    print(json.dumps({"type": "error", "data": str(e)}, ensure_ascii=False))
-                return
-                    
-            # 检查是否是Base64
-            elif sys.argv[1].startswith(('data:image', 'base64:')):
-                try:
-                    base64_str = sys.argv[1]
-                    if base64_str.startswith('base64:'):
-                        base64_str = base64_str[7:]
-                    temp_path, cache_key = cache_manager.save_base64_image(base64_str)
-                    result = image_processor.mixed_recognition(temp_path, is_temp=False)  # 不在mixed_recognition中删除
-                    print(json.dumps(result, ensure_ascii=False))
-                except Exception as e:
-                    print(json.dumps({"type": "error", "data": str(e)}, ensure_ascii=False))
+
+            try:
+                image_path, is_temp = load_cli_image(sys.argv[1])
+            except Exception as e:
+                print(json.dumps({"type": "error", "data": str(e)}, ensure_ascii=False))
                 return
-            
-            # 否则当作本地文件路径处理
-            image_path = sys.argv[1]
-            
+            if is_temp:
+                temp_path = image_path
+
             # 检查文件是否存在
             if not os.path.exists(image_path):
                 print(json.dumps({"type": "error", "data": f"文件不存在 - {image_path}"}, ensure_ascii=False))
                 return
-            
+
             # 可选参数
             use_color_filter = False  # 是否启用颜色过滤
-            
-            result = image_processor.mixed_recognition(image_path, use_color_filter)
+
+            result = recognize_cli(image_path, use_color_filter)
             print(json.dumps(result, ensure_ascii=False))
         else:
             # 无参数时显示帮助信息
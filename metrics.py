@@ -0,0 +1,391 @@
+import os
+import json
+import time
+import uuid
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+from config import METRICS_DIR, METRICS_FLUSH_INTERVAL
+try:
+    import fcntl
+except ImportError:  # Windows：只用于开发调试，汇总时不加锁
+    fcntl = None
+"""
+指标:计数器、仪表、直方图,以Prometheus文本格式导出(/metrics)
+
+gunicorn的多个工作进程各自记录指标,定期及导出时把快照写入METRICS_DIR,导出时汇总所有进程的快照:
+计数器和直方图求和(已退出进程的数值并入归档文件,总数不回退),仪表按各自的汇总方式只取存活进程的值
+"""
+
+# 默认直方图分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 已退出进程的计数器和直方图汇总到该文件
+ARCHIVE_FILE = 'archive.json'
+# 快照文件名中的随机部分，进程号被复用时不会覆盖已退出进程的快照
+PROCESS_TOKEN = uuid.uuid4().hex[:8]
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    @property
+    def output_labelnames(self):
+        """导出时的标签名"""
+        return self.labelnames
+
+    def snapshot(self):
+        """本进程的数值 [[标签值, 数值], ...]，写入快照文件"""
+        with self._lock:
+            return [[list(key), json.loads(json.dumps(value))] for key, value in self._values.items()]
+
+    def local_values(self):
+        """本进程的数值，格式同merge的返回值"""
+        return self.merge([{"pid": os.getpid(), "alive": True, "time": time.time(),
+                            "values": {self.name: self.snapshot()}}])
+
+    def merge(self, snapshots):
+        """
+        汇总各进程的快照，返回 {标签值: 数值}
+
+        snapshots: [{"pid", "alive", "time", "values": {指标名: [[标签值, 数值], ...]}}, ...]
+        """
+        raise NotImplementedError
+
+    def samples(self, values):
+        """返回 [(名称后缀, 标签值, 额外标签, 数值), ...]"""
+        raise NotImplementedError
+
+    def render(self, values=None):
+        """导出指标，values为merge汇总的数值（默认只导出本进程）"""
+        values = self.local_values() if values is None else values
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, key, extra, value in self.samples(values):
+            lines.append(f"{self.name}{suffix}{_format_labels(self.output_labelnames, key, extra)} "
+                         f"{_format_value(value)}")
+        return "\n".join(lines)
+
+def _entries(snapshot, name):
+    """快照中某个指标的 [(标签值元组, 数值), ...]"""
+    return [(tuple(key), value) for key, value in snapshot["values"].get(name, [])]
+
+class Counter(_Metric):
+    """只增不减的计数器，汇总时各进程（含已退出的进程）求和"""
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def merge(self, snapshots):
+        merged = {}
+        for snapshot in snapshots:
+            for key, value in _entries(snapshot, self.name):
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def samples(self, values):
+        return [("_total", key, (), value) for key, value in sorted(values.items())]
+
+class Gauge(_Metric):
+    """
+    可增可减的当前值，只汇总存活进程的值
+
+    mode: sum 各进程求和（如进行中的请求数）；pid 按进程分别导出，增加pid标签（如各进程的内存缓存）；
+          latest 取最近写入的快照（各进程读到的是同一份共享数据，如任务队列）
+    """
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), mode="sum"):
+        super().__init__(name, documentation, labelnames)
+        self.mode = mode
+
+    @property
+    def output_labelnames(self):
+        return self.labelnames + ("pid",) if self.mode == "pid" else self.labelnames
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        """with块执行期间加1"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def merge(self, snapshots):
+        merged = {}
+        alive = [snapshot for snapshot in snapshots if snapshot["alive"]]
+        if self.mode == "latest":
+            alive = sorted(alive, key=lambda snapshot: snapshot["time"])[-1:]
+        for snapshot in alive:
+            for key, value in _entries(snapshot, self.name):
+                if self.mode == "pid":
+                    merged[key + (str(snapshot["pid"]),)] = value
+                else:
+                    merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def samples(self, values):
+        return [("", key, (), value) for key, value in sorted(values.items())]
+
+class Histogram(_Metric):
+    """累计分桶直方图，汇总时各进程（含已退出的进程）逐桶求和"""
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [各分桶计数（最后一个为+Inf）, 总和, 数量]
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """记录with块的耗时（异常时同样记录）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def merge(self, snapshots):
+        merged = {}
+        for snapshot in snapshots:
+            for key, (counts, total, count) in _entries(snapshot, self.name):
+                entry = merged.get(key)
+                if entry is None:
+                    merged[key] = [list(counts), total, count]
+                    continue
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+                entry[2] += count
+        return merged
+
+    def samples(self, values):
+        samples = []
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", key, (("le", _format_value(float(bound))),), cumulative))
+            samples.append(("_sum", key, (), total))
+            samples.append(("_count", key, (), count))
+        return samples
+
+# 所有已创建的指标
+REGISTRY = []
+# 写入快照前调用的函数（更新从各组件统计得到的仪表）
+COLLECTORS = []
+
+def register_collector(func):
+    """注册写入快照前调用的函数"""
+    COLLECTORS.append(func)
+    return func
+
+def _snapshot_path(metrics_dir):
+    return os.path.join(metrics_dir, f"{os.getpid()}-{PROCESS_TOKEN}.json")
+
+def _write_json(path, data):
+    """先写临时文件再替换，读取方不会读到写了一半的文件"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _process_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # 没有权限发送信号：进程存在
+        return True
+    return True
+
+def write_snapshot(metrics_dir=METRICS_DIR):
+    """调用COLLECTORS后把本进程的指标快照写入目录（工作进程退出前也应调用一次）"""
+    for collector in COLLECTORS:
+        try:
+            collector()
+        except Exception:
+            pass
+    os.makedirs(metrics_dir, exist_ok=True)
+    _write_json(_snapshot_path(metrics_dir), {
+        "pid": os.getpid(),
+        "time": time.time(),
+        "values": {metric.name: metric.snapshot() for metric in REGISTRY},
+    })
+
+@contextmanager
+def _directory_lock(metrics_dir):
+    """汇总及归档时对快照目录加文件锁，多个进程同时导出时已退出进程的快照只归档一次"""
+    with open(os.path.join(metrics_dir, '.lock'), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def load_snapshots(metrics_dir=METRICS_DIR):
+    """读取所有进程的快照，已退出进程的计数器和直方图并入归档文件后删除其快照"""
+    archive_path = os.path.join(metrics_dir, ARCHIVE_FILE)
+    with _directory_lock(metrics_dir):
+        archive = _read_json(archive_path) or {"values": {}}
+        archive.update(pid=None, alive=False, time=0)
+        snapshots = []
+        dead_paths = []
+        for filename in os.listdir(metrics_dir):
+            if not filename.endswith('.json') or filename == ARCHIVE_FILE:
+                continue
+            path = os.path.join(metrics_dir, filename)
+            snapshot = _read_json(path)
+            if snapshot is None:
+                continue
+            snapshot["alive"] = _process_alive(snapshot["pid"])
+            if snapshot["alive"]:
+                snapshots.append(snapshot)
+            else:
+                dead_paths.append((path, snapshot))
+        if dead_paths:
+            merged = [archive] + [snapshot for _, snapshot in dead_paths]
+            archive["values"] = {metric.name: [[list(key), value] for key, value in metric.merge(merged).items()]
+                                 for metric in REGISTRY if metric.type in ("counter", "histogram")}
+            _write_json(archive_path, {"values": archive["values"]})
+            for path, _ in dead_paths:
+                os.remove(path)
+    return snapshots + [archive]
+
+def render_metrics(metrics_dir=METRICS_DIR):
+    """
+    以Prometheus文本格式导出所有工作进程汇总的指标
+
+    先写入本进程的最新快照再汇总：每个进程的数值要么是本次导出时的最新值，要么是不早于上次导出时的快照，
+    无论由哪个进程响应，计数器都不会回退
+    """
+    if not metrics_dir:
+        return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+    write_snapshot(metrics_dir)
+    snapshots = load_snapshots(metrics_dir)
+    return "\n".join(metric.render(metric.merge(snapshots)) for metric in REGISTRY) + "\n"
+
+_WRITER = None
+_WRITER_LOCK = threading.Lock()
+
+def start_snapshot_writer(interval=METRICS_FLUSH_INTERVAL, metrics_dir=METRICS_DIR):
+    """启动后台线程定期写入本进程的快照（重复调用无副作用）"""
+    global _WRITER
+    if not metrics_dir:
+        return
+    with _WRITER_LOCK:
+        if _WRITER is not None:
+            return
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    write_snapshot(metrics_dir)
+                except OSError:
+                    pass
+        _WRITER = threading.Thread(target=run, name='metrics-writer', daemon=True)
+    _WRITER.start()
+
+# 服务指标
+STAGE_SECONDS = Histogram("qrscan_stage_seconds", "各处理阶段耗时（秒）", ["stage"])
+REQUEST_SECONDS = Histogram("qrscan_request_seconds", "HTTP请求处理耗时（秒）", ["endpoint"])
+REQUESTS_IN_FLIGHT = Gauge("qrscan_requests_in_flight", "正在处理的HTTP请求数", ["endpoint"])
+OCR_IN_FLIGHT = Gauge("qrscan_ocr_in_flight", "正在执行的OCR识别数")
+CACHE_REQUESTS = Counter("qrscan_cache_requests", "识别结果缓存查询次数（按图像来源及命中情况）", ["source", "result"])
+ERRORS = Counter("qrscan_errors", "识别错误次数（按错误类型）", ["type"])
+QR_DECODES = Counter("qrscan_qr_decodes", "二维码检测次数（按解出的步骤：frame、roi_*、fallback，未解出为none）", ["step"])
+COALESCED_REQUESTS = Counter("qrscan_coalesced_requests", "合并到同一缓存键的进行中请求、共享其结果的请求数")
+# 以下仪表在写入快照前从各组件的统计中更新
+MEMORY_CACHE = Gauge("qrscan_memory_cache", "各工作进程的内存结果缓存统计", ["stat"], mode="pid")
+CACHE_DIR_USAGE = Gauge("qrscan_cache_dir", "各工作进程的缓存目录使用量及清理统计", ["stat"], mode="pid")
+JOBS = Gauge("qrscan_jobs", "异步识别任务统计：各状态的任务数、队列容量及工作线程数", ["stat"], mode="latest")
+
+def observe_stage(stage):
+    """装饰器：把函数耗时记入STAGE_SECONDS"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with STAGE_SECONDS.time(stage=stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class TimedCall:
+    """包装可调用对象，调用耗时记入STAGE_SECONDS，其余属性透传给原对象"""
+    def __init__(self, target, stage):
+        self._target = target
+        self._stage = stage
+
+    def __call__(self, *args, **kwargs):
+        with STAGE_SECONDS.time(stage=self._stage):
+            return self._target(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
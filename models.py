@@ -99,4 +99,53 @@ QR_TYPE_NAMES = {
     QRCodeType.URL: "网址",
     QRCodeType.TEXT: "文本",
     QRCodeType.UNKNOWN: "未知",
-}
\ No newline at end of file
+}
+
+# 证件分类规则表
+# 各分组关键词由KeywordMatcher统一编译，对OCR文本只扫描一次
+#   exclude:       命中任一则排除
+#   required:      至少命中一个
+#   front/back:    正面/反面关键词，按数量判断正反面
+#   markers:       辅助判断的标志性关键词
+#   fallback:      正反面均未达到阈值时，命中任一仍判定为该证件
+#   front_ordered: 正面关键词必须按从上到下的顺序出现
+#   exclusive:     正面/反面数量须多于另一面
+#   fallback_side: 兜底判定的正反面，"count"表示按关键词数量比较
+DOCUMENT_RULES = {
+    ImageType.IDCARD: {
+        "exclude": ["驾驶证", "驾驶员", "准驾车型", "档案编号", "机动车驾驶证"],
+        # 按照身份证上的顺序排列
+        "front": ["姓名", "性别", "民族", "出生", "住址", "公民身份号码"],
+        "back": ["签发机关", "签发日期", "有效期限", "有效期"],
+        "markers": ["居民身份证", "公民身份号码", "中华人民共和国"],
+        "min_front": 3,
+        "min_back": 2,
+    },
+    ImageType.DRIVERCARD: {
+        "required": ["驾驶证", "驾驶员", "机动车驾驶证"],
+        # 按照驾驶证上的顺序排列
+        "front": ["姓名", "性别", "国籍", "住址", "出生日期", "初次领证日期", "准驾车型"],
+        "back": ["档案编号", "记分", "发证机关", "有效期限"],
+        "fallback": ["驾驶证", "机动车驾驶证"],
+        "min_front": 3,
+        "min_back": 2,
+        "front_ordered": True,
+        "exclusive": False,
+        "fallback_side": "count",
+    },
+    ImageType.VEHICLECARD: {
+        "required": ["中华人民共和国机动车行驶证", "行驶证", "机动车登记证书", "车辆识别代号", "核定载人",
+                     "发动机号码", "档案编号", "注册日期", "核定载质量", "备注"],
+        "front": ["品牌型号", "车辆类型", "行驶证", "所有人", "住址", "使用性质", "发证日期"],
+        "back": ["检验记录", "核定载人", "核定载质量", "档案编号", "总质量", "备注", "整备质量", "备注"],
+        "fallback": ["行驶证"],
+        "min_front": 3,
+        "min_back": 2,
+        "front_ordered": False,
+        "exclusive": True,
+        "fallback_side": "unknown",
+    },
+    ImageType.BANKCARD: {
+        "markers": ["银行", "信用卡", "储蓄卡", "借记卡", "信用卡中心", "bank", "card"],
+    },
+}
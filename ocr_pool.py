@@ -0,0 +1,118 @@
+import atexit
+import threading
+import numpy as np
+from multiprocessing import get_context, shared_memory, resource_tracker
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from config import OCR_MODEL_OPTIONS, OCR_WORKER_PROCESSES, OCR_WORKER_CPU_THREADS, OCR_POOL_TIMEOUT
+"""
+OCR工作进程池,每个进程加载独立的PaddleOCR模型,图像通过共享内存传递
+"""
+
+# 工作进程内的模型实例
+_worker_ocr = None
+
+def _init_worker(cpu_threads):
+    """工作进程初始化：加载本进程的PaddleOCR模型"""
+    global _worker_ocr
+    from paddleocr import PaddleOCR
+    _worker_ocr = PaddleOCR(cpu_threads=cpu_threads, **OCR_MODEL_OPTIONS)
+
+def _ocr_shared_image(shm_name, shape, dtype):
+    """工作进程中执行：从共享内存读取图像并识别，返回PaddleOCR原始结果"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        # 共享内存由主进程负责释放，避免本进程退出时被资源跟踪器重复清理
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        image = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        result = _worker_ocr.ocr(image, cls=True)
+        del image
+        return result
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # 仍有对共享内存的引用时交由垃圾回收处理
+            pass
+
+def _ocr_path(image_path):
+    """工作进程中执行：直接识别图像文件"""
+    return _worker_ocr.ocr(image_path, cls=True)
+
+class OCRWorkerPool:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, processes=OCR_WORKER_PROCESSES, cpu_threads=OCR_WORKER_CPU_THREADS):
+        self.processes = processes
+        self.cpu_threads = cpu_threads
+        self.executor = self._create_executor()
+
+    def _create_executor(self):
+        # PaddleOCR不适合在fork后的子进程中使用，统一使用spawn
+        return ProcessPoolExecutor(max_workers=self.processes, mp_context=get_context("spawn"),
+                                   initializer=_init_worker, initargs=(self.cpu_threads,))
+
+    @classmethod
+    def enabled(cls):
+        """是否启用了OCR工作进程"""
+        return OCR_WORKER_PROCESSES > 0
+
+    @classmethod
+    def get(cls):
+        """获取全局进程池，首次使用时创建"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+                    atexit.register(cls._instance.shutdown)
+        return cls._instance
+
+    def ocr(self, image, timeout=None):
+        """
+        在工作进程中识别图像（ndarray或图像路径），返回PaddleOCR原始结果
+
+        timeout: 等待结果的秒数（不超过OCR_POOL_TIMEOUT），超时抛出concurrent.futures.TimeoutError
+        """
+        if isinstance(image, str):
+            return self._submit(_ocr_path, image, timeout=timeout)
+
+        image = np.ascontiguousarray(image)
+        shm = shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1))
+        try:
+            np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[...] = image
+            return self._submit(_ocr_shared_image, shm.name, image.shape, image.dtype.str, timeout=timeout)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def _submit(self, func, *args, timeout=None):
+        timeout = OCR_POOL_TIMEOUT if timeout is None else min(timeout, OCR_POOL_TIMEOUT)
+        executor = self.executor
+        try:
+            future = executor.submit(func, *args)
+            return future.result(timeout=timeout)
+        except FuturesTimeoutError:
+            # 尚未开始的任务不再执行
+            future.cancel()
+            raise
+        except BrokenProcessPool:
+            # 工作进程异常退出时重建进程池，本次请求返回错误；
+            # 同一个进程池的多个请求同时失败时只重建一次（其他线程已重建则不再替换）
+            self._rebuild(executor)
+            raise
+
+    def _rebuild(self, failed):
+        """替换已损坏的进程池failed，返回是否由本次调用重建"""
+        with self._lock:
+            if self.executor is not failed:
+                return False
+            failed.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._create_executor()
+            return True
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,95 +1,213 @@
-import cv2
-from PIL import Image
-import io
 import re
-from paddleocr import PaddleOCR
-from models import ImageType, IMAGE_TYPE_NAMES
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from models import ImageType, IMAGE_TYPE_NAMES, DOCUMENT_RULES
+from keyword_matcher import match_documents
+from ocr_pool import OCRWorkerPool
+from deadline import DeadlineExceeded
+from profiler import propagate
+from metrics import STAGE_SECONDS, OCR_IN_FLIGHT, observe_stage, TimedCall
+from config import OCR_MODEL_OPTIONS, OCR_DEADLINE_THREADS
 
-# 初始化PaddleOCR - 禁用日志输出
-ocr = PaddleOCR(use_angle_cls=True, lang="ch", use_gpu=False, show_log=False)
+# PaddleOCR模型在首次识别时加载（导入paddleocr及加载模型耗时数秒，只解码二维码时不需要）
+_ocr = None
+_ocr_lock = threading.Lock()
+
+def get_ocr():
+    """获取当前进程的PaddleOCR实例，首次调用时加载"""
+    global _ocr
+    if _ocr is None:
+        with _ocr_lock:
+            if _ocr is None:
+                from paddleocr import PaddleOCR
+                # 初始化PaddleOCR - 禁用日志输出
+                model = PaddleOCR(**OCR_MODEL_OPTIONS)
+                _instrument(model)
+                _ocr = model
+    return _ocr
+
+# PaddleOCR内部的检测、方向分类、识别子模型 -> 指标阶段名
+OCR_SUBMODELS = {"text_detector": "ocr_det", "text_classifier": "ocr_cls", "text_recognizer": "ocr_rec"}
+
+def _instrument(model):
+    """包装检测/方向分类/识别子模型，分别记录耗时（只对当前进程内的模型生效）"""
+    for attr, stage in OCR_SUBMODELS.items():
+        submodel = getattr(model, attr, None)
+        if submodel is not None:
+            setattr(model, attr, TimedCall(submodel, stage))
+
+# 有期限的请求在此线程池中执行OCR，期限到达时请求线程直接返回
+ocr_executor = ThreadPoolExecutor(max_workers=OCR_DEADLINE_THREADS, thread_name_prefix='ocr')
+
+# 身份证号码格式
+ID_NUMBER_PATTERN = re.compile(r'[1-9]\d{5}(19|20)\d{2}(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])\d{3}[0-9xX]')
+# 银行卡号格式 (更严格的格式，16-19位数字，通常4位一组)
+BANKCARD_PATTERN = re.compile(r'(\d{4}[ -]?){3,4}\d{1,4}')
+
+class OCRResult:
+    """单次OCR识别结果，供各类证件检测及文字提取共享"""
+    def __init__(self, boxes=None, texts=None, confidences=None):
+        self.boxes = boxes or []              # 文本框位置
+        self.texts = texts or []              # 识别的文本
+        self.confidences = confidences or []  # 置信度
+        # 文本框中心点的y坐标
+        self.y_centers = [sum(point[1] for point in box) / len(box) for box in self.boxes]
+        self.lower_texts = [text.lower() for text in self.texts]
+        self._document_matches = None
+
+    @property
+    def document_matches(self):
+        """证件规则表关键词的命中情况，首次访问时对文本扫描一次"""
+        if self._document_matches is None:
+            self._document_matches = match_documents(self.lower_texts, self.y_centers)
+        return self._document_matches
+
+    @classmethod
+    def from_paddle(cls, result):
+        """从PaddleOCR的原始输出构建结果对象"""
+        boxes, texts, confidences = [], [], []
+        # 未识别到文字时PaddleOCR返回[None]
+        for line in result or []:
+            for item in line or []:
+                boxes.append(item[0])
+                texts.append(item[1][0])
+                confidences.append(item[1][1])
+        return cls(boxes, texts, confidences)
+
+    def joined_text(self, lower=True):
+        """按识别顺序合并文本"""
+        return " ".join(self.lower_texts if lower else self.texts)
+
+    def ordered_text(self, lower=True):
+        """按y坐标从上到下排序后合并文本"""
+        texts = self.lower_texts if lower else self.texts
+        order = sorted(range(len(texts)), key=lambda i: self.y_centers[i])
+        return " ".join(texts[i] for i in order)
+
+    def confident_text(self, min_confidence=0.5):
+        """只保留置信度高的结果，按行合并"""
+        return "\n".join(text for text, confidence in zip(self.texts, self.confidences)
+                         if confidence > min_confidence)
 
 class OCRService:
     @staticmethod
-    def detect_idcard(image):
+    def run_ocr(image, deadline=None):
+        """
+        对图像执行一次OCR识别，返回可共享的OCRResult
+
+        image为BGR格式的ndarray（或图像路径），直接交给PaddleOCR，不再经过JPEG编码解码
+        配置了OCR工作进程时，分发到进程池中识别
+        deadline: 请求期限，到达时抛出DeadlineExceeded（已开始的识别在后台继续完成）
+        """
+        if deadline is not None:
+            deadline.check("ocr")
+        with OCR_IN_FLIGHT.track_inprogress(), STAGE_SECONDS.time(stage="ocr"):
+            return OCRService._run_ocr(image, deadline)
+
+    @staticmethod
+    def _run_ocr(image, deadline):
+        """run_ocr的识别部分（耗时及并发数由run_ocr记录）"""
+        try:
+            if OCRWorkerPool.enabled():
+                timeout = deadline.remaining() if deadline is not None else None
+                return OCRResult.from_paddle(OCRWorkerPool.get().ocr(image, timeout=timeout))
+            ocr = get_ocr()
+            if deadline is None:
+                return OCRResult.from_paddle(ocr.ocr(image, cls=True))
+            future = ocr_executor.submit(propagate(ocr.ocr), image, cls=True)
+            try:
+                return OCRResult.from_paddle(future.result(timeout=deadline.remaining()))
+            except FuturesTimeoutError:
+                future.cancel()
+                raise
+        except FuturesTimeoutError:
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded("ocr")
+            raise
+
+    @staticmethod
+    def warm_up():
+        """用空白图像执行一次识别，在接收请求前完成模型加载和首次推理的初始化"""
+        OCRService.run_ocr(np.full((64, 256, 3), 255, dtype=np.uint8))
+
+    @staticmethod
+    def evaluate_rule(doc_type, match):
+        """
+        按规则表通用判定证件正反面
+
+        返回: "front" / "back" / "unknown"，不是该证件时返回None
+        """
+        rule = DOCUMENT_RULES[doc_type]
+        counts = match["counts"]
+        # 命中排除关键词，或缺少必需关键词
+        if counts["exclude"]:
+            return None
+        if rule.get("required") and not counts["required"]:
+            return None
+
+        front_count = counts["front"]
+        back_count = counts["back"]
+        exclusive = rule.get("exclusive", False)
+        if front_count >= rule["min_front"] and match["front_ordered"] and (not exclusive or front_count > back_count):
+            return "front"
+        if back_count >= rule["min_back"] and (not exclusive or back_count > front_count):
+            return "back"
+        if counts["fallback"]:
+            # 根据关键词数量判断
+            if rule.get("fallback_side") == "count":
+                if front_count > back_count:
+                    return "front"
+                if back_count > front_count:
+                    return "back"
+            return "unknown"
+        return None
+
+    @staticmethod
+    @observe_stage("detect_idcard")
+    def detect_idcard(image, ocr_result=None):
         """检测是否为身份证"""
         # 使用OCR识别文本
         try:
-            # 转换为PIL图像
-            pil_img = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-            img_bytes = io.BytesIO()
-            pil_img.save(img_bytes, format='JPEG')
-            img_bytes.seek(0)
-            
-            # 使用PaddleOCR识别
-            result = ocr.ocr(img_bytes.getvalue(), cls=True)
-            
-            # 提取文本和位置信息
-            texts = []
-            text_boxes = []
-            for line in result:
-                for item in line:
-                    text = item[1][0]  # 获取识别的文本
-                    box = item[0]      # 获取文本框位置
-                    texts.append(text.lower())
-                    text_boxes.append((text.lower(), box))
-            
-            # 合并文本
-            text = " ".join(texts)
+            # 未传入共享的OCR结果时单独识别
+            if ocr_result is None:
+                ocr_result = OCRService.run_ocr(image)
+
+            # 规则表关键词的命中情况
+            rule = DOCUMENT_RULES[ImageType.IDCARD]
+            match = ocr_result.document_matches[ImageType.IDCARD]
+            found = match["found"]
             
             # 排除驾驶证
-            driving_keywords = ["驾驶证", "驾驶员", "准驾车型", "档案编号", "机动车驾驶证"]
-            if any(keyword in text for keyword in driving_keywords):
+            if match["counts"]["exclude"]:
                 return False
             
-            # 身份证正面关键词（按照身份证上的顺序排列）
-            front_keywords = ["姓名", "性别", "民族", "出生", "住址", "公民身份号码"]
-            
-            # 身份证反面关键词
-            back_keywords = ["签发机关", "签发日期", "有效期限", "有效期"]
-            
             # 检查是否为身份证正面
-            front_match_count = sum(1 for keyword in front_keywords if keyword in text)
-            is_front = front_match_count >= 3
+            front_match_count = match["counts"]["front"]
+            is_front = front_match_count >= rule["min_front"]
             
             # 检查是否为身份证反面
-            back_match_count = sum(1 for keyword in back_keywords if keyword in text)
-            is_back = back_match_count >= 2
+            back_match_count = match["counts"]["back"]
+            is_back = back_match_count >= rule["min_back"]
             
-            # 检查关键词是否按顺序出现（仅对正面进行检查）
+            # 正面关键词按规则表顺序统计
             if is_front:
-                found_keywords = []
-                for keyword in front_keywords:
-                    if keyword in text:
-                        found_keywords.append(keyword)
+                # 如果找到身份证号码格式，则判定为身份证正面
+                if ID_NUMBER_PATTERN.search(ocr_result.joined_text().replace(" ", "")):
+                    return {"is_idcard": True, "side": "front"}
                 
-                # 检查关键词顺序
-                if len(found_keywords) >= 3:  # 至少找到3个关键词
-                    # 获取关键词在原始front_keywords中的索引
-                    indices = [front_keywords.index(kw) for kw in found_keywords]
-                    # 检查索引是否是递增的（保持顺序）
-                    is_ordered = all(indices[i] < indices[i+1] for i in range(len(indices)-1))
-                    
-                    if is_ordered:
-                        # 身份证号码格式
-                        id_pattern = r'[1-9]\d{5}(19|20)\d{2}(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])\d{3}[0-9xX]'
-                        id_match = re.search(id_pattern, text.replace(" ", ""))
-                        
-                        # 如果关键词顺序正确，且找到身份证号码格式，则判定为身份证正面
-                        if id_match:
-                            return {"is_idcard": True, "side": "front"}
-                        
-                        # 如果关键词顺序正确，且包含"居民身份证"字样，也判定为身份证正面
-                        if "居民身份证" in text:
-                            return {"is_idcard": True, "side": "front"}
-                        
-                        # 如果找到4个以上关键词且顺序正确，也判定为身份证正面
-                        if len(found_keywords) >= 4:
-                            return {"is_idcard": True, "side": "front"}
+                # 如果包含"居民身份证"字样，也判定为身份证正面
+                if "居民身份证" in found:
+                    return {"is_idcard": True, "side": "front"}
+                
+                # 如果找到4个以上关键词，也判定为身份证正面
+                if front_match_count >= 4:
+                    return {"is_idcard": True, "side": "front"}
             
             # 如果是身份证反面
             if is_back:
                 # 检查是否包含"中华人民共和国"字样，增加判断准确性
-                if "中华人民共和国" in text:
+                if "中华人民共和国" in found:
                     return {"is_idcard": True, "side": "back"}
                 
                 # 如果包含至少3个反面关键词，也判定为身份证反面
@@ -97,7 +215,7 @@ class OCRService:
                     return {"is_idcard": True, "side": "back"}
             
             # 如果上述条件都不满足，但明确包含"居民身份证"字样，也可能是身份证
-            if "居民身份证" in text and "公民身份号码" in text:
+            if "居民身份证" in found and "公民身份号码" in found:
                 return {"is_idcard": True, "side": "front"}
                 
             return False
@@ -108,84 +226,18 @@ class OCRService:
             return False
 
     @staticmethod
-    def detect_driverCard(image):
+    @observe_stage("detect_drivercard")
+    def detect_driverCard(image, ocr_result=None):
         """检测是否为驾驶证"""
         try:
-            # 转换为PIL图像
-            pil_img = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-            img_bytes = io.BytesIO()
-            pil_img.save(img_bytes, format='JPEG')
-            img_bytes.seek(0)
-            
-            # 使用PaddleOCR识别
-            result = ocr.ocr(img_bytes.getvalue(), cls=True)
-            
-            # 提取文本和位置信息
-            texts = []
-            text_positions = []
-            for line in result:
-                for item in line:
-                    text = item[1][0]  # 获取识别的文本
-                    box = item[0]      # 获取文本框位置
-                    # 计算文本框中心点的y坐标
-                    y_center = sum(point[1] for point in box) / 4
-                    texts.append(text.lower())
-                    text_positions.append((text.lower(), y_center))
-            
-            # 按照y坐标排序文本
-            text_positions.sort(key=lambda x: x[1])
-            ordered_texts = [item[0] for item in text_positions]
-            
-            # 合并文本
-            text = " ".join(texts)
-            ordered_text = " ".join(ordered_texts)
-            
-            # 排除身份证
-            id_keywords = ["居民身份证", "公民身份号码"]
-            if any(keyword in text for keyword in id_keywords) and "驾驶证" not in text and "驾驶员" not in text:
-                return False
-            
-            # 驾驶证必须包含的关键词
-            essential_keywords = ["驾驶证", "驾驶员", "机动车驾驶证"]
-            if not any(keyword in text for keyword in essential_keywords):
-                return False
-            
-            # 驾驶证正面关键词（按照驾驶证上的顺序排列）
-            front_keywords = ["姓名", "性别", "国籍", "住址", "出生日期", "初次领证日期", "准驾车型"]
-            
-            # 驾驶证副页(反面)关键词
-            back_keywords = ["档案编号", "记分", "发证机关", "有效期限"]
-            
-            # 检查正面关键词匹配数量和顺序
-            front_match_count = sum(1 for keyword in front_keywords if keyword in text)
-            
-            # 检查反面关键词匹配数量
-            back_match_count = sum(1 for keyword in back_keywords if keyword in text)
-            
-            # 检查关键词在有序文本中的顺序
-            front_ordered = True
-            last_index = -1
-            for keyword in front_keywords:
-                if keyword in ordered_text:
-                    current_index = ordered_text.find(keyword)
-                    if current_index < last_index:
-                        front_ordered = False
-                        break
-                    last_index = current_index
-            
-            # 判断是正面还是反面
-            if front_match_count >= 3 and front_ordered:
-                return {"is_drivercard": True, "side": "front"}
-            elif back_match_count >= 2:
-                return {"is_drivercard": True, "side": "back"}
-            elif "驾驶证" in text or "机动车驾驶证" in text:
-                # 根据关键词数量判断
-                if front_match_count > back_match_count:
-                    return {"is_drivercard": True, "side": "front"}
-                elif back_match_count > front_match_count:
-                    return {"is_drivercard": True, "side": "back"}
-                else:
-                    return {"is_drivercard": True, "side": "unknown"}
+            # 未传入共享的OCR结果时单独识别
+            if ocr_result is None:
+                ocr_result = OCRService.run_ocr(image)
+
+            # 按规则表判定正反面
+            side = OCRService.evaluate_rule(ImageType.DRIVERCARD, ocr_result.document_matches[ImageType.DRIVERCARD])
+            if side:
+                return {"is_drivercard": True, "side": side}
                 
             return False
             
@@ -231,36 +283,19 @@ class OCRService:
             return False
     
     @staticmethod
-    def detect_bankcard(image):
+    @observe_stage("detect_bankcard")
+    def detect_bankcard(image, ocr_result=None):
         """检测是否为银行卡"""
         try:
-            # 转换为PIL图像
-            pil_img = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-            img_bytes = io.BytesIO()
-            pil_img.save(img_bytes, format='JPEG')
-            img_bytes.seek(0)
-            
-            # 使用PaddleOCR识别
-            result = ocr.ocr(img_bytes.getvalue(), cls=True)
-            
-            # 提取文本
-            texts = []
-            for line in result:
-                for item in line:
-                    text = item[1][0]  # 获取识别的文本
-                    texts.append(text)
-            
+            # 未传入共享的OCR结果时单独识别
+            if ocr_result is None:
+                ocr_result = OCRService.run_ocr(image)
+
             # 合并文本
-            text = " ".join(texts)
-            
-            # 银行卡号格式检测 (更严格的格式，16-19位数字，通常4位一组)
-            bankcard_pattern = r'(\d{4}[ -]?){3,4}\d{1,4}'
-            
-            # 银行名称关键词
-            bank_keywords = ["银行", "信用卡", "储蓄卡", "借记卡", "信用卡中心", "bank", "card"]
+            text = ocr_result.joined_text(lower=False)
             
             # 检查银行卡号格式
-            card_matches = re.findall(bankcard_pattern, text)
+            card_matches = BANKCARD_PATTERN.findall(text)
             
             # 如果没有找到符合格式的卡号，直接返回False
             if not card_matches:
@@ -268,7 +303,7 @@ class OCRService:
             
             # 提取所有可能的卡号并验证
             valid_card = False
-            for match in re.finditer(bankcard_pattern, text):
+            for match in BANKCARD_PATTERN.finditer(text):
                 # 提取数字
                 card_num = ''.join(re.findall(r'\d', match.group(0)))
                 
@@ -280,7 +315,7 @@ class OCRService:
                         break
             
             # 检查银行关键词
-            keyword_match = any(keyword in text.lower() for keyword in bank_keywords)
+            keyword_match = ocr_result.document_matches[ImageType.BANKCARD]["counts"]["markers"] > 0
             
             # 图像比例检查 (银行卡通常是长方形，比例约为1.58:1)
             h, w = image.shape[:2]
@@ -298,74 +333,39 @@ class OCRService:
     
 
     @staticmethod
-    def perform_ocr(image_path):
-        """执行OCR识别 获取数据"""
+    def perform_ocr(image, ocr_result=None, deadline=None):
+        """
+        执行OCR识别 获取数据，image可为已解码的图像或图像路径
+
+        deadline: 请求期限，需要重新识别时同样受期限限制，到达时抛出DeadlineExceeded
+        """
         try:
-            # 使用PaddleOCR进行识别
-            result = ocr.ocr(image_path, cls=True)
-            
-            # 提取识别文本
-            texts = []
-            for line in result:
-                for item in line:
-                    text = item[1][0]  # 获取识别的文本
-                    confidence = item[1][1]  # 获取置信度
-                    if confidence > 0.5:  # 只保留置信度高的结果
-                        texts.append(text)
-            
-            # 合并文本
-            return "\n".join(texts)
+            # 优先复用已有的OCR结果，否则使用PaddleOCR进行识别
+            if ocr_result is None:
+                ocr_result = OCRService.run_ocr(image, deadline)
+
+            # 只保留置信度高的结果并合并文本
+            return ocr_result.confident_text(0.5)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             from app import app
             app.logger.error(f"OCR识别出错: {str(e)}")
             return ""
 
     @staticmethod
-    def detect_vehicleCard(image):
+    @observe_stage("detect_vehiclecard")
+    def detect_vehicleCard(image, ocr_result=None):
         """检测是否为行驶证"""
         try:
-            # 转换为PIL图像
-            pil_img = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-            img_bytes = io.BytesIO()
-            pil_img.save(img_bytes, format='JPEG')
-            img_bytes.seek(0)
-            
-            # 使用PaddleOCR识别
-            result = ocr.ocr(img_bytes.getvalue(), cls=True)
-            
-            # 提取文本
-            texts = []
-            for line in result:
-                for item in line:
-                    text = item[1][0]  # 获取识别的文本
-                    texts.append(text.lower())
-            
-            # 合并文本
-            text = " ".join(texts)
-            
-            # 行驶证关键词
-            vehicle_keywords = ["中华人民共和国机动车行驶证","行驶证", "机动车登记证书", "车辆识别代号", "核定载人","发动机号码", "档案编号","注册日期","核定载质量","备注"]
-            
-            # 行驶证正页特有关键词
-            front_keywords = ["品牌型号", "车辆类型", "行驶证","所有人", "住址", "使用性质", "发证日期"]
-            
-            # 行驶证副页特有关键词
-            back_keywords = ["检验记录",  "核定载人", "核定载质量","档案编号", "总质量","备注","整备质量","备注"]
-            
-            # 检查是否包含行驶证关键词
-            if any(keyword in text for keyword in vehicle_keywords):
-                # 判断正反面
-                front_count = sum(1 for keyword in front_keywords if keyword in text)
-                back_count = sum(1 for keyword in back_keywords if keyword in text)
-                
-                # 增加更严格的判断条件
-                if front_count >= 3 and front_count > back_count:
-                    return {"is_vehiclecard": True, "side": "front"}
-                elif back_count >= 2 and back_count > front_count:
-                    return {"is_vehiclecard": True, "side": "back"}
-                elif "行驶证" in text:
-                    # 如果明确包含"行驶证"字样，但无法确定正反面
-                    return {"is_vehiclecard": True, "side": "unknown"}
+            # 未传入共享的OCR结果时单独识别
+            if ocr_result is None:
+                ocr_result = OCRService.run_ocr(image)
+
+            # 按规则表判定正反面
+            side = OCRService.evaluate_rule(ImageType.VEHICLECARD, ocr_result.document_matches[ImageType.VEHICLECARD])
+            if side:
+                return {"is_vehiclecard": True, "side": side}
             
             return False
             
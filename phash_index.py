@@ -0,0 +1,146 @@
+import os
+import json
+import threading
+from image_hash import dhash, phash, hamming_distance
+from config import CACHE_DIR, NEAR_DUPLICATE_ALGORITHM
+"""
+感知哈希近重复索引,BK树按汉明距离查找相似图片对应的缓存键
+"""
+
+# 索引文件放在缓存目录的子目录中，不受缓存文件清理影响
+INDEX_DIR = os.path.join(CACHE_DIR, 'index')
+INDEX_FILE = os.path.join(INDEX_DIR, f'{NEAR_DUPLICATE_ALGORITHM}_index.jsonl')
+
+# 可选的感知哈希算法
+HASH_FUNCTIONS = {"dhash": dhash, "phash": phash}
+
+class BKTree:
+    """汉明距离BK树，节点为 [哈希, 缓存键, {距离: 子节点}]"""
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, key):
+        if self.root is None:
+            self.root = [value, key, {}]
+            self.size += 1
+            return
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                # 相同哈希只保留最新的缓存键
+                node[1] = key
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, key, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, value, threshold, exclude=()):
+        """返回距离不超过threshold的最近项 (缓存键, 距离)，没有时返回None"""
+        best = None
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= threshold and node[1] not in exclude and (best is None or distance < best[1]):
+                best = (node[1], distance)
+            # 三角不等式剪枝：只需访问距离在 [d-t, d+t] 内的子树
+            for child_distance, child in node[2].items():
+                if distance - threshold <= child_distance <= distance + threshold:
+                    stack.append(child)
+        return best
+
+class PerceptualIndex:
+    """线程安全的近重复索引，追加写入索引文件，启动时加载，缓存清理后按结果是否仍存在压缩索引文件"""
+    def __init__(self, index_file=INDEX_FILE, algorithm=NEAR_DUPLICATE_ALGORITHM):
+        self.index_file = index_file
+        self.hash_func = HASH_FUNCTIONS[algorithm]
+        self.tree = BKTree()
+        # 对应结果已不在缓存中的键，查找时跳过
+        self.dead_keys = set()
+        self.lock = threading.Lock()
+        self._load()
+
+    def _read(self):
+        """读取索引文件，返回 {哈希: 缓存键}（相同哈希保留最后写入的键）"""
+        entries = {}
+        if not os.path.exists(self.index_file):
+            return entries
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    entries[int(entry["hash"], 16)] = entry["key"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return entries
+
+    def _load(self):
+        for value, key in self._read().items():
+            self.tree.add(value, key)
+
+    def image_hash(self, image):
+        """计算图像的感知哈希"""
+        return self.hash_func(image)
+
+    def add(self, value, key):
+        """加入索引并追加写入索引文件"""
+        with self.lock:
+            self.tree.add(value, key)
+            self.dead_keys.discard(key)
+            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+            with open(self.index_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"hash": f"{value:x}", "key": key}) + "\n")
+
+    def search(self, value, threshold):
+        """查找最相似的缓存键，返回 (缓存键, 距离) 或 None"""
+        with self.lock:
+            return self.tree.search(value, threshold, self.dead_keys)
+
+    def mark_dead(self, key):
+        """标记缓存已失效的键"""
+        with self.lock:
+            self.dead_keys.add(key)
+
+    def prune(self, is_live):
+        """
+        删除缓存结果已不存在的索引项，重写索引文件并重建BK树，返回删除数量
+
+        参数:
+            is_live: is_live(缓存键) -> 结果是否仍在缓存中（在锁外逐个检查，不阻塞查找）
+        索引文件由各工作进程共同追加，重写时重新读取文件，保留其他进程追加的索引项
+        """
+        dead = {key for key in set(self._read().values()) if not is_live(key)}
+        if not dead:
+            return 0
+        with self.lock:
+            entries = self._read()
+            live = {value: key for value, key in entries.items() if key not in dead}
+            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+            temp_path = f"{self.index_file}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for value, key in live.items():
+                    f.write(json.dumps({"hash": f"{value:x}", "key": key}) + "\n")
+            os.replace(temp_path, self.index_file)
+            self.tree = BKTree()
+            for value, key in live.items():
+                self.tree.add(value, key)
+            self.dead_keys -= dead
+        return len(entries) - len(live)
+
+# 全局索引，首次使用时加载
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+def get_perceptual_index():
+    """获取全局近重复索引"""
+    global _INDEX
+    if _INDEX is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = PerceptualIndex()
+    return _INDEX
@@ -0,0 +1,146 @@
+import os
+import re
+import time
+import uuid
+import random
+import pstats
+import cProfile
+import functools
+import threading
+from contextlib import contextmanager
+from config import PROFILE_ENABLED, PROFILE_SAMPLE_RATE, PROFILE_DIR, PROFILE_MAX_FILES, PROFILE_TOP_FUNCTIONS
+"""
+按请求的性能剖析:被标记或抽样命中的请求在cProfile下执行,结果保存到日志目录并以ID返回
+"""
+
+# 剖析结果ID格式（同时用于校验查询参数，防止路径穿越）
+PROFILE_ID_PATTERN = re.compile(r'^\d{8}-\d{6}-[0-9a-f]{8}$')
+
+# 当前线程正在剖析的请求
+_local = threading.local()
+# 同一时间只剖析一个请求，其余请求照常处理（不返回profileId）
+_profile_lock = threading.Lock()
+
+class RequestProfile:
+    """
+    单个请求的剖析数据
+
+    cProfile只记录调用它的线程，OCR等在线程池中执行的部分由propagate包装后
+    在工作线程中单独剖析，保存时合并
+    """
+    def __init__(self, label):
+        self.profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.label = label
+        self.profiler = cProfile.Profile()
+        self.worker_profilers = []
+        self.lock = threading.Lock()
+        self.start = 0
+        self.elapsed = 0
+        self.path = None
+
+    def add_worker(self, profiler):
+        with self.lock:
+            self.worker_profilers.append(profiler)
+
+    def stats(self):
+        """合并请求线程及工作线程的统计"""
+        stats = pstats.Stats(self.profiler)
+        with self.lock:
+            for profiler in self.worker_profilers:
+                stats.add(profiler)
+        return stats
+
+    def save(self, directory=PROFILE_DIR):
+        """
+        保存 <ID>.prof（pstats格式，可用snakeviz、gprof2dot等生成火焰图/调用图）
+        及 <ID>.txt（按累计耗时和自身耗时排序的文本摘要），返回.prof路径
+        """
+        os.makedirs(directory, exist_ok=True)
+        stats = self.stats()
+        path = os.path.join(directory, f"{self.profile_id}.prof")
+        stats.dump_stats(path)
+        with open(os.path.join(directory, f"{self.profile_id}.txt"), 'w', encoding='utf-8') as f:
+            f.write(f"{self.label} {self.profile_id} 耗时 {self.elapsed:.3f} 秒，"
+                    f"工作线程 {len(self.worker_profilers)} 个\n")
+            stats.stream = f
+            stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+            stats.sort_stats('tottime').print_stats(PROFILE_TOP_FUNCTIONS)
+        self.path = path
+        prune_profiles(directory)
+        return path
+
+def prune_profiles(directory=PROFILE_DIR, max_files=PROFILE_MAX_FILES):
+    """只保留最新的max_files个剖析结果"""
+    ids = sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.prof'))
+    for profile_id in ids[:max(0, len(ids) - max_files)]:
+        for ext in ('.prof', '.txt'):
+            try:
+                os.remove(os.path.join(directory, profile_id + ext))
+            except OSError:
+                pass
+
+def should_profile(requested=False):
+    """是否剖析本次请求：需在配置中开启，带标记的请求总是剖析，其余按PROFILE_SAMPLE_RATE抽样"""
+    if not PROFILE_ENABLED:
+        return False
+    return requested or random.random() < PROFILE_SAMPLE_RATE
+
+@contextmanager
+def profile_request(label, requested=False):
+    """
+    在cProfile下执行with块，结束时保存结果
+
+    返回RequestProfile（未剖析时为None），保存成功后其path不为None
+    """
+    if not should_profile(requested) or not _profile_lock.acquire(blocking=False):
+        yield None
+        return
+    profile = RequestProfile(label)
+    _local.profile = profile
+    profile.start = time.perf_counter()
+    profile.profiler.enable()
+    try:
+        yield profile
+    finally:
+        profile.profiler.disable()
+        profile.elapsed = time.perf_counter() - profile.start
+        _local.profile = None
+        try:
+            profile.save()
+        except Exception:
+            # 保存失败不影响请求本身
+            pass
+        finally:
+            _profile_lock.release()
+
+def current_profile():
+    """当前线程正在剖析的请求，没有时返回None"""
+    return getattr(_local, 'profile', None)
+
+def propagate(func):
+    """
+    提交到线程池前包装func：当前请求正在剖析时，func在工作线程中同样被剖析并合并到该请求
+
+    请求超时返回后才完成的部分不会计入已保存的结果
+    """
+    profile = current_profile()
+    if profile is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            profile.add_worker(profiler)
+    return wrapper
+
+def profile_summary_path(profile_id, directory=PROFILE_DIR):
+    """剖析结果文本摘要的路径，ID无效或不存在时返回None"""
+    if not PROFILE_ID_PATTERN.match(profile_id or ''):
+        return None
+    path = os.path.join(directory, f"{profile_id}.txt")
+    return path if os.path.exists(path) else None
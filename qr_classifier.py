@@ -0,0 +1,196 @@
+import re
+from models import QRCodeType, QR_TYPE_NAMES, QR_TYPE_PREFIXES
+"""
+二维码类型分类器,前缀字典树和组合正则在导入时构建一次,单次扫描得到类型和收款码判断
+"""
+
+# 特殊情况关键词（小写），同一关键词可属于多个分组
+KEYWORD_GROUPS = {
+    "wx_pay": ["微信支付", "wxpay"],
+    "alipay": ["支付宝", "alipay"],
+    "union_pay": ["银联", "云闪付", "unionpay"],
+    "bank": ["icbc", "ccb", "abc", "boc", "cmb", "bankcard", "网银", "手机银行", "转账"],
+    "weixin": ["微信", "weixin"],
+    "pay_word": ["支付", "pay"],
+    "douyin": ["抖音", "douyin", "tiktok"],
+    "taobao": ["淘宝", "taobao"],
+    "jd": ["京东", "jd.com"],
+    "meituan": ["美团", "meituan"],
+    "didi": ["滴滴", "didi"],
+    # 收款码判断（支付宝链接均包含alipay，归并为关键词）
+    "pay_alipay": ["支付宝", "alipay"],
+    "pay_union": ["unionpay", "upapi", "uppay", "银联", "云闪付"],
+    "pay_amount": ["amount=", "money=", "total_fee="],
+    "pay_platform": ["pay", "付款", "shoukuan", "收钱", "收款", "platform", "qrcode"],
+    "http": ["http"],
+}
+
+# 只在开头匹配的分组，并入前缀字典树
+ANCHORED_GROUPS = {
+    "url": ["http://", "https://"],
+    "pay_wechat": ["wxp://", "http://payapp.weixin.qq.com/", "https://payapp.weixin.qq.com/", "weixin://"],
+}
+
+# 特殊情况的类型判断顺序
+KEYWORD_TYPES = [
+    ("wx_pay", QRCodeType.WX_PAY),
+    ("alipay", QRCodeType.ALIPAY),
+    ("union_pay", QRCodeType.UNION_PAY),
+    ("bank", QRCodeType.BANK_PAY),
+    ("douyin", QRCodeType.DOUYIN),
+    ("taobao", QRCodeType.TAOBAO),
+    ("jd", QRCodeType.JD),
+    ("meituan", QRCodeType.MEITUAN),
+    ("didi", QRCodeType.DIDI),
+    ("url", QRCodeType.URL),
+]
+
+# 金额参数（区分大小写，关键词命中后再确认）
+AMOUNT_PATTERN = re.compile(r'(amount|money|total_fee)=[\d.]+')
+# 平台收款码的最大长度
+PLATFORM_PAYMENT_MAX_LENGTH = 150
+
+def _trie_pattern(words):
+    """把关键词按公共前缀合并成一个正则，正则引擎每个位置只需比较一次首字符"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # 贪婪匹配，同一位置优先取最长的关键词
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+# 关键词 -> 所属分组
+KEYWORD_LITERALS = {}
+for _group, _words in KEYWORD_GROUPS.items():
+    for _word in _words:
+        KEYWORD_LITERALS.setdefault(_word, set()).add(_group)
+
+# 同一位置最长命中的关键词 -> 该位置所有命中的分组（包含作为其前缀的较短关键词）
+KEYWORD_CLOSURE = {
+    word: frozenset().union(*(groups for other, groups in KEYWORD_LITERALS.items() if word.startswith(other)))
+    for word in KEYWORD_LITERALS
+}
+
+# 零宽前瞻，可找出相互重叠的关键词；对小写文本匹配，无需re.I
+KEYWORD_REGEX = re.compile(f"(?=({_trie_pattern(KEYWORD_LITERALS)}))")
+
+# re.I会匹配到ASCII字母、而lower()不会转换的字符，先替换保持与旧版一致
+CASE_FOLD_TABLE = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s"})
+
+class PrefixTrie:
+    """大小写不敏感的前缀字典树，命中多个前缀时按QR_TYPE_PREFIXES中的顺序取最先的类型"""
+    def __init__(self, prefixes, anchored_groups=None):
+        self.root = {}
+        self.max_length = 0
+        for priority, (qr_type, type_prefixes) in enumerate(prefixes.items()):
+            for prefix in type_prefixes:
+                node = self._insert(prefix)
+                # 空字符串键保存该前缀对应的 (优先级, 类型)
+                if "" not in node or node[""][0] > priority:
+                    node[""] = (priority, qr_type)
+        for group, group_prefixes in (anchored_groups or {}).items():
+            for prefix in group_prefixes:
+                # None键保存以该前缀开头时命中的分组
+                self._insert(prefix).setdefault(None, set()).add(group)
+
+    def _insert(self, prefix):
+        prefix = prefix.lower()
+        self.max_length = max(self.max_length, len(prefix))
+        node = self.root
+        for ch in prefix:
+            node = node.setdefault(ch, {})
+        return node
+
+    def lookup(self, text):
+        """返回 (命中的类型或None, 命中的开头分组集合)"""
+        best = None
+        groups = set()
+        node = self.root
+        for ch in text[:self.max_length].lower():
+            node = node.get(ch)
+            if node is None:
+                break
+            if "" in node and (best is None or node[""][0] < best[0]):
+                best = node[""]
+            if None in node:
+                groups |= node[None]
+        return (best[1] if best else None), groups
+
+PREFIX_TRIE = PrefixTrie(QR_TYPE_PREFIXES, ANCHORED_GROUPS)
+
+class QRClassifier:
+    @staticmethod
+    def scan_keywords(qr_data):
+        """单次扫描，返回命中的关键词分组集合"""
+        found = set()
+        text = qr_data.lower() if qr_data.isascii() else qr_data.translate(CASE_FOLD_TABLE).lower()
+        for match in KEYWORD_REGEX.finditer(text):
+            found |= KEYWORD_CLOSURE[match.group(1)]
+        # 金额参数区分大小写且须跟数字
+        if "pay_amount" in found and not AMOUNT_PATTERN.search(qr_data):
+            found.discard("pay_amount")
+        return found
+
+    @staticmethod
+    def payment_type(qr_data, found):
+        """根据扫描结果判断是否为收款码"""
+        if "pay_wechat" in found:
+            return True, "微信收款码"
+        if "pay_alipay" in found:
+            return True, "支付宝收款码"
+        if "pay_union" in found:
+            return True, "云闪付收款码"
+        if "bank" in found:
+            return True, "银行收款码"
+        # 金额参数检测 - 优先于平台检测
+        if "pay_amount" in found:
+            return True, "含金额参数的收款码"
+        # 支付平台 - 更严格的条件
+        if "pay_platform" in found and len(qr_data) < PLATFORM_PAYMENT_MAX_LENGTH and "http" not in found:
+            return True, "第三方支付平台"
+        return False, ""
+
+    @staticmethod
+    def qrcode_type(found):
+        """根据扫描结果判断特殊情况的类型"""
+        for name, qr_type in KEYWORD_TYPES:
+            if name in found:
+                return qr_type
+            # 微信（不含支付字样）排在银行支付之后
+            if name == "bank" and "weixin" in found and "pay_word" not in found:
+                return QRCodeType.WEIXIN
+        return QRCodeType.TEXT
+
+    @staticmethod
+    def classify(qr_data):
+        """
+        识别二维码类型及是否为收款码
+
+        返回字典:
+            code / name: 二维码类型及名称
+            is_payment / payment_type: 是否为收款码及收款码类型
+        """
+        qr_data = qr_data or ""
+        prefix_type, found = PREFIX_TRIE.lookup(qr_data)
+        found |= QRClassifier.scan_keywords(qr_data)
+        if not qr_data:
+            qr_type = QRCodeType.UNKNOWN
+        else:
+            qr_type = prefix_type or QRClassifier.qrcode_type(found)
+        is_payment, payment_type = QRClassifier.payment_type(qr_data, found)
+        return {
+            "code": qr_type,
+            "name": QR_TYPE_NAMES[qr_type],
+            "is_payment": is_payment,
+            "payment_type": payment_type if is_payment else None
+        }
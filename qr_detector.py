@@ -0,0 +1,276 @@
+import math
+import cv2
+import numpy as np
+from pyzbar import pyzbar
+from metrics import QR_DECODES
+"""
+二维码检测引擎,按定位图案估计的模块大小选择解码分辨率,整图解码失败时只对候选区域裁剪逐级放大、二值化后解码
+"""
+
+# 整图解码及候选区域定位所用工作图的最大边长
+DETECT_IMAGE_SIDE = 1280
+# 解码时每个模块（二维码的最小方格）的目标像素数，zbar在3~4像素时已能稳定解码
+TARGET_MODULE_PIXELS = 4
+# 按模块大小缩小整图时的最小边长（定位图案误检时不至于缩得过小）
+DECODE_MIN_SIDE = 480
+# 最多解码的候选区域数
+MAX_CANDIDATES = 6
+# 候选区域外扩比例（保留静区）
+ROI_MARGIN = 0.2
+# 无法估计模块大小时，候选区域裁剪缩放到的边长
+ROI_TARGET_SIDE = 480
+# 候选区域裁剪放大后的最大边长
+ROI_MAX_SIDE = 1024
+# 定位图案（回字形）的最小边长（工作图像素），及长宽比上限
+FINDER_MIN_SIDE = 5
+FINDER_MAX_RATIO = 1.5
+# 查找定位图案时自适应二值化的邻域大小及阈值偏移（偏移过小时噪点会产生大量细碎轮廓，拖慢轮廓查找）
+FINDER_THRESHOLD_BLOCK = 51
+FINDER_THRESHOLD_C = 15
+# 定位图案间距不超过其边长的该倍数时视为同一个码
+FINDER_GROUP_DISTANCE = 12
+# 只找到一个定位图案时，候选区域按其边长的该倍数向右下方延伸
+SINGLE_FINDER_EXTENT = 4
+
+class QRDetector:
+    @staticmethod
+    def to_gray(image):
+        """BGR或灰度图像 -> 灰度图像"""
+        if image.ndim == 3:
+            return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return image
+
+    @staticmethod
+    def zbar(gray):
+        """
+        以 (像素字节, 宽, 高) 把单通道灰度图交给zbar（Y800格式）
+
+        pyzbar通过ctypes调用zbar，只接受bytes，无法零拷贝；连续的uint8灰度图tobytes()只做一次单通道内存复制。
+        直接传入BGR数组时pyzbar只取第一个通道（蓝色）的跨步视图再复制，不是真正的灰度
+        """
+        gray = np.ascontiguousarray(gray, dtype=np.uint8)
+        height, width = gray.shape[:2]
+        return pyzbar.decode((gray.tobytes(), width, height))
+
+    @staticmethod
+    def module_size(patterns):
+        """由定位图案（7x7模块）的边长中位数估计模块大小（像素），没有定位图案时返回None"""
+        if not patterns:
+            return None
+        return float(np.median([side for _, _, _, _, side in patterns])) / 7
+
+    @staticmethod
+    def downscale(gray, size):
+        """缩小到size=(宽, 高)：先逐级pyrDown减半（抗锯齿且远快于INTER_AREA），再线性插值到目标尺寸"""
+        while gray.shape[1] >= 2 * size[0] and gray.shape[0] >= 2 * size[1]:
+            gray = cv2.pyrDown(gray)
+        return cv2.resize(gray, size, interpolation=cv2.INTER_LINEAR)
+
+    @staticmethod
+    def relocate(decoded, x0, y0, scale):
+        """把裁剪、缩放后图像中的坐标换算回原图"""
+        rect = decoded.rect
+        polygon = [type(point)(int(x0 + point.x / scale), int(y0 + point.y / scale)) for point in decoded.polygon]
+        rect = type(rect)(int(x0 + rect.left / scale), int(y0 + rect.top / scale),
+                          int(rect.width / scale), int(rect.height / scale))
+        return decoded._replace(rect=rect, polygon=polygon)
+
+    @staticmethod
+    def find_finder_patterns(gray):
+        """
+        查找定位图案：轮廓中至少嵌套两层子轮廓、接近正方形的区域
+
+        按最小外接矩形（可旋转）判断边长、长宽比和实心程度，倾斜的码同样能找到
+        返回 [(x, y, w, h, 边长), ...]，(x, y, w, h)为正外接矩形，边长取最小外接矩形的短边
+        """
+        binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV,
+                                       FINDER_THRESHOLD_BLOCK, FINDER_THRESHOLD_C)
+        contours, hierarchy = cv2.findContours(binary, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        if hierarchy is None:
+            return []
+        hierarchy = hierarchy[0]
+        patterns = []
+        for index, contour in enumerate(contours):
+            child = hierarchy[index][2]
+            if child < 0 or hierarchy[child][2] < 0:
+                continue
+            _, (rect_w, rect_h), _ = cv2.minAreaRect(contour)
+            side = min(rect_w, rect_h)
+            if side < FINDER_MIN_SIDE or max(rect_w, rect_h) > FINDER_MAX_RATIO * side:
+                continue
+            # 实心程度：定位图案的外轮廓接近填满最小外接矩形（正外接矩形在码倾斜时会偏大）
+            if cv2.contourArea(contour) < 0.6 * rect_w * rect_h:
+                continue
+            patterns.append(cv2.boundingRect(contour) + (side,))
+        return patterns
+
+    @staticmethod
+    def group_finder_patterns(patterns, shape):
+        """
+        把相邻的定位图案归为同一个码，返回候选区域 [(x, y, w, h, 模块大小), ...]，包含定位图案多的排在前面
+        """
+        groups = []
+        for pattern in sorted(patterns, key=lambda p: -p[2] * p[3]):
+            x, y, w, h, _ = pattern
+            cx, cy = x + w / 2, y + h / 2
+            for group in groups:
+                gx, gy, gw, gh, _ = group[0]
+                if (abs(cx - gx - gw / 2) < FINDER_GROUP_DISTANCE * gw and
+                        abs(cy - gy - gh / 2) < FINDER_GROUP_DISTANCE * gh and 0.5 < w / gw < 2):
+                    # 嵌套的轮廓（同一定位图案的内层）不重复计数
+                    if not any(px <= cx <= px + pw and py <= cy <= py + ph for px, py, pw, ph, _ in group):
+                        group.append(pattern)
+                    break
+            else:
+                groups.append([pattern])
+
+        height, width = shape[:2]
+        regions = []
+        for group in sorted(groups, key=len, reverse=True):
+            x0 = min(p[0] for p in group)
+            y0 = min(p[1] for p in group)
+            x1 = max(p[0] + p[2] for p in group)
+            y1 = max(p[1] + p[3] for p in group)
+            if len(group) == 1:
+                # 只有一个定位图案，码的其余部分可能在任一方向
+                side = group[0][2] * SINGLE_FINDER_EXTENT
+                x0, y0, x1, y1 = x0 - side, y0 - side, x1 + side, y1 + side
+            elif len(group) == 2:
+                # 两个定位图案是码的一条边时，码沿垂直于连线的方向延伸（方向未知，两侧都扩展），码倾斜时同样适用；
+                # 是对角时码已在外接矩形内
+                (ax, ay), (bx, by) = [(p[0] + p[2] / 2, p[1] + p[3] / 2) for p in group]
+                dx, dy = bx - ax, by - ay
+                xs = [cx + k * dy for cx in (ax, bx) for k in (-1, 1)]
+                ys = [cy - k * dx for cy in (ay, by) for k in (-1, 1)]
+                x0, y0 = min(x0, int(min(xs))), min(y0, int(min(ys)))
+                x1, y1 = max(x1, int(max(xs)) + 1), max(y1, int(max(ys)) + 1)
+            elif len(group) == 3:
+                # 码倾斜时三个定位图案的外接矩形不包含第四个角：以直角处的定位图案（最长边的对角）补出第四个角
+                centers = [(p[0] + p[2] / 2, p[1] + p[3] / 2) for p in group]
+                corner = max(range(3), key=lambda i: math.dist(*(c for j, c in enumerate(centers) if j != i)))
+                (ax, ay), (bx, by) = [c for j, c in enumerate(centers) if j != corner]
+                fx, fy = ax + bx - centers[corner][0], ay + by - centers[corner][1]
+                half = max(max(p[2], p[3]) for p in group) / 2
+                x0, y0 = min(x0, int(fx - half)), min(y0, int(fy - half))
+                x1, y1 = max(x1, int(fx + half) + 1), max(y1, int(fy + half) + 1)
+            x0, y0 = max(0, x0), max(0, y0)
+            regions.append((x0, y0, min(width, x1) - x0, min(height, y1) - y0, QRDetector.module_size(group)))
+        return regions
+
+    @staticmethod
+    def ladder(crop, module=None):
+        """
+        候选区域的逐级尝试，按需生成 (步骤名, 图像, 相对裁剪的缩放比例)
+
+        缩放到每个模块约TARGET_MODULE_PIXELS像素（module为裁剪中的模块大小，未知时按ROI_TARGET_SIDE缩放）
+        -> Otsu二值化 -> 自适应二值化 -> 原始分辨率
+        """
+        side = max(crop.shape[:2])
+        scale = TARGET_MODULE_PIXELS / module if module else ROI_TARGET_SIDE / side
+        scale = min(scale, ROI_MAX_SIDE / side)
+        interpolation = cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA
+        scaled = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=interpolation)
+        yield "roi_scaled", scaled, scale
+        _, otsu = cv2.threshold(scaled, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        yield "roi_otsu", otsu, scale
+        # 邻域约为8个模块
+        block = max(3, int(8 * TARGET_MODULE_PIXELS if module else ROI_TARGET_SIDE // 16) | 1)
+        yield "roi_adaptive", cv2.adaptiveThreshold(scaled, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                                    cv2.THRESH_BINARY, block, 5), scale
+        if scale < 1:
+            yield "roi_native", crop, 1.0
+
+    @staticmethod
+    def decode_region(gray, region, search_scale):
+        """按工作图中的候选区域从原图裁剪并逐级解码，成功即停止，返回 (步骤名, 结果列表)"""
+        x, y, w, h, module = region
+        margin = ROI_MARGIN * max(w, h)
+        height, width = gray.shape[:2]
+        x0 = max(0, int((x - margin) / search_scale))
+        y0 = max(0, int((y - margin) / search_scale))
+        x1 = min(width, int((x + w + margin) / search_scale))
+        y1 = min(height, int((y + h + margin) / search_scale))
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return None, []
+        crop = gray[y0:y1, x0:x1]
+        for step, image, scale in QRDetector.ladder(crop, module / search_scale if module else None):
+            decoded = QRDetector.zbar(image)
+            if decoded:
+                return step, [QRDetector.relocate(item, x0, y0, scale) for item in decoded]
+        return None, []
+
+    @staticmethod
+    def decode_candidates(gray, patterns, shape, search_scale):
+        """
+        由缩小的图（尺寸shape）中的定位图案得到候选区域并逐个解码，已解出的码所在区域不再重复解码
+
+        返回结果列表
+        """
+        results = []
+        regions = QRDetector.group_finder_patterns(patterns, shape)[:MAX_CANDIDATES]
+        for region in regions:
+            x, y, w, h, _ = region
+            cx, cy = (x + w / 2) / search_scale, (y + h / 2) / search_scale
+            if any(r.rect.left <= cx <= r.rect.left + r.rect.width and r.rect.top <= cy <= r.rect.top + r.rect.height
+                   for r in results):
+                continue
+            step, decoded = QRDetector.decode_region(gray, region, search_scale)
+            if decoded:
+                QR_DECODES.inc(step=step)
+                known = {r.data for r in results}
+                results.extend(item for item in decoded if item.data not in known)
+        return results
+
+    @staticmethod
+    def detect(image):
+        """
+        解码图像中的二维码，返回与pyzbar.decode相同格式的结果（坐标为原图坐标）
+
+        image可为BGR或灰度图像，zbar只接收单通道灰度
+        1. 在缩小到DETECT_IMAGE_SIDE的灰度图上查找定位图案，估计模块大小
+        2. 整图解码：模块较大时按模块大小进一步缩小，常规尺寸的码在这一步解出
+        3. 由定位图案找出候选区域，从原图裁剪并放大到每个模块约TARGET_MODULE_PIXELS像素，
+           逐级二值化解码，每个区域成功即停止
+        4. 大图上没有找到可解码的候选区域时，在两倍分辨率上再找一次定位图案（更小的码）
+        5. 以上都未解出时对原始分辨率整图解码：定位图案可能漏检，候选区域也可能只是误检，
+           都不能断定图中没有码
+        """
+        gray = QRDetector.to_gray(image)
+        height, width = gray.shape[:2]
+        work_scale = min(1.0, DETECT_IMAGE_SIDE / max(height, width))
+        work = gray if work_scale == 1.0 else QRDetector.downscale(
+            gray, (int(width * work_scale), int(height * work_scale)))
+        patterns = QRDetector.find_finder_patterns(work)
+
+        # 模块大小（原图像素）已知时，只用让每个模块约TARGET_MODULE_PIXELS像素的分辨率整图解码
+        frame, frame_scale = work, work_scale
+        module = QRDetector.module_size(patterns)
+        if module:
+            scale = max(TARGET_MODULE_PIXELS / (module / work_scale), DECODE_MIN_SIDE / max(height, width))
+            if scale < work_scale * 0.75:
+                frame_scale = scale
+                frame = QRDetector.downscale(gray, (int(width * scale), int(height * scale)))
+        decoded = QRDetector.zbar(frame)
+        if decoded:
+            QR_DECODES.inc(step="frame")
+            return [QRDetector.relocate(item, 0, 0, frame_scale) for item in decoded]
+
+        results = QRDetector.decode_candidates(gray, patterns, work.shape, work_scale)
+        if results:
+            return results
+
+        if work_scale <= 0.5:
+            search_scale = work_scale * 2
+            search = QRDetector.downscale(gray, (int(width * search_scale), int(height * search_scale)))
+            results = QRDetector.decode_candidates(gray, QRDetector.find_finder_patterns(search), search.shape,
+                                                      search_scale)
+            if results:
+                return results
+
+        if frame is not gray:
+            decoded = QRDetector.zbar(gray)
+            if decoded:
+                QR_DECODES.inc(step="fallback")
+                return decoded
+        QR_DECODES.inc(step="none")
+        return []
@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import Future
+"""
+请求合并(single-flight):同一键的并发调用只执行一次,其余调用等待并共享结果
+"""
+
+# 发起调用的结果不共享时交给等待调用的标记，等待的调用各自执行
+_NOT_SHARED = object()
+
+class SingleFlight:
+    """按键合并并发调用，记录执行次数和被合并的调用次数"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.retried = 0
+
+    def do(self, key, func, *args, timeout=None, shareable=None):
+        """
+        执行func(*args)；同一key已有调用在执行时等待其结果（异常同样共享）
+
+        timeout:   等待其他调用结果的最长秒数，超时抛出concurrent.futures.TimeoutError
+        shareable: 可选，shareable(结果或异常)为否时不共享（如发起调用按自身期限得到的部分结果），
+                   等待的调用改为用各自的参数执行func
+        返回: (结果, 是否为共享的结果)
+        """
+        if key is None:
+            return func(*args), False
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            result = future.result(timeout=timeout)
+            if result is not _NOT_SHARED:
+                return result, True
+            with self._lock:
+                self.retried += 1
+            return func(*args), False
+
+        try:
+            result = func(*args)
+            future.set_result(result if shareable is None or shareable(result) else _NOT_SHARED)
+            return result, False
+        except BaseException as e:
+            if shareable is None or shareable(e):
+                future.set_exception(e)
+            else:
+                future.set_result(_NOT_SHARED)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self):
+        """返回执行次数、被合并的调用次数、结果不共享而各自执行的次数和正在执行的键数量"""
+        with self._lock:
+            return {"leaders": self.leaders, "coalesced": self.coalesced, "retried": self.retried,
+                    "inflight": len(self._calls)}
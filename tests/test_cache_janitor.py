@@ -0,0 +1,79 @@
+import os
+import time
+import logging
+import cache_janitor
+from cache_janitor import CacheJanitor
+from cache_store import SQLiteStore
+from image_fetcher import META_SUFFIX
+"""
+CacheJanitor: 过期文件及其验证信息文件、孤立的验证信息文件的删除，超量时按修改时间淘汰，结果存储的同步清理
+"""
+
+class App:
+    logger = logging.getLogger("test_cache_janitor")
+
+def write_file(path, age_days=0, size=10):
+    with open(path, 'wb') as f:
+        f.write(b"0" * size)
+    mtime = time.time() - age_days * 86400
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+def make_janitor(cache_dir, monkeypatch, **kwargs):
+    # 近重复索引使用全局文件，测试中不压缩
+    monkeypatch.setattr(cache_janitor, "NEAR_DUPLICATE_ENABLED", False)
+    options = dict(cache_dir=str(cache_dir), max_age_days=7, max_files=100, max_bytes=10 ** 6,
+                   batch_size=100, slice_seconds=5)
+    options.update(kwargs)
+    return CacheJanitor(App(), **options)
+
+def test_removes_expired_and_orphan_files(tmp_path, monkeypatch):
+    old = write_file(tmp_path / "old.jpg", age_days=10)
+    old_meta = write_file(tmp_path / ("old.jpg" + META_SUFFIX), age_days=1)
+    fresh = write_file(tmp_path / "fresh.jpg")
+    fresh_meta = write_file(tmp_path / ("fresh.jpg" + META_SUFFIX))
+    orphan_meta = write_file(tmp_path / ("gone.jpg" + META_SUFFIX))
+    janitor = make_janitor(tmp_path, monkeypatch)
+
+    janitor.step()
+    # 过期图片连同其验证信息文件一起删除，图片已不存在的验证信息文件也删除
+    assert not os.path.exists(old)
+    assert not os.path.exists(old_meta)
+    assert not os.path.exists(orphan_meta)
+    assert os.path.exists(fresh) and os.path.exists(fresh_meta)
+    stats = janitor.stats()
+    assert (stats["passes"], stats["expired"], stats["orphans"], stats["evicted"]) == (1, 1, 1, 0)
+    assert (stats["files"], stats["bytes"]) == (2, 20)
+
+def test_evicts_oldest_over_limit(tmp_path, monkeypatch):
+    paths = [write_file(tmp_path / f"{i}.jpg", age_days=(4 - i) / 10) for i in range(4)]
+    janitor = make_janitor(tmp_path, monkeypatch, max_files=2)
+
+    janitor.step()
+    assert [os.path.exists(path) for path in paths] == [False, False, True, True]
+    assert janitor.stats()["evicted"] == 2
+    assert not janitor.over_limit()
+
+    # 新写入的文件立即计入使用量，下一个时间片淘汰当前最旧的文件
+    new = write_file(tmp_path / "new.jpg")
+    janitor.record(new)
+    janitor.step()
+    assert [os.path.exists(path) for path in paths + [new]] == [False, False, False, True, True]
+
+def test_cleans_result_store_once_per_pass(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    write_file(cache_dir / "a.jpg")
+    store = SQLiteStore(str(tmp_path / "results.db"))
+    now = time.time()
+    store.put("expired", {}, timestamp=now - 10 * 86400)
+    for i in range(3):
+        store.put(f"r{i}", {}, timestamp=now - 100 + i)
+    janitor = make_janitor(cache_dir, monkeypatch, store=store, max_files=2, batch_size=1)
+
+    # 每个时间片只扫描一批目录项，完成一遍扫描后才清理存储
+    janitor.step()
+    assert store.count() == 4
+    janitor.step()
+    assert janitor.stats()["passes"] == 1
+    assert [key for key in ["expired", "r0", "r1", "r2"] if store.contains(key)] == ["r1", "r2"]
@@ -0,0 +1,55 @@
+import time
+from cache_store import SQLiteStore
+"""
+SQLiteStore: 按访问时间淘汰的顺序（含攒批写入的访问时间），触发器维护的结果数量
+"""
+
+def make_store(tmp_path, access_interval=0):
+    return SQLiteStore(str(tmp_path / "results.db"), access_interval=access_interval)
+
+def test_evicts_least_recently_accessed(tmp_path):
+    store = make_store(tmp_path)
+    now = time.time()
+    for i, key in enumerate(["a", "b", "c", "d"]):
+        store.put(key, {"n": i}, timestamp=now - 400 + i * 100)
+
+    # 命中"a"只记入待写入的访问时间，淘汰前写入，"a"变为最近访问
+    assert store.get("a") == {"n": 0}
+    assert store.evict(2) == 2
+    assert [key for key in "abcd" if store.contains(key)] == ["a", "d"]
+    assert store.count() == 2
+    assert store.evict(2) == 0
+
+def test_access_updates_are_throttled(tmp_path):
+    store = make_store(tmp_path, access_interval=300)
+    now = time.time()
+    store.put("old", {}, timestamp=now - 200)
+    store.put("new", {}, timestamp=now - 100)
+    # 距上次记录不足access_interval的命中不更新访问时间，淘汰顺序不变
+    store.get("old")
+    assert store.evict(1) == 1
+    assert not store.contains("old")
+    assert store.contains("new")
+
+def test_count_after_deletes_and_upserts(tmp_path):
+    store = make_store(tmp_path)
+    now = time.time()
+    store.put("a", {}, timestamp=now - 10 * 86400)
+    store.put("b", {}, timestamp=now - 10 * 86400)
+    store.put("c", {})
+    assert store.count() == 3
+
+    # 覆盖已有的键不增加数量
+    store.put("c", {"v": 2})
+    assert store.count() == 3
+    assert store.get("c") == {"v": 2}
+
+    assert store.expire(7) == 2
+    assert store.count() == 1
+    assert store.evict(0) == 1
+    assert store.count() == 0
+    store.put("a", {})
+    assert store.count() == 1
+
+    # 重新打开数据库时沿用计数表，不重复统计
+    assert make_store(tmp_path).count() == 1
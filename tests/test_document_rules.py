@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from models import ImageType
+from ocr_service import OCRService, OCRResult
+"""
+证件规则表及单次扫描关键词匹配: 已知OCR文本 -> 证件类型及正反面（期望值与逐个关键词判断的旧版检测一致）
+"""
+
+# (名称, 图像高宽, OCR文本行（从上到下）, 期望类型, 期望正反面)
+CASES = [
+    ("id_front", (500, 790), ["姓名 张伟", "性别 男 民族 汉", "出生 1990年01月01日", "住址 北京市朝阳区建国路88号",
+                              "公民身份号码 110101199001011234"], ImageType.IDCARD, "front"),
+    ("id_front_markers", (500, 790), ["居民身份证", "公民身份号码"], ImageType.IDCARD, "front"),
+    ("id_back", (500, 790), ["中华人民共和国", "居民身份证", "签发机关 北京市公安局", "有效期限 2015.01.01-2035.01.01"],
+     ImageType.IDCARD, "back"),
+    ("driver_front", (600, 876), ["中华人民共和国机动车驾驶证", "证号 110101199001011234", "姓名 张伟 性别 男 国籍 中国",
+                                  "住址 北京市", "出生日期 1990-01-01", "初次领证日期 2015-06-01", "准驾车型 C1"],
+     ImageType.DRIVERCARD, "front"),
+    ("driver_back", (600, 876), ["驾驶证副页", "档案编号 110000123456", "记分 0"], ImageType.DRIVERCARD, "back"),
+    ("driver_fallback", (600, 876), ["机动车驾驶证"], ImageType.DRIVERCARD, "unknown"),
+    ("vehicle_front", (600, 876), ["中华人民共和国机动车行驶证", "号牌号码 京A12345 车辆类型 小型轿车", "所有人 张伟",
+                                   "住址 北京市", "使用性质 非营运", "品牌型号 大众汽车", "发证日期 2018-03-02"],
+     ImageType.VEHICLECARD, "front"),
+    ("vehicle_back", (600, 876), ["检验记录 合格", "核定载人 5人", "整备质量 1500kg", "总质量 1900kg"],
+     ImageType.VEHICLECARD, "back"),
+    ("vehicle_fallback", (600, 876), ["行驶证"], ImageType.VEHICLECARD, "unknown"),
+    ("bank_luhn", (540, 856), ["中国建设银行", "储蓄卡", "6227 0000 0000 0000 005", "VALID THRU 09/28"],
+     ImageType.BANKCARD, None),
+    ("bank_keyword", (540, 856), ["招商银行", "信用卡", "6225 8888 8888 8888"], ImageType.BANKCARD, None),
+    ("bank_wrong_ratio", (1000, 800), ["中国建设银行", "储蓄卡", "6227 0000 0000 0000 005"], ImageType.NORMAL, None),
+    ("receipt", (1512, 720), ["订单编号 20240512093011", "商品总价 ¥128.00", "收货地址 北京市海淀区中关村大街1号"],
+     ImageType.NORMAL, None),
+    ("empty", (500, 500), [], ImageType.NORMAL, None),
+]
+
+def ocr_result(lines):
+    boxes = [[[0, 40 * i], [100, 40 * i], [100, 40 * i + 30], [0, 40 * i + 30]] for i in range(len(lines))]
+    return OCRResult(boxes, lines, [0.95] * len(lines))
+
+def classify(image, result):
+    """与ImageProcessor.identify_image_type相同的检测顺序"""
+    checks = [
+        (ImageType.IDCARD, OCRService.detect_idcard, "is_idcard"),
+        (ImageType.DRIVERCARD, OCRService.detect_driverCard, "is_drivercard"),
+        (ImageType.VEHICLECARD, OCRService.detect_vehicleCard, "is_vehiclecard"),
+    ]
+    for doc_type, detect, flag in checks:
+        found = detect(image, result)
+        if found and isinstance(found, dict) and found.get(flag):
+            return doc_type, found.get("side")
+    if OCRService.detect_bankcard(image, result):
+        return ImageType.BANKCARD, None
+    return ImageType.NORMAL, None
+
+@pytest.mark.parametrize("name, shape, lines, doc_type, side", CASES, ids=[case[0] for case in CASES])
+def test_document_type(name, shape, lines, doc_type, side):
+    image = np.zeros(shape + (3,), np.uint8)
+    assert classify(image, ocr_result(lines)) == (doc_type, side)
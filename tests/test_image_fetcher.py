@@ -0,0 +1,132 @@
+import os
+import time
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import pytest
+from image_fetcher import ImageFetcher, FetchError, META_SUFFIX
+from deadline import Deadline, DeadlineExceeded
+"""
+ImageFetcher: 用本地http.server模拟图片服务器，验证ETag/Last-Modified条件请求及大小、类型限制
+"""
+
+IMAGE_BODY = b"\x89PNG\r\n\x1a\n" + b"0" * 1024
+ETAG = '"v1"'
+LAST_MODIFIED = "Wed, 01 May 2024 00:00:00 GMT"
+
+class ImageHandler(BaseHTTPRequestHandler):
+    """
+    /image.png 支持条件请求，/page.html 返回网页，/big.png 超过大小限制，/slow.png 每0.1秒发送1字节
+    remove_on_revalidate: 收到条件请求时先删除该文件（模拟缓存清理与重新验证同时发生）
+    """
+    requests_seen = []
+    remove_on_revalidate = None
+
+    def do_GET(self):
+        ImageHandler.requests_seen.append((self.path, dict(self.headers)))
+        if self.path == "/image.png":
+            if self.headers.get("If-None-Match") == ETAG:
+                if ImageHandler.remove_on_revalidate:
+                    os.remove(ImageHandler.remove_on_revalidate)
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.reply(IMAGE_BODY, "image/png", {"ETag": ETAG, "Last-Modified": LAST_MODIFIED})
+        elif self.path == "/slow.png":
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", "100")
+            self.end_headers()
+            try:
+                for _ in range(100):
+                    self.wfile.write(b"0")
+                    self.wfile.flush()
+                    time.sleep(0.1)
+            except OSError:
+                pass
+        elif self.path == "/page.html":
+            self.reply(b"<html></html>", "text/html")
+        elif self.path == "/big.png":
+            self.reply(b"0" * 4096, "image/png")
+        else:
+            self.send_error(404)
+
+    def reply(self, body, content_type, headers=None):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server():
+    ImageHandler.requests_seen = []
+    ImageHandler.remove_on_revalidate = None
+    httpd = HTTPServer(("127.0.0.1", 0), ImageHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_revalidates_with_etag(server, tmp_path):
+    fetcher = ImageFetcher(max_bytes=2048, revalidate_after=0)
+    path = str(tmp_path / "image.png")
+
+    assert fetcher.fetch(server + "/image.png", path) is True
+    with open(path, "rb") as f:
+        assert f.read() == IMAGE_BODY
+    assert os.path.exists(path + META_SUFFIX)
+
+    # 再次请求发送条件请求头，服务器返回304，继续使用缓存的图片
+    assert fetcher.fetch(server + "/image.png", path) is False
+    headers = ImageHandler.requests_seen[-1][1]
+    assert headers.get("If-None-Match") == ETAG
+    assert headers.get("If-Modified-Since") == LAST_MODIFIED
+    with open(path, "rb") as f:
+        assert f.read() == IMAGE_BODY
+    fetcher.close()
+
+def test_fresh_copy_skips_request(server, tmp_path):
+    fetcher = ImageFetcher(max_bytes=2048, revalidate_after=3600)
+    path = str(tmp_path / "image.png")
+    assert fetcher.fetch(server + "/image.png", path) is True
+    assert fetcher.fetch(server + "/image.png", path) is False
+    assert len(ImageHandler.requests_seen) == 1
+    fetcher.close()
+
+def test_rejects_non_image_and_oversized(server, tmp_path):
+    fetcher = ImageFetcher(max_bytes=2048)
+    with pytest.raises(FetchError):
+        fetcher.fetch(server + "/page.html", str(tmp_path / "page.png"))
+    with pytest.raises(FetchError):
+        fetcher.fetch(server + "/big.png", str(tmp_path / "big.png"))
+    assert os.listdir(tmp_path) == []
+    fetcher.close()
+
+def test_refetches_when_cached_copy_vanishes(server, tmp_path):
+    fetcher = ImageFetcher(max_bytes=2048, revalidate_after=0)
+    path = str(tmp_path / "image.png")
+    assert fetcher.fetch(server + "/image.png", path) is True
+
+    # 条件请求期间缓存图片被删除：304的空正文不能当作图片，改为不带条件头重新下载
+    ImageHandler.remove_on_revalidate = path
+    assert fetcher.fetch(server + "/image.png", path) is True
+    assert "If-None-Match" not in ImageHandler.requests_seen[-1][1]
+    with open(path, "rb") as f:
+        assert f.read() == IMAGE_BODY
+    fetcher.close()
+
+def test_slow_download_stops_at_deadline(server, tmp_path):
+    fetcher = ImageFetcher(max_bytes=2048)
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        fetcher.fetch(server + "/slow.png", str(tmp_path / "slow.png"), Deadline(0.5))
+    # 每次读取都在读取超时内到达，仍在期限附近中止（完整下载需要10秒）
+    assert time.monotonic() - start < 3
+    assert os.listdir(tmp_path) == []
+    fetcher.close()
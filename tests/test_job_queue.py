@@ -0,0 +1,99 @@
+import time
+import logging
+import sqlite3
+import pytest
+from job_queue import JobQueue
+"""
+异步任务队列: 两个队列实例（模拟两个工作进程）共享同一个任务数据库，租约到期接手、交还、重复结果及上传图片重新执行
+"""
+
+class App:
+    logger = logging.getLogger("test_job_queue")
+
+def make_queues(tmp_path, handler, lease_seconds=0.2):
+    """共享同一数据库的两个队列，不启动工作线程，由测试直接领取和执行任务"""
+    db_path = str(tmp_path / "jobs.db")
+    return [JobQueue(App(), handler, workers=0, db_path=db_path, lease_seconds=lease_seconds) for _ in range(2)]
+
+def test_expired_lease_is_taken_over(tmp_path):
+    calls = []
+    first, second = make_queues(tmp_path, lambda source_type, value: calls.append(value) or (200, "成功", value))
+    job = first.submit("image_path", "/data/a.jpg")
+
+    claimed = first._claim()
+    assert claimed.id == job.id and claimed.attempts == 1
+    # 租约未到期，其他进程领取不到
+    assert second._claim() is None
+    assert second.get(job.id).status == "running"
+
+    time.sleep(0.3)
+    taken = second._claim()
+    assert taken.id == job.id and taken.attempts == 2
+    second._run(taken)
+    assert second.get(job.id).result == (200, "成功", "/data/a.jpg")
+
+    # 原进程执行完成时任务已被接手，结果不覆盖
+    claimed.result = (500, "过期的结果", None)
+    claimed.finished_at = time.time()
+    assert not first._finish(claimed)
+    assert first.get(job.id).to_dict()["result"]["code"] == 200
+    assert calls == ["/data/a.jpg"]
+
+def test_release_requeues_and_resume_picks_up(tmp_path):
+    first, second = make_queues(tmp_path, lambda source_type, value: (200, "成功", value), lease_seconds=60)
+    job = first.submit("image_url", "https://example.com/a.jpg")
+    assert first._claim().id == job.id
+    assert second._claim() is None
+
+    # 工作进程被回收：交还任务，其他进程立即可以领取，执行次数不增加
+    assert first.release() == 1
+    assert second.get(job.id).status == "queued"
+    taken = second._claim()
+    assert taken.id == job.id and taken.attempts == 1
+    assert second.stats()["running"] == 1
+
+def test_too_many_attempts_fail_the_job(tmp_path):
+    calls = []
+    first, second = make_queues(tmp_path, lambda source_type, value: calls.append(value) or (200, "成功", value),
+                                lease_seconds=0.05)
+    job = first.submit("image_path", "/data/a.jpg")
+    # 每次领取后进程都在执行中退出，租约到期后由另一个进程重新领取
+    queues = [first, second, first, second]
+    for queue in queues:
+        claimed = queue._claim()
+        time.sleep(0.1)
+    assert claimed.attempts == 4
+    queues[-1]._run(claimed)
+    assert first.get(job.id).result[0] == 500
+    assert calls == []
+
+def test_uploaded_image_survives_retry(tmp_path):
+    seen = []
+    def handler(source_type, path):
+        with open(path, 'rb') as f:
+            seen.append(f.read())
+        return 200, "成功", None
+    first, second = make_queues(tmp_path, handler)
+    upload = tmp_path / "upload.jpg"
+    upload.write_bytes(b"image-bytes")
+    job = first.submit("image", str(upload))
+    # 图片内容保存在任务中，临时文件提交后即删除
+    assert not upload.exists()
+
+    first._claim()
+    time.sleep(0.3)
+    second._run(second._claim())
+    assert seen == [b"image-bytes"]
+    assert second.get(job.id).status == "done"
+
+def test_finish_error_does_not_kill_worker(tmp_path, monkeypatch):
+    first, _ = make_queues(tmp_path, lambda source_type, value: (200, "成功", value))
+    job = first.submit("image_path", "/data/a.jpg")
+    claimed = first._claim()
+
+    def locked(job):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(first, "_finish", locked)
+    first._run(claimed)
+    # 结果未保存，任务保持运行状态，租约到期后重新执行
+    assert first.get(job.id).status == "running"
@@ -0,0 +1,76 @@
+import json
+import subprocess
+import sys
+import pytest
+from metrics import Counter, Gauge, Histogram, render_metrics, load_snapshots
+"""
+多进程指标汇总: 计数器和直方图求和，已退出进程的计数归档后不回退，仪表只取存活进程
+"""
+
+@pytest.fixture
+def metrics(monkeypatch):
+    """只包含测试指标的注册表"""
+    registry = []
+    monkeypatch.setattr("metrics.REGISTRY", registry)
+    monkeypatch.setattr("metrics.COLLECTORS", [])
+    requests = Counter("test_requests", "请求数", ["endpoint"])
+    in_flight = Gauge("test_in_flight", "进行中的请求数")
+    cache = Gauge("test_cache", "内存缓存", ["stat"], mode="pid")
+    latency = Histogram("test_seconds", "耗时", buckets=(0.1, 1.0))
+    registry[:] = [requests, in_flight, cache, latency]
+    return requests, in_flight, cache, latency
+
+def write_other(metrics_dir, pid, token, values):
+    """模拟其他工作进程写入的快照"""
+    with open(metrics_dir / f"{pid}-{token}.json", "w", encoding="utf-8") as f:
+        json.dump({"pid": pid, "time": 0, "values": values}, f)
+
+def finished_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+def test_counters_sum_across_processes(metrics, tmp_path):
+    requests, in_flight, cache, latency = metrics
+    requests.inc(3, endpoint="recognize")
+    in_flight.inc()
+    cache.set(10, stat="items")
+    latency.observe(0.05)
+
+    other = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        write_other(tmp_path, other.pid, "a", {
+            "test_requests": [[["recognize"], 2]],
+            "test_in_flight": [[[], 1]],
+            "test_cache": [[["items"], 7]],
+            "test_seconds": [[[], [[0, 1, 0], 0.5, 1]]],
+        })
+        text = render_metrics(str(tmp_path))
+    finally:
+        other.kill()
+        other.wait()
+
+    assert 'test_requests_total{endpoint="recognize"} 5' in text
+    assert "test_in_flight 2" in text
+    assert f'test_cache{{stat="items",pid="{other.pid}"}} 7' in text
+    assert 'test_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_seconds_bucket{le="1.0"} 2' in text
+    assert "test_seconds_count 2" in text
+
+def test_exited_process_counts_are_archived(metrics, tmp_path):
+    requests, in_flight, _, _ = metrics
+    requests.inc(endpoint="recognize")
+    dead = finished_pid()
+    write_other(tmp_path, dead, "b", {"test_requests": [[["recognize"], 4]], "test_in_flight": [[[], 3]]})
+
+    text = render_metrics(str(tmp_path))
+    assert 'test_requests_total{endpoint="recognize"} 5' in text
+    # 已退出进程的仪表不再导出
+    assert "test_in_flight 3" not in text
+    assert not (tmp_path / f"{dead}-b.json").exists()
+
+    # 归档后再次导出，计数不回退也不重复计算
+    requests.inc(endpoint="recognize")
+    text = render_metrics(str(tmp_path))
+    assert 'test_requests_total{endpoint="recognize"} 6' in text
+    assert len([s for s in load_snapshots(str(tmp_path)) if s["alive"]]) == 1
@@ -0,0 +1,52 @@
+import threading
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from ocr_pool import OCRWorkerPool
+"""
+OCR进程池: 多个请求同时遇到进程池损坏时只重建一次
+"""
+
+class BrokenExecutor:
+    """所有任务都因工作进程退出而失败的进程池"""
+    def __init__(self, barrier):
+        self.barrier = barrier
+        self.shutdowns = 0
+
+    def submit(self, func, *args):
+        # 所有请求线程都拿到同一个损坏的进程池后再失败
+        self.barrier.wait(5)
+        raise BrokenProcessPool("worker exited")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdowns += 1
+
+def test_concurrent_failures_rebuild_once(monkeypatch):
+    threads = 8
+    barrier = threading.Barrier(threads)
+    created = []
+
+    def create_executor(self):
+        executor = BrokenExecutor(barrier)
+        created.append(executor)
+        return executor
+    monkeypatch.setattr(OCRWorkerPool, "_create_executor", create_executor)
+    pool = OCRWorkerPool(processes=1)
+    failed = pool.executor
+
+    errors = []
+    def run():
+        try:
+            pool.ocr("image.jpg")
+        except BrokenProcessPool as e:
+            errors.append(e)
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(10)
+
+    assert len(errors) == threads
+    # 初始的进程池及一次重建
+    assert len(created) == 2
+    assert failed.shutdowns == 1
+    assert pool.executor is created[1]
@@ -0,0 +1,31 @@
+from phash_index import PerceptualIndex
+from cache_manager import CacheManager
+from models import ImageType
+"""
+近重复索引: 查找、压缩索引文件；近重复复用的结果类型
+"""
+
+def test_prune_removes_deleted_results(tmp_path):
+    index_file = str(tmp_path / "phash_index.jsonl")
+    index = PerceptualIndex(index_file)
+    index.add(0b0000, "a")
+    index.add(0b1111 << 20, "b")
+    index.add(0b0011, "c")
+    assert index.search(0b0001, 2) == ("a", 1)
+
+    assert index.prune(lambda key: key != "a") == 1
+    assert index.search(0b0001, 2) == ("c", 1)
+    # 索引文件已重写，重新加载后不再包含已删除的结果
+    reloaded = PerceptualIndex(index_file)
+    assert reloaded.search(0b0001, 0) is None
+    assert reloaded.search(0b1111 << 20, 0) == ("b", 0)
+    assert index.prune(lambda key: True) == 0
+
+def test_only_plain_results_are_reusable():
+    normal = {"imageType": ImageType.NORMAL, "type": "text", "qrContent": "", "ocrContent": "欢迎光临"}
+    assert CacheManager.similar_reusable(normal)
+    for image_type in (ImageType.IDCARD, ImageType.BANKCARD, ImageType.DRIVERCARD, ImageType.VEHICLECARD):
+        assert not CacheManager.similar_reusable(dict(normal, imageType=image_type))
+    assert not CacheManager.similar_reusable(dict(normal, imageType=ImageType.QRCODE, type="qr_code",
+                                                  qrContent="wxp://abc"))
+    assert not CacheManager.similar_reusable(dict(normal, type="error"))
@@ -0,0 +1,42 @@
+import pytest
+from models import QRCodeType
+from qr_classifier import QRClassifier
+"""
+二维码分类表: 已知内容 -> 类型及收款码判断（期望值与逐条前缀/关键词判断的旧版分类一致）
+"""
+
+# (二维码内容, 期望类型, 是否收款码, 收款码类型)
+CASES = [
+    ("wxp://f2f0Yf9mNqv2bZz3cR4X0l7rJcVtGfJ1a8dQ", QRCodeType.WX_PAY, True, "微信收款码"),
+    ("https://payapp.weixin.qq.com/qr/AQHx", QRCodeType.WX_PAY, True, "微信收款码"),
+    ("HTTPS://QR.ALIPAY.COM/FKX17537", QRCodeType.ALIPAY, True, "支付宝收款码"),
+    ("alipays://platformapi/startapp?appId=20000067", QRCodeType.ALIPAY, True, "支付宝收款码"),
+    ("alipays://platformapi/startapp?saId=10000007", QRCodeType.ALIPAY, True, "支付宝收款码"),
+    ("https://qr.95516.com/00010000/0123", QRCodeType.URL, False, None),
+    ("upapi://pay?x=1", QRCodeType.UNION_PAY, True, "云闪付收款码"),
+    ("icbc://pay", QRCodeType.BANK_PAY, True, "银行收款码"),
+    ("weixin://dl/business", QRCodeType.WEIXIN, True, "微信收款码"),
+    ("https://weixin.qq.com/w/xyz", QRCodeType.WX_LOGIN, False, None),
+    ("https://wxaurl.cn/xyz", QRCodeType.WX_MINI, False, None),
+    ("snssdk1128://aweme", QRCodeType.DOUYIN, False, None),
+    ("https://v.douyin.com/iRNBho6u/", QRCodeType.URL, False, None),
+    ("https://item.taobao.com/item.htm?id=6123", QRCodeType.URL, False, None),
+    ("https://item.jd.com/100.html", QRCodeType.URL, False, None),
+    ("WIFI:T:WPA;S:office;P:pw;;", QRCodeType.WIFI, False, None),
+    ("BEGIN:VCARD\nVERSION:3.0\nFN:张三\nEND:VCARD", QRCodeType.VCARD, False, None),
+    ("tel:13800138000", QRCodeType.TEL, False, None),
+    ("mailto:a@b.com", QRCodeType.EMAIL, False, None),
+    ("geo:39.9,116.4", QRCodeType.GEO, False, None),
+    ("https://www.example.com/path", QRCodeType.URL, False, None),
+    ("https://shop.example.com/pay?amount=12.50", QRCodeType.URL, True, "含金额参数的收款码"),
+    ("收款码 店铺123", QRCodeType.TEXT, True, "第三方支付平台"),
+    ("欢迎光临 微信扫一扫", QRCodeType.WEIXIN, False, None),
+    ("银联云闪付收款", QRCodeType.UNION_PAY, True, "云闪付收款码"),
+    ("plain text", QRCodeType.TEXT, False, None),
+    ("", QRCodeType.UNKNOWN, False, None),
+]
+
+@pytest.mark.parametrize("qr_data, code, is_payment, payment_type", CASES, ids=[case[0][:32] for case in CASES])
+def test_classify(qr_data, code, is_payment, payment_type):
+    result = QRClassifier.classify(qr_data)
+    assert (result["code"], result["is_payment"], result["payment_type"]) == (code, is_payment, payment_type)
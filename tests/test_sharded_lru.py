@@ -0,0 +1,54 @@
+import time
+from cache_manager import ShardedLRUCache
+"""
+ShardedLRUCache: 按最近使用顺序淘汰，容量按分段平均分配、各分段独立淘汰，字节数限制和过期
+"""
+
+def test_evicts_least_recently_used():
+    cache = ShardedLRUCache(maxsize=2, maxbytes=10 ** 6, ttl=60, shards=1)
+    cache["a"] = 1
+    cache["b"] = 2
+    # 读取"a"后"b"成为最久未使用的项
+    assert cache["a"] == 1
+    cache["c"] = 3
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    # 覆盖已有的键同样算作最近使用
+    cache["a"] = 10
+    cache["d"] = 4
+    assert "c" not in cache
+    assert (cache.get("a"), cache.get("d")) == (10, 4)
+    assert cache.stats()["evictions"] == 2
+
+def test_capacity_is_per_shard():
+    # 整数键的哈希为其自身，键k落在第 k % 4 个分段；每个分段最多 8 / 4 = 2 项
+    cache = ShardedLRUCache(maxsize=8, maxbytes=10 ** 6, ttl=60, shards=4)
+    assert cache._shard_maxsize == 2
+    for key in (0, 4, 1, 5, 2, 6):
+        cache[key] = key
+    cache[8] = 8
+    # 第0个分段淘汰其最旧的键0，其他分段不受影响
+    assert 0 not in cache
+    assert all(key in cache for key in (4, 8, 1, 5, 2, 6))
+    assert len(cache) == 6
+    # 未用满的分段不替其他分段承担容量
+    cache[3] = 3
+    cache[7] = 7
+    cache[12] = 12
+    assert 4 not in cache
+    assert len(cache) == 8
+
+def test_byte_limit_and_expiry():
+    cache = ShardedLRUCache(maxsize=10, maxbytes=100, ttl=60, shards=1)
+    cache.set("a", "x", size=60)
+    cache.set("b", "y", size=60)
+    assert "a" not in cache
+    # 超过字节数限制的单项仍保留刚写入的项
+    cache.set("c", "z", size=500)
+    assert len(cache) == 1 and cache.stats()["bytes"] == 500
+
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.get("c") is None
+    assert cache.stats()["expirations"] == 1
@@ -0,0 +1,132 @@
+import threading
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+import pytest
+from single_flight import SingleFlight
+"""
+请求合并: 结果共享、异常传递、等待超时、键清理
+"""
+
+def run_follower(flight, key, func, *args, **kwargs):
+    """在线程中发起调用，返回 (线程, 结果列表)"""
+    outcome = []
+    thread = threading.Thread(target=lambda: outcome.append(flight.do(key, func, *args, **kwargs)))
+    thread.start()
+    return thread, outcome
+
+def test_unshareable_result_is_recomputed_by_followers():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def recognize(budget):
+        if budget == "leader":
+            started.set()
+            release.wait(5)
+            return {"partial": True}
+        return {"partial": False, "budget": budget}
+
+    shareable = lambda outcome: not isinstance(outcome, BaseException) and not outcome["partial"]
+    leader, leader_outcome = run_follower(flight, "k", recognize, "leader", shareable=shareable)
+    started.wait(5)
+    follower, follower_outcome = run_follower(flight, "k", recognize, "follower", shareable=shareable)
+    while flight.stats()["coalesced"] < 1:
+        time.sleep(0.01)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert leader_outcome == [({"partial": True}, False)]
+    # 发起调用的部分结果不共享，等待的调用按自己的参数重新执行
+    assert follower_outcome == [({"partial": False, "budget": "follower"}, False)]
+    assert flight.stats() == {"leaders": 1, "coalesced": 1, "retried": 1, "inflight": 0}
+
+def blocking(result):
+    """返回 (函数, 已开始事件, 放行事件, 调用次数)，函数等待放行后返回result（异常则抛出）"""
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+    return func, started, release, calls
+
+def wait_coalesced(flight, count):
+    while flight.stats()["coalesced"] < count:
+        time.sleep(0.01)
+
+def test_concurrent_calls_share_result():
+    flight = SingleFlight()
+    func, started, release, calls = blocking({"type": "text"})
+    leader, leader_outcome = run_follower(flight, "k", func)
+    started.wait(5)
+    followers = [run_follower(flight, "k", func) for _ in range(3)]
+    wait_coalesced(flight, 3)
+    release.set()
+    leader.join(5)
+    for thread, _ in followers:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert leader_outcome == [({"type": "text"}, False)]
+    assert [outcome for _, outcome in followers] == [[({"type": "text"}, True)]] * 3
+    assert flight.stats() == {"leaders": 1, "coalesced": 3, "retried": 0, "inflight": 0}
+
+def test_exception_is_shared_and_key_released():
+    flight = SingleFlight()
+    error = ValueError("识别失败")
+    func, started, release, calls = blocking(error)
+    errors = []
+
+    def call():
+        try:
+            flight.do("k", func)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait(5)
+    threads.append(threading.Thread(target=call))
+    threads[1].start()
+    wait_coalesced(flight, 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert errors == [error, error]
+    # 失败后键已释放，再次调用重新执行
+    assert flight.do("k", lambda: "ok") == ("ok", False)
+    assert flight.stats()["inflight"] == 0
+
+def test_follower_timeout_leaves_leader_running():
+    flight = SingleFlight()
+    func, started, release, calls = blocking("done")
+    leader, leader_outcome = run_follower(flight, "k", func)
+    started.wait(5)
+
+    start = time.monotonic()
+    with pytest.raises(FuturesTimeoutError):
+        flight.do("k", func, timeout=0.1)
+    assert time.monotonic() - start < 2
+    assert flight.stats()["inflight"] == 1
+
+    release.set()
+    leader.join(5)
+    assert leader_outcome == [("done", False)]
+    assert len(calls) == 1
+    assert flight.stats()["inflight"] == 0
+
+def test_keys_are_independent():
+    flight = SingleFlight()
+    assert flight.do("a", lambda x: x + 1, 1) == (2, False)
+    assert flight.do("b", lambda x: x + 1, 2) == (3, False)
+    # 没有键的调用直接执行，不计入统计
+    assert flight.do(None, lambda: "raw") == ("raw", False)
+    assert flight.stats() == {"leaders": 2, "coalesced": 0, "retried": 0, "inflight": 0}
@@ -0,0 +1,7 @@
+from app import app
+"""
+WSGI入口: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+# 兼容按application名称查找的WSGI服务器
+application = app